@@ -0,0 +1,186 @@
+import os
+import threading
+import time
+
+from metrics import Counter, Gauge, Histogram
+
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", 4))
+LLM_RATE_PER_SECOND = float(os.environ.get("LLM_RATE_PER_SECOND", 5))
+LLM_BURST = int(os.environ.get("LLM_BURST", 5))
+LLM_QUEUE_SIZE = int(os.environ.get("LLM_QUEUE_SIZE", 16))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.environ.get("LLM_QUEUE_TIMEOUT_SECONDS", 2.0))
+LLM_FAILURE_THRESHOLD = int(os.environ.get("LLM_FAILURE_THRESHOLD", 5))
+LLM_BREAKER_RESET_SECONDS = float(os.environ.get("LLM_BREAKER_RESET_SECONDS", 30.0))
+
+queue_depth = Gauge("llm_admission_queue_depth", "Requests waiting for an LLM slot")
+in_flight = Gauge("llm_admission_in_flight", "LLM calls currently running")
+wait_seconds = Histogram("llm_admission_wait_seconds", "Time spent waiting for an LLM slot")
+decisions = Counter("llm_admission_total", "LLM admission decisions by outcome")
+circuit_state = Gauge("llm_circuit_state", "LLM circuit breaker state (0 closed, 1 half-open, 2 open)")
+circuit_transitions = Counter("llm_circuit_transitions_total", "LLM circuit breaker state changes")
+queue_depth.set(0)
+in_flight.set(0)
+circuit_state.set(0)
+
+
+class TokenBucket:
+    """Token bucket refilled at `rate` tokens per second up to `burst` tokens"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_take(self, now: float) -> bool:
+        """Take a token if one is available (caller holds the controller lock)"""
+        self._refill(now)
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def seconds_until_token(self, now: float) -> float:
+        self._refill(now)
+        return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+
+
+class AdmissionController:
+    """
+    Admits calls to a rate-limited provider
+
+    A call runs once both a concurrency slot and a rate token are available.
+    Up to max_queue callers wait, each for at most max_wait seconds; when the
+    queue is full or the wait runs out, acquire() returns False right away so
+    the caller can use its fallback instead of piling onto the provider.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        rate_per_second: float = LLM_RATE_PER_SECOND,
+        burst: int = LLM_BURST,
+        max_queue: int = LLM_QUEUE_SIZE,
+        max_wait: float = LLM_QUEUE_TIMEOUT_SECONDS,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._bucket = TokenBucket(rate_per_second, burst)
+        self._condition = threading.Condition()
+        self._running = 0
+        self._waiting = 0
+
+    def _try_start(self, now: float) -> bool:
+        if self._running < self.max_concurrency and self._bucket.try_take(now):
+            self._running += 1
+            in_flight.set(self._running)
+            return True
+        return False
+
+    def acquire(self, timeout: float = None) -> bool:
+        """Wait for permission to call the provider; False means use the fallback"""
+        started = time.monotonic()
+        max_wait = self.max_wait if timeout is None else min(self.max_wait, timeout)
+        with self._condition:
+            if self._waiting == 0 and self._try_start(started):
+                decisions.inc(outcome="admitted")
+                wait_seconds.observe(0)
+                return True
+            if self._waiting >= self.max_queue:
+                decisions.inc(outcome="queue_full")
+                return False
+
+            deadline = started + max_wait
+            self._waiting += 1
+            queue_depth.set(self._waiting)
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self._try_start(now):
+                        decisions.inc(outcome="admitted")
+                        wait_seconds.observe(now - started)
+                        return True
+                    if now >= deadline:
+                        decisions.inc(outcome="timed_out")
+                        wait_seconds.observe(now - started)
+                        return False
+                    # Wake up for a released slot, the next token, or the deadline
+                    timeout = deadline - now
+                    if self._running < self.max_concurrency:
+                        timeout = min(timeout, self._bucket.seconds_until_token(now))
+                    self._condition.wait(timeout)
+            finally:
+                self._waiting -= 1
+                queue_depth.set(self._waiting)
+
+    def release(self):
+        """Give back the concurrency slot taken by a successful acquire()"""
+        with self._condition:
+            self._running -= 1
+            in_flight.set(self._running)
+            self._condition.notify()
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing provider for a while
+
+    After `failure_threshold` consecutive failures the breaker opens and
+    allow() returns False. Once `reset_timeout` seconds have passed it goes
+    half-open and lets a single trial call through: success closes it again,
+    failure reopens it. A trial that never reports back is replaced by a new
+    one after another `reset_timeout`.
+    """
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+    _STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, failure_threshold: int = LLM_FAILURE_THRESHOLD,
+                 reset_timeout: float = LLM_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._changed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _set_state(self, state: str, now: float):
+        if state != self.state:
+            circuit_transitions.inc(to=state)
+        self.state = state
+        self._changed_at = now
+        circuit_state.set(self._STATE_VALUES[state])
+
+    def allow(self) -> bool:
+        """Whether a call may go to the provider now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if now - self._changed_at < self.reset_timeout:
+                return False
+            # Time for a (new) trial call
+            self._set_state(self.HALF_OPEN, now)
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            if self.state != self.CLOSED:
+                self._set_state(self.CLOSED, time.monotonic())
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED and self._failures >= self.failure_threshold
+            ):
+                self._set_state(self.OPEN, time.monotonic())
+
+
+llm_admission = AdmissionController()
+llm_breaker = CircuitBreaker()
@@ -1,8 +1,17 @@
 import os
+import re
 import json
-from groq import Groq
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import NamedTuple, Optional
+from groq import Groq, APITimeoutError
+from sqlalchemy.orm import Session
+from admission import llm_admission, llm_breaker, LLM_MAX_CONCURRENCY
+from metrics import Counter, Histogram
+from name_index import student_names
+from section_manager import get_section_by_name
 from schemas import AIParseResponse, AttendanceStatus
-from datetime import datetime
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -14,113 +23,486 @@ if not api_key:
     print("Warning: GROQ_API_KEY environment variable not set. AI parsing will not work.")
     client = None
 else:
-    client = Groq(api_key=api_key)
-
-
-def parse_attendance_command(command: str) -> AIParseResponse:
+    # Retries would eat the deadline; failures fall back and feed the breaker instead
+    client = Groq(api_key=api_key, max_retries=int(os.environ.get("LLM_MAX_RETRIES", 0)))
+
+# Total time budget per command, and whether to race the rule-based parser
+LLM_DEADLINE_SECONDS = float(os.environ.get("LLM_DEADLINE_SECONDS", 3.0))
+LLM_HEDGE = os.environ.get("LLM_HEDGE", "").lower() in ("1", "true", "yes")
+LLM_HEDGE_AFTER_SECONDS = float(os.environ.get("LLM_HEDGE_AFTER_SECONDS", 0.5))
+# Commands the local grammar parses at least this confidently never reach the LLM
+PARSER_CASCADE = os.environ.get("PARSER_CASCADE", "true").lower() in ("1", "true", "yes")
+PARSER_CONFIDENCE_THRESHOLD = float(os.environ.get("PARSER_CONFIDENCE_THRESHOLD", 0.8))
+
+fallbacks = Counter("ai_parse_fallbacks_total", "Commands handled by the rule-based parser, by reason")
+hedges = Counter("ai_parse_hedges_total", "Hedged commands by which parser's answer was used")
+llm_seconds = Histogram("llm_call_seconds", "Duration of Groq calls by outcome")
+parse_paths = Counter("ai_parse_path_total", "Commands by the parser tier that took them: local grammar or LLM")
+local_confidence = Histogram(
+    "ai_parse_local_confidence", "Confidence of local grammar parses",
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+)
+_hedge_pool = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="llm-hedge")
+
+
+def parse_attendance_command(command: str, db: Optional[Session] = None) -> AIParseResponse:
     """
     Parse attendance information from natural language command using Groq AI
 
+    Given a session, the local grammar parses the command against the
+    student roster first, and its answer is used when its confidence reaches
+    PARSER_CONFIDENCE_THRESHOLD; only the remaining commands go to Groq,
+    after the session's transaction is rolled back so it holds no
+    connection during the call. Pass a read-only session.
+    The whole LLM call, including time spent waiting for an LLM slot, must
+    finish within LLM_DEADLINE_SECONDS; otherwise, or when Groq fails or the
+    circuit breaker is open, the rule-based parser answers instead.
+
     Args:
         command (str): Natural language attendance command
+        db (Session): Session for checking names and sections against the roster
 
     Returns:
         AIParseResponse: Parsed attendance information
     """
+    if db is not None and PARSER_CASCADE:
+        local = local_parse_attendance_command(command, db)
+        local_confidence.observe(local.confidence)
+        if local.confidence >= PARSER_CONFIDENCE_THRESHOLD:
+            parse_paths.inc(path="local")
+            return local.result
+        # Give the roster lookups' connection back to the pool while the LLM answers
+        db.rollback()
+    parse_paths.inc(path="llm")
+
     # Check if client is available
     if client is None:
         print("Using mock AI parser since GROQ_API_KEY is not set")
+        fallbacks.inc(reason="no_client")
         return mock_parse_attendance_command(command)
 
+    # Groq has been failing; don't wait on it until the breaker half-opens
+    if not llm_breaker.allow():
+        fallbacks.inc(reason="circuit_open")
+        return mock_parse_attendance_command(command)
+
+    deadline = time.monotonic() + LLM_DEADLINE_SECONDS
+    if LLM_HEDGE:
+        return _hedged_parse(command, deadline)
+
+    result = _call_llm(command, deadline)
+    return result if result is not None else mock_parse_attendance_command(command)
+
+
+def _call_llm(command: str, deadline: float) -> Optional[AIParseResponse]:
+    """
+    Make one admitted, deadline-bound LLM call and report it to the breaker
+
+    Returns None when the call could not be made or failed.
+    """
+    # Don't pile onto a rate-limited provider; the rule-based parser answers at once
+    if not llm_admission.acquire(timeout=deadline - time.monotonic()):
+        print("LLM busy, using mock AI parser")
+        fallbacks.inc(reason="admission")
+        return None
+
+    started = time.monotonic()
+    try:
+        result = _llm_parse(command, timeout=max(0.01, deadline - started))
+    except APITimeoutError:
+        print(f"AI parsing timed out after {time.monotonic() - started:.2f}s")
+        llm_breaker.record_failure()
+        llm_seconds.observe(time.monotonic() - started, outcome="timeout")
+        fallbacks.inc(reason="timeout")
+        return None
+    except Exception as e:
+        # Includes JSON decode errors from a malformed model response
+        print(f"General error in AI parsing: {e}")
+        llm_breaker.record_failure()
+        llm_seconds.observe(time.monotonic() - started, outcome="error")
+        fallbacks.inc(reason="error")
+        return None
+    finally:
+        llm_admission.release()
+
+    llm_breaker.record_success()
+    llm_seconds.observe(time.monotonic() - started, outcome="ok")
+    return result
+
+
+def _hedged_parse(command: str, deadline: float) -> AIParseResponse:
+    """
+    Race the LLM against the rule-based parser
+
+    If the rule-based result looks reliable it is returned as soon as the LLM
+    has taken longer than LLM_HEDGE_AFTER_SECONDS; otherwise the LLM gets the
+    rest of the deadline. The LLM call keeps running in the background either
+    way so its outcome still reaches the circuit breaker.
+    """
+    future = _hedge_pool.submit(_call_llm, command, deadline)
+    local = mock_parse_attendance_command(command)
+    wait = deadline - time.monotonic()
+    if _is_confident(command, local):
+        wait = min(wait, LLM_HEDGE_AFTER_SECONDS)
     try:
-        # Define the prompt for the AI
-        prompt = f"""
-        You are an attendance parsing assistant. Extract the following information from the given text:
-        1. Student names (list of names)
-        2. Attendance status (Present, Absent, or Late)
-        3. Date (if mentioned, otherwise return null)
-
-        Return the result as a JSON object with the following structure:
-        {{
-          "students": ["student_name1", "student_name2", ...],
-          "status": "present|absent|late",
-          "date": "YYYY-MM-DD" or null
-        }}
-
-        Text to parse: "{command}"
-
-        Important: Only return the JSON object, nothing else.
-        """
-
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt,
-                }
-            ],
-            model="llama-3.1-8b-instant",  # Using a currently supported model
-            response_format={"type": "json_object"},  # Request JSON response
+        result = future.result(timeout=max(0.0, wait))
+    except FutureTimeoutError:
+        result = None
+    if result is None:
+        hedges.inc(winner="local")
+        return local
+    hedges.inc(winner="llm")
+    return result
+
+
+def _is_confident(command: str, parsed: AIParseResponse) -> bool:
+    """Whether a rule-based parse is trustworthy enough to skip waiting for the LLM"""
+    if parsed.section:
+        return True
+    if not parsed.students or parsed.students == ["Unknown"]:
+        return False
+    return STATUS_WORD_PATTERN.search(command) is not None
+
+
+def _llm_parse(command: str, timeout: float) -> AIParseResponse:
+    """Ask Groq to parse a command; raises on timeouts, API errors and bad JSON"""
+    # Define the prompt for the AI
+    prompt = f"""
+    You are an attendance parsing assistant. Extract the following information from the given text:
+    1. Student names (list of names)
+    2. Attendance status (Present, Absent, or Late)
+    3. Date (if mentioned, otherwise return null)
+    4. Class section (if the command is about a whole class such as "everyone in 7B", otherwise null)
+    5. Students excluded from a whole-class command and their status (e.g. "except Ali" means Ali
+       gets the opposite status: absent if the class is present, otherwise present)
+
+    Return the result as a JSON object with the following structure:
+    {{
+      "students": ["student_name1", "student_name2", ...],
+      "status": "present|absent|late",
+      "date": "YYYY-MM-DD" or null,
+      "section": "section_name" or null,
+      "except_students": ["student_name1", ...],
+      "except_status": "present|absent|late" or null
+    }}
+
+    Text to parse: "{command}"
+
+    Important: Only return the JSON object, nothing else.
+    """
+
+    chat_completion = client.chat.completions.create(
+        messages=[
+            {
+                "role": "user",
+                "content": prompt,
+            }
+        ],
+        model="llama-3.1-8b-instant",  # Using a currently supported model
+        response_format={"type": "json_object"},  # Request JSON response
+        timeout=timeout,
+    )
+
+    # Extract the response
+    response_text = chat_completion.choices[0].message.content
+    print(f"AI Response: {response_text}")  # Debug print
+
+    # Parse the JSON response
+    parsed_data = json.loads(response_text)
+
+    # Validate and convert the status to the enum
+    status_value = parsed_data.get("status", "present").lower()
+    if status_value not in ["present", "absent", "late"]:
+        status_value = "present"  # Default to present if invalid
+
+    # Map lowercase values to the enum's capitalized format
+    status_mapping = {
+        "present": "Present",
+        "absent": "Absent", 
+        "late": "Late"
+    }
+
+    status_enum = AttendanceStatus(status_mapping[status_value])
+
+    # Handle date parsing
+    date_str = parsed_data.get("date")
+    parsed_date = datetime.utcnow()  # Default to current date
+    if date_str:
+        try:
+            parsed_date = datetime.strptime(date_str, "%Y-%m-%d")
+        except ValueError:
+            # If date format is invalid, use current date
+            parsed_date = datetime.utcnow()
+
+    # Whole-class commands name a section and optional exceptions
+    section = parsed_data.get("section") or None
+    except_students = parsed_data.get("except_students") or []
+    except_status = None
+    if except_students:
+        except_value = str(parsed_data.get("except_status") or "").lower()
+        except_status = (
+            AttendanceStatus(status_mapping[except_value]) if except_value in status_mapping
+            else _opposite_status(status_enum)
         )
 
-        # Extract the response
-        response_text = chat_completion.choices[0].message.content
-        print(f"AI Response: {response_text}")  # Debug print
-
-        # Parse the JSON response
-        parsed_data = json.loads(response_text)
-
-        # Validate and convert the status to the enum
-        status_value = parsed_data.get("status", "present").lower()
-        if status_value not in ["present", "absent", "late"]:
-            status_value = "present"  # Default to present if invalid
-
-        # Map lowercase values to the enum's capitalized format
-        status_mapping = {
-            "present": "Present",
-            "absent": "Absent", 
-            "late": "Late"
-        }
-        
-        status_enum = AttendanceStatus(status_mapping[status_value])
-
-        # Handle date parsing
-        date_str = parsed_data.get("date")
-        parsed_date = datetime.utcnow()  # Default to current date
-        if date_str:
+    # Create and return the response object
+    return AIParseResponse(
+        students=parsed_data.get("students", []) if not section else [],
+        status=status_enum,
+        date=parsed_date,
+        section=section,
+        except_students=except_students,
+        except_status=except_status
+    )
+
+
+def _opposite_status(status: AttendanceStatus) -> AttendanceStatus:
+    """Status implied for students excluded from a whole-class command"""
+    return AttendanceStatus.absent if status == AttendanceStatus.present else AttendanceStatus.present
+
+
+# "everyone in 7B", "all students of class 7B", "the whole class 7B", and "class 7B"
+# or "mark section 7B" only at the start: "Ali from class 7B is absent" names Ali
+WHOLE_CLASS_PATTERN = re.compile(
+    r'\b(?:everyone|everybody|all(?:\s+(?:students|the\s+students))?|(?:the\s+)?(?:whole|entire)\s+class)'
+    r'(?:\s+(?:in|of|from))?(?:\s+(?:class|section|grade))?\s+([0-9]{1,2}[A-Za-z]?|[A-Za-z][0-9]{1,2}[A-Za-z]?)\b'
+    r'|^\s*(?:mark\s+)?(?:the\s+)?(?:class|section)\s+([0-9]{1,2}[A-Za-z]?|[A-Za-z][0-9]{1,2}[A-Za-z]?)\b',
+    re.IGNORECASE
+)
+EXCEPT_PATTERN = re.compile(r'\b(?:except|but\s+not)(?:\s+for)?\s+(.+)$', re.IGNORECASE)
+STATUS_WORD_PATTERN = re.compile(r'\b(present|absent|late)\b', re.IGNORECASE)
+STATUS_WORDS = {"present": AttendanceStatus.present, "absent": AttendanceStatus.absent, "late": AttendanceStatus.late}
+
+
+def parse_whole_class_command(command: str):
+    """
+    Detect a whole-class command such as "everyone in 7B is present except Ali"
+
+    Returns (section, status, except_students, except_status), or None if the
+    command does not address a whole section.
+    """
+    section_match = WHOLE_CLASS_PATTERN.search(command)
+    if not section_match:
+        return None
+    section = (section_match.group(1) or section_match.group(2)).upper()
+
+    except_match = EXCEPT_PATTERN.search(command)
+    main_clause = command[:except_match.start()] if except_match else command
+    status_match = STATUS_WORD_PATTERN.search(main_clause)
+    status = STATUS_WORDS[status_match.group(1).lower()] if status_match else AttendanceStatus.present
+
+    except_students, except_status = [], None
+    if except_match:
+        tail = re.split(r'\s+on\s+|\s+today\b|\s+yesterday\b|[.;]', except_match.group(1))[0]
+        tail_status = STATUS_WORD_PATTERN.search(tail)
+        if tail_status:
+            except_status = STATUS_WORDS[tail_status.group(1).lower()]
+            tail = tail[:tail_status.start()]
+        tail = re.sub(r'\b(?:who|is|are|was|were)\b', ' ', tail, flags=re.IGNORECASE)
+        except_students = [
+            " ".join(part.split()) for part in re.split(r',|\band\b|&', tail) if part.strip()
+        ]
+        if except_students and except_status is None:
+            except_status = _opposite_status(status)
+
+    return section, status, except_students, except_status
+
+
+# Dates the parsers recognise: "on DD MMM YYYY", "on MMM DD YYYY", "on DD/MM/YYYY", "on YYYY-MM-DD"
+DATE_PATTERNS = [
+    re.compile(r'on\s+(\d{1,2})\s+([a-zA-Z]{3,9})\s+(\d{4})', re.IGNORECASE),  # "on 6 Feb 2026"
+    re.compile(r'on\s+([a-zA-Z]{3,9})\s+(\d{1,2})\s*,?\s*(\d{4})', re.IGNORECASE),  # "on February 6, 2026"
+    re.compile(r'on\s+(\d{1,2}[\/\-]\d{1,2}[\/\-]\d{4})', re.IGNORECASE),  # "on 06/02/2026" or "on 06-02-2026"
+    re.compile(r'on\s+(\d{4}-\d{1,2}-\d{1,2})', re.IGNORECASE),  # "on 2026-02-06"
+]
+
+
+def extract_command_date(command: str) -> Optional[datetime]:
+    """The date a command names, or None if it names none"""
+    parsed_date = None
+
+    # Try different date patterns
+    match1 = DATE_PATTERNS[0].search(command)
+    if match1:
+        day, month, year = match1.groups()
+        try:
+            # Convert month name to number
+            month_num = datetime.strptime(month[:3], '%b').month
+            parsed_date = datetime(int(year), month_num, int(day))
+        except ValueError:
+            pass  # Invalid date, continue to try other patterns
+
+    if not parsed_date:
+        match2 = DATE_PATTERNS[1].search(command)
+        if match2:
+            month, day, year = match2.groups()
             try:
-                parsed_date = datetime.strptime(date_str, "%Y-%m-%d")
+                # Convert month name to number
+                month_num = datetime.strptime(month[:3], '%b').month
+                parsed_date = datetime(int(year), month_num, int(day))
             except ValueError:
-                # If date format is invalid, use current date
-                parsed_date = datetime.utcnow()
+                pass  # Invalid date, continue to try other patterns
 
-        # Create and return the response object
-        return AIParseResponse(
-            students=parsed_data.get("students", []),
-            status=status_enum,
-            date=parsed_date
-        )
+    if not parsed_date:
+        match3 = DATE_PATTERNS[2].search(command)
+        if match3:
+            date_str = match3.group(1)
+            try:
+                # Try to parse different formats
+                if '/' in date_str:
+                    parsed_date = datetime.strptime(date_str, '%m/%d/%Y')
+                elif '-' in date_str:
+                    parsed_date = datetime.strptime(date_str, '%m-%d-%Y')
+            except ValueError:
+                try:
+                    # Try DD/MM/YYYY or DD-MM-YYYY
+                    if '/' in date_str:
+                        parsed_date = datetime.strptime(date_str, '%d/%m/%Y')
+                    elif '-' in date_str:
+                        parsed_date = datetime.strptime(date_str, '%d-%m-%Y')
+                except ValueError:
+                    pass  # Invalid date format
 
-    except json.JSONDecodeError as e:
-        print(f"JSON decode error: {e}")
-        print(f"Response text that failed: {response_text}")
-        # Fall back to mock parser if JSON parsing fails
-        return mock_parse_attendance_command(command)
-    except Exception as e:
-        print(f"General error in AI parsing: {e}")
-        # Fall back to mock parser if any other error occurs
-        return mock_parse_attendance_command(command)
+    if not parsed_date:
+        match4 = DATE_PATTERNS[3].search(command)
+        if match4:
+            date_str = match4.group(1)
+            try:
+                parsed_date = datetime.strptime(date_str, '%Y-%m-%d')
+            except ValueError:
+                pass  # Invalid date format
+
+    return parsed_date
+
+
+class LocalParse(NamedTuple):
+    result: AIParseResponse
+    # 0-1: how sure the grammar is that the parse is what the teacher meant
+    confidence: float
+
+
+GRAMMAR_STATUS_PATTERN = re.compile(r'\b(present|here|absent|missing|late|tardy)\b', re.IGNORECASE)
+GRAMMAR_STATUS_WORDS = {
+    "present": AttendanceStatus.present, "here": AttendanceStatus.present,
+    "absent": AttendanceStatus.absent, "missing": AttendanceStatus.absent,
+    "late": AttendanceStatus.late, "tardy": AttendanceStatus.late,
+}
+# Words that change what the rest of a command means; the grammar leaves those to the LLM
+NEGATION_PATTERN = re.compile(r"\b(?:not|no|never|nobody|instead|only)\b|n't\b", re.IGNORECASE)
+RELATIVE_DAY_PATTERN = re.compile(r'\b(today|yesterday)\b', re.IGNORECASE)
+NAME_SEPARATOR_PATTERN = re.compile(r',|;|&|\+|\band\b', re.IGNORECASE)
+NAME_WORD_PATTERN = re.compile(r"^[A-Za-z][A-Za-z'-]*$")
+# Words around the names in commands like "mark Ali and Sara as absent this morning"
+FILLER_WORDS = {
+    "is", "are", "was", "were", "has", "have", "been", "be", "mark", "marked", "as", "please",
+    "this", "morning", "both", "student", "students", "came", "arrived", "in", "class", "for", "the",
+}
+
+
+def _name_confidence(db: Session, words: list) -> tuple:
+    """
+    Resolve the words of one name against the roster
+
+    Returns (name to use, confidence): the roster spelling when the name
+    matches a student, otherwise the words as written.
+    """
+    written = " ".join(words)
+    if not all(NAME_WORD_PATTERN.match(word) for word in words):
+        return written, 0.2
+    student_id, candidates = student_names.resolve(db, written)
+    if student_id is None:
+        # Several students it could mean, or a name the roster doesn't have
+        return written, 0.3 if candidates else 0.2
+    best = candidates[0]
+    if best.score == 1.0:
+        return best.name, 1.0
+    # A misspelling the index resolves; less sure when the command has words the name doesn't
+    return best.name, 0.9 if len(words) <= len(best.name.split()) else 0.45
+
+
+def local_parse_attendance_command(command: str, db: Session) -> LocalParse:
+    """
+    Parse a command with the local grammar, checking names against the roster
+
+    The grammar handles lists of names with one status ("Ali, Sara absent
+    today", "mark Ali and Sara Khan as late on 2026-02-06") and whole-class
+    commands. Its confidence is the weakest of its pieces of evidence: one
+    unambiguous status word, a date it could read, and every name matching
+    exactly one student (or every section and exception existing). Negations,
+    mixed statuses and unknown names give a low confidence, so those commands
+    go to the LLM.
+    """
+    parsed_date = extract_command_date(command)
+    if parsed_date is None and re.search(r'\byesterday\b', command, re.IGNORECASE):
+        parsed_date = datetime.utcnow() - timedelta(days=1)
+    text = command
+    for pattern in DATE_PATTERNS:
+        text = pattern.sub(" ", text)
+    text = RELATIVE_DAY_PATTERN.sub(" ", text)
+    # "on" that is not part of a date it could read, e.g. "on Monday"
+    date_confidence = 0.5 if re.search(r'\bon\b', text, re.IGNORECASE) else 1.0
+    text = re.sub(r'\bon\b', " ", text, flags=re.IGNORECASE)
+    parsed_date = parsed_date or datetime.utcnow()
+
+    whole_class = parse_whole_class_command(command)
+    if whole_class:
+        section, status, except_students, except_status = whole_class
+        confidences = [date_confidence, 1.0 if get_section_by_name(db, section) else 0.3]
+        confidences.append(1.0 if STATUS_WORD_PATTERN.search(command) else 0.5)
+        resolved = []
+        for name in except_students:
+            name, confidence = _name_confidence(db, [word for word in name.split() if word.lower() not in FILLER_WORDS])
+            resolved.append(name)
+            confidences.append(confidence)
+        except_match = EXCEPT_PATTERN.search(command)
+        if NEGATION_PATTERN.search(command[:except_match.start()] if except_match else command):
+            confidences.append(0.0)
+        # Words before "everyone in 7B" other than the date, e.g. "Ali and everyone in 7B"
+        before = command[:WHOLE_CLASS_PATTERN.search(command).start()]
+        for pattern in [*DATE_PATTERNS, RELATIVE_DAY_PATTERN]:
+            before = pattern.sub(" ", before)
+        if [word for word in re.findall(r"[A-Za-z'-]+", before) if word.lower() not in FILLER_WORDS | {"on"}]:
+            confidences.append(0.3)
+        result = AIParseResponse(
+            students=[], status=status, date=parsed_date, section=section,
+            except_students=resolved, except_status=except_status
+        )
+        return LocalParse(result, round(min(confidences), 3))
+
+    found = {GRAMMAR_STATUS_WORDS[word.lower()] for word in GRAMMAR_STATUS_PATTERN.findall(text)}
+    status = next(iter(found)) if len(found) == 1 else AttendanceStatus.present
+    # No status word means present, but the status may be phrased in words the grammar
+    # doesn't know; several mean the command gives different students different statuses
+    confidences = [date_confidence, {0: 0.5, 1: 1.0}.get(len(found), 0.0)]
+    text = GRAMMAR_STATUS_PATTERN.sub(" ", text)
+    if NEGATION_PATTERN.search(text) or EXCEPT_PATTERN.search(text):
+        confidences.append(0.0)
+
+    names = []
+    for chunk in NAME_SEPARATOR_PATTERN.split(text):
+        words = [word.strip(".!?:") for word in chunk.split()]
+        words = [word for word in words if word and word.lower() not in FILLER_WORDS]
+        if not words:
+            continue
+        name, confidence = _name_confidence(db, words)
+        names.append(name)
+        confidences.append(confidence)
+    if not names:
+        confidences.append(0.0)
+
+    result = AIParseResponse(students=list(dict.fromkeys(names)), status=status, date=parsed_date)
+    return LocalParse(result, round(min(confidences), 3))
 
 
 def mock_parse_attendance_command(command: str) -> AIParseResponse:
     """
     Mock implementation of AI parsing for testing purposes
     """
-    import re
     from datetime import datetime
 
     # Convert command to lowercase for easier processing
     lower_command = command.lower()
+    whole_class = parse_whole_class_command(command)
 
     # Determine status based on keywords
     if "absent" in lower_command:
@@ -171,71 +553,26 @@ def mock_parse_attendance_command(command: str) -> AIParseResponse:
     if not student_names:
         student_names = ["Unknown"]
 
-    # Extract date from the command
-    # Patterns for dates: "on DD MMM YYYY", "on MMM DD YYYY", "on DD/MM/YYYY", "on YYYY-MM-DD", etc.
-    date_pattern1 = r'on\s+(\d{1,2})\s+([a-zA-Z]{3,9})\s+(\d{4})'  # "on 6 Feb 2026"
-    date_pattern2 = r'on\s+([a-zA-Z]{3,9})\s+(\d{1,2})\s+,?\s*(\d{4})'  # "on February 6, 2026"
-    date_pattern3 = r'on\s+(\d{1,2}[\/\-]\d{1,2}[\/\-]\d{4})'  # "on 06/02/2026" or "on 06-02-2026"
-    date_pattern4 = r'on\s+(\d{4}-\d{1,2}-\d{1,2})'  # "on 2026-02-06"
+    if whole_class:
+        section, status, except_students, except_status = whole_class
+        student_names = []
 
-    date_match = None
-    parsed_date = None
-    
-    # Try different date patterns
-    match1 = re.search(date_pattern1, command, re.IGNORECASE)
-    if match1:
-        day, month, year = match1.groups()
-        try:
-            # Convert month name to number
-            month_num = datetime.strptime(month[:3], '%b').month
-            parsed_date = datetime(int(year), month_num, int(day))
-        except ValueError:
-            pass  # Invalid date, continue to try other patterns
-
-    if not parsed_date:
-        match2 = re.search(date_pattern2, command, re.IGNORECASE)
-        if match2:
-            month, day, year = match2.groups()
-            try:
-                # Convert month name to number
-                month_num = datetime.strptime(month[:3], '%b').month
-                parsed_date = datetime(int(year), month_num, int(day))
-            except ValueError:
-                pass  # Invalid date, continue to try other patterns
-
-    if not parsed_date:
-        match3 = re.search(date_pattern3, command, re.IGNORECASE)
-        if match3:
-            date_str = match3.group(1)
-            try:
-                # Try to parse different formats
-                if '/' in date_str:
-                    parsed_date = datetime.strptime(date_str, '%m/%d/%Y')
-                elif '-' in date_str:
-                    parsed_date = datetime.strptime(date_str, '%m-%d-%Y')
-            except ValueError:
-                try:
-                    # Try DD/MM/YYYY or DD-MM-YYYY
-                    if '/' in date_str:
-                        parsed_date = datetime.strptime(date_str, '%d/%m/%Y')
-                    elif '-' in date_str:
-                        parsed_date = datetime.strptime(date_str, '%d-%m-%Y')
-                except ValueError:
-                    pass  # Invalid date format
-
-    if not parsed_date:
-        match4 = re.search(date_pattern4, command, re.IGNORECASE)
-        if match4:
-            date_str = match4.group(1)
-            try:
-                parsed_date = datetime.strptime(date_str, '%Y-%m-%d')
-            except ValueError:
-                pass  # Invalid date format
+    parsed_date = extract_command_date(command)
 
     # If no date was extracted, use current date
     if not parsed_date:
         parsed_date = datetime.utcnow()
 
+    if whole_class:
+        return AIParseResponse(
+            students=[],
+            status=status,
+            date=parsed_date,
+            section=section,
+            except_students=except_students,
+            except_status=except_status
+        )
+
     return AIParseResponse(
         students=student_names,
         status=status,
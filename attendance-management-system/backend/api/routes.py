@@ -1,22 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from database.database import SessionLocal
 from models import models
 from schemas import schemas
 from typing import List
 from datetime import datetime, date, timedelta
 import crud
 from utils import auth
+from utils.auth import get_db
 from passlib.context import CryptContext
 
-# Dependency to get DB session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 router = APIRouter()
 
 # Authentication Routes
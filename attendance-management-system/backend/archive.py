@@ -0,0 +1,384 @@
+import argparse
+import os
+from datetime import datetime, date, time
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from sqlalchemy import and_, delete, func, insert, or_, select
+from sqlalchemy.orm import Session
+
+from database import BASE_DIR, current_tenant
+from models import Attendance, SyncChange, SYNC_ENTITIES
+
+# Closed months are moved out of the live table into one Parquet file per month:
+#   archive/year=2025/month=09/attendance.parquet
+# and a school's months, in a multi-tenant deployment, under archive/tenants/<school>/
+ARCHIVE_DIR = Path(os.environ.get("ATTENDANCE_ARCHIVE_DIR", BASE_DIR / "archive"))
+PARTITION_FILE = "attendance.parquet"
+# Ids per IN (...) list, under SQLite's bound parameter limit
+ID_CHUNK_SIZE = 500
+
+ARCHIVE_SCHEMA = pa.schema([
+    pa.field("id", pa.int64(), nullable=False),
+    pa.field("student_id", pa.int64(), nullable=False),
+    pa.field("day", pa.date32(), nullable=False),
+    pa.field("status", pa.dictionary(pa.int8(), pa.string()), nullable=False),
+])
+
+
+def _month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def _archive_root(archive_dir: Optional[Path]) -> Path:
+    if archive_dir:
+        return Path(archive_dir)
+    tenant = current_tenant.get()
+    return ARCHIVE_DIR / "tenants" / tenant if tenant else ARCHIVE_DIR
+
+
+def partition_path(month: date, archive_dir: Path = None) -> Path:
+    """Get the Parquet file holding the given month"""
+    archive_dir = _archive_root(archive_dir)
+    return archive_dir / f"year={month.year:04d}" / f"month={month.month:02d}" / PARTITION_FILE
+
+
+def archived_months(archive_dir: Path = None) -> List[date]:
+    """List the months that have an archive partition, oldest first"""
+    archive_dir = _archive_root(archive_dir)
+    months = []
+    for path in archive_dir.glob(f"year=*/month=*/{PARTITION_FILE}"):
+        year = int(path.parent.parent.name.split("=", 1)[1])
+        month = int(path.parent.name.split("=", 1)[1])
+        months.append(date(year, month, 1))
+    return sorted(months)
+
+
+def is_archived(target_date: date, archive_dir: Path = None) -> bool:
+    """Check whether the month containing target_date has been archived"""
+    return partition_path(_month_start(target_date), archive_dir).exists()
+
+
+def _write_partition(month: date, table: pa.Table, archive_dir: Path = None) -> int:
+    """Merge rows into a month partition, replacing the file atomically"""
+    path = partition_path(month, archive_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    if path.exists():
+        existing = pq.read_table(path, schema=ARCHIVE_SCHEMA)
+        table = pa.concat_tables([existing, table])
+        # One record per student per day, as in the live table: a row written
+        # into the month after it was archived replaces the archived one, and
+        # re-running the job after a crash between the write and the delete
+        # doesn't duplicate rows. The new rows come last, so the last copy wins.
+        seen = set()
+        keep = []
+        keys = list(zip(table["student_id"].to_pylist(), table["day"].to_pylist()))
+        for index in range(len(keys) - 1, -1, -1):
+            if keys[index] not in seen:
+                seen.add(keys[index])
+                keep.append(index)
+        table = table.take(pa.array(keep[::-1]))
+
+    table = table.sort_by([("day", "ascending"), ("student_id", "ascending")])
+    return _replace_partition(path, table)
+
+
+def _replace_partition(path: Path, table: pa.Table) -> int:
+    tmp_path = path.with_suffix(".parquet.tmp")
+    pq.write_table(table, tmp_path, compression="zstd", use_dictionary=["status"])
+    os.replace(tmp_path, path)
+    return path.stat().st_size
+
+
+def next_month(month: date) -> date:
+    """The first day of the month after the given month start"""
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def archive_closed_months(db: Session, before: Optional[date] = None, archive_dir: Path = None) -> List[dict]:
+    """
+    Move attendance rows of closed months from SQLite into Parquet partitions
+
+    A month is closed once it lies entirely before `before` (default: the
+    first day of the current month). Months are moved one at a time, each in
+    its own transaction: its rows are deleted (which takes the write lock,
+    so none can change meanwhile), written to the partition, and the delete
+    is committed once the partition is on disk. Only one month is held in
+    memory, and a run that stops halfway leaves the finished months archived.
+    """
+    cutoff = _month_start(before or datetime.utcnow().date())
+    oldest = db.query(func.min(Attendance.day)).filter(Attendance.day < cutoff).scalar()
+
+    results = []
+    month = _month_start(oldest) if oldest else cutoff
+    while month < cutoff:
+        following = next_month(month)
+        month_rows = db.execute(
+            delete(Attendance)
+            .where(Attendance.day >= month, Attendance.day < following)
+            .returning(Attendance.id, Attendance.student_id, Attendance.day, Attendance.status)
+        ).all()
+        if not month_rows:
+            db.rollback()
+            month = following
+            continue
+
+        table = pa.table({
+            "id": [r[0] for r in month_rows],
+            "student_id": [r[1] for r in month_rows],
+            "day": [r[2] for r in month_rows],
+            "status": [str(r[3]).capitalize() for r in month_rows],
+        }, schema=ARCHIVE_SCHEMA)
+        try:
+            size = _write_partition(month, table, archive_dir)
+        except Exception:
+            db.rollback()
+            raise
+
+        # Archived rows aren't deleted as far as sync clients are concerned: drop their tombstones
+        ids = [r[0] for r in month_rows]
+        for chunk in range(0, len(ids), ID_CHUNK_SIZE):
+            db.query(SyncChange).filter(
+                SyncChange.entity == SYNC_ENTITIES["attendance"],
+                SyncChange.entity_id.in_(ids[chunk:chunk + ID_CHUNK_SIZE]),
+            ).delete(synchronize_session=False)
+        db.commit()
+
+        results.append({"month": month.strftime("%Y-%m"), "rows": len(month_rows), "bytes": size})
+        month = following
+    return results
+
+
+def max_archived_id(archive_dir: Path = None) -> int:
+    """The largest attendance id in the archive, 0 if it is empty"""
+    largest = 0
+    for month in archived_months(archive_dir):
+        ids = pq.read_table(partition_path(month, archive_dir), columns=["id"])["id"]
+        largest = max(largest, pc.max(ids).as_py() or 0)
+    return largest
+
+
+def _keys_by_month(keys: Iterable[Tuple[int, date]]) -> dict:
+    by_month = {}
+    for student_id, day in keys:
+        by_month.setdefault(_month_start(day), set()).add((student_id, day))
+    return by_month
+
+
+def reopen_archived(db: Session, keys: Iterable[Tuple[int, date]], archive_dir: Path = None) -> int:
+    """
+    Copy the archived records of (student_id, day) keys back into the live table
+
+    Called by the write paths before they upsert, so a write into an archived
+    month updates the archived record, keeping its id, instead of adding a
+    second record for the student's day. The live copy shadows the archived
+    one in every read (see live_keys) until the month is archived again,
+    which merges it over the archived row. Returns the number of records copied.
+    """
+    rows = []
+    for month, month_keys in _keys_by_month(keys).items():
+        path = partition_path(month, archive_dir)
+        if not path.exists():
+            continue
+        table = pq.read_table(path, schema=ARCHIVE_SCHEMA, filters=[
+            ("student_id", "in", sorted({student_id for student_id, _ in month_keys})),
+            ("day", "in", sorted({day for _, day in month_keys})),
+        ])
+        rows.extend(
+            {
+                "id": row["id"],
+                "student_id": row["student_id"],
+                "day": row["day"],
+                "date": datetime.combine(row["day"], time()),
+                "status": row["status"],
+            }
+            for row in table.to_pylist() if (row["student_id"], row["day"]) in month_keys
+        )
+    if rows:
+        # A record that is already live wins over its archived copy
+        db.execute(insert(Attendance).prefix_with("OR IGNORE"), rows)
+    return len(rows)
+
+
+def reopen_archived_id(db: Session, attendance_id: int, archive_dir: Path = None) -> bool:
+    """
+    Copy the archived record with the given id back into the live table
+
+    As reopen_archived, for the update and delete paths, which address a
+    record by id. Returns whether an archived record had that id.
+    """
+    for month in archived_months(archive_dir):
+        table = pq.read_table(partition_path(month, archive_dir), columns=["student_id", "day"],
+                              filters=[("id", "=", attendance_id)], schema=ARCHIVE_SCHEMA)
+        if table.num_rows:
+            row = table.to_pylist()[0]
+            reopen_archived(db, [(row["student_id"], row["day"])], archive_dir)
+            return True
+    return False
+
+
+def drop_archived(keys: Iterable[Tuple[int, date]], archive_dir: Path = None) -> int:
+    """
+    Remove the archived records of (student_id, day) keys from their partitions
+
+    Called when a live record is deleted or moved to another student or
+    day: its archived copy, no longer shadowed, would otherwise come back in
+    every read. Returns the number of records removed.
+    """
+    removed = 0
+    for month, month_keys in _keys_by_month(keys).items():
+        path = partition_path(month, archive_dir)
+        if not path.exists():
+            continue
+        table = pq.read_table(path, schema=ARCHIVE_SCHEMA)
+        keep = [
+            key not in month_keys
+            for key in zip(table["student_id"].to_pylist(), table["day"].to_pylist())
+        ]
+        if all(keep):
+            continue
+        removed += keep.count(False)
+        _replace_partition(path, table.filter(pa.array(keep, pa.bool_())))
+    return removed
+
+
+def live_keys(db: Session, start: Optional[date] = None, end: Optional[date] = None,
+              student_id: Optional[int] = None, archive_dir: Path = None) -> Set[Tuple[int, date]]:
+    """
+    The (student_id, day) keys of live records in archived months
+
+    These are archived records reopened by a later write; reads skip their
+    archived copies. Usually there are none, and only the archived months
+    in the range are queried, runs of consecutive months as one day range.
+    """
+    ranges = []
+    for month in archived_months(archive_dir):
+        if (start and next_month(month) <= start) or (end and month > end):
+            continue
+        if ranges and ranges[-1][1] == month:
+            ranges[-1][1] = next_month(month)
+        else:
+            ranges.append([month, next_month(month)])
+    if not ranges:
+        return set()
+
+    query = select(Attendance.student_id, Attendance.day).where(
+        or_(*[and_(Attendance.day >= first, Attendance.day < until) for first, until in ranges])
+    )
+    if start:
+        query = query.where(Attendance.day >= start)
+    if end:
+        query = query.where(Attendance.day <= end)
+    if student_id is not None:
+        query = query.where(Attendance.student_id == student_id)
+    return {(row_student_id, day) for row_student_id, day in db.execute(query)}
+
+
+def _read_partition(path: Path, columns: List[str], filters: Optional[list],
+                    exclude: Optional[Set[Tuple[int, date]]]) -> pa.Table:
+    """Read one partition, dropping the rows whose (student_id, day) is in exclude"""
+    if not exclude:
+        return pq.read_table(path, columns=columns, filters=filters, schema=ARCHIVE_SCHEMA)
+    key_columns = [name for name in ("student_id", "day") if name not in columns]
+    table = pq.read_table(path, columns=columns + key_columns, filters=filters, schema=ARCHIVE_SCHEMA)
+    keep = [
+        key not in exclude
+        for key in zip(table["student_id"].to_pylist(), table["day"].to_pylist())
+    ]
+    return table.filter(pa.array(keep, pa.bool_())).select(columns)
+
+
+def _partitions_in_range(start: Optional[date], end: Optional[date], archive_dir: Path = None) -> List[Path]:
+    months = archived_months(archive_dir)
+    if start:
+        months = [m for m in months if m >= _month_start(start)]
+    if end:
+        months = [m for m in months if m <= _month_start(end)]
+    return [partition_path(m, archive_dir) for m in months]
+
+
+def _archive_filters(start, end, student_id, status, student_ids=None) -> Optional[list]:
+    filters = []
+    if start:
+        filters.append(("day", ">=", start))
+    if end:
+        filters.append(("day", "<=", end))
+    if student_id is not None:
+        filters.append(("student_id", "=", student_id))
+    if student_ids is not None:
+        filters.append(("student_id", "in", list(student_ids)))
+    if status:
+        filters.append(("status", "=", status))
+    return filters or None
+
+
+def read_archive(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    columns: Optional[Iterable[str]] = None,
+    student_id: Optional[int] = None,
+    status: Optional[str] = None,
+    archive_dir: Path = None,
+    student_ids: Optional[Iterable[int]] = None,
+    exclude: Optional[Set[Tuple[int, date]]] = None,
+) -> pa.Table:
+    """
+    Read archived attendance between start and end (inclusive)
+
+    Only the month partitions overlapping the range are opened and only the
+    requested columns are decoded. Rows whose (student_id, day) is in
+    exclude, such as the live_keys of the range, are left out.
+    """
+    columns = list(columns) if columns else ARCHIVE_SCHEMA.names
+    schema = pa.schema([ARCHIVE_SCHEMA.field(name) for name in columns])
+    paths = _partitions_in_range(start, end, archive_dir)
+    if not paths:
+        return schema.empty_table()
+
+    filters = _archive_filters(start, end, student_id, status, student_ids)
+    tables = [_read_partition(path, columns, filters, exclude) for path in paths]
+    return pa.concat_tables(tables).cast(schema)
+
+
+def iter_archive(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    columns: Optional[Iterable[str]] = None,
+    student_id: Optional[int] = None,
+    status: Optional[str] = None,
+    batch_size: int = 1000,
+    archive_dir: Path = None,
+    exclude: Optional[Set[Tuple[int, date]]] = None,
+) -> Iterator[List[dict]]:
+    """
+    Yield archived attendance in batches of row dicts, one month at a time
+
+    At most one month partition is held in memory. Rows whose
+    (student_id, day) is in exclude are left out, as in read_archive.
+    """
+    columns = list(columns) if columns else ARCHIVE_SCHEMA.names
+    filters = _archive_filters(start, end, student_id, status)
+    for path in _partitions_in_range(start, end, archive_dir):
+        table = _read_partition(path, columns, filters, exclude)
+        for batch in table.to_batches(max_chunksize=batch_size):
+            yield batch.to_pylist()
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Archive closed months of attendance to Parquet")
+    parser.add_argument("--before", help="Archive months before this date (YYYY-MM-DD), default: current month")
+    args = parser.parse_args()
+
+    before = datetime.strptime(args.before, "%Y-%m-%d").date() if args.before else None
+    db = SessionLocal()
+    try:
+        for result in archive_closed_months(db, before=before):
+            print(f"{result['month']}: {result['rows']} rows, {result['bytes']} bytes")
+    finally:
+        db.close()
@@ -1,34 +1,100 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from datetime import datetime, date
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from datetime import datetime, date, time
 from models import Attendance, Student
-from schemas import AttendanceCreate, AttendanceUpdate, AttendancePercentage
-from typing import List
+import archive
+from live_feed import publish_attendance_changes
+from streaks import refresh_streaks
+from schemas import (
+    AttendanceCreate,
+    AttendanceUpdate,
+    AttendancePercentage,
+    AttendanceStatus,
+    AttendanceWriteResult,
+    WriteAction
+)
+from typing import Dict, Iterator, List, Optional
 
+# Four bound parameters per row keeps each statement under SQLite's variable limit
+UPSERT_CHUNK_SIZE = 500
+STREAM_BATCH_SIZE = 1000
 
-def create_attendance_record(db: Session, attendance: AttendanceCreate) -> Attendance:
-    """Create a new attendance record"""
-    db_attendance = Attendance(
-        student_id=attendance.student_id,
-        status=attendance.status,
-        date=attendance.date or datetime.utcnow()
-    )
-    db.add(db_attendance)
+
+def upsert_attendance_records(db: Session, records: List[AttendanceCreate]) -> List[AttendanceWriteResult]:
+    """
+    Insert or update attendance records in a single transaction
+
+    Records are keyed by (student_id, day): marking a student twice on the
+    same day updates the existing row instead of adding a duplicate, also
+    when that row has been archived. Each result reports whether its row
+    was inserted or updated.
+    """
+    now = datetime.utcnow()
+    rows = {}
+    for record in records:
+        record_date = record.date or now
+        # Within one batch the last record for a student and day wins
+        rows[(record.student_id, record_date.date())] = {
+            "student_id": record.student_id,
+            "status": AttendanceStatus(record.status).value,
+            "date": record_date,
+            "day": record_date.date(),
+        }
+    if not rows:
+        return []
+
+    # Archived records of these days come back live first, so they are updated in place
+    archive.reopen_archived(db, rows.keys())
+    # Row ids only grow, so any returned id above the current maximum was inserted
+    max_id = db.query(func.max(Attendance.id)).scalar() or 0
+
+    values = list(rows.values())
+    results = []
+    for start in range(0, len(values), UPSERT_CHUNK_SIZE):
+        stmt = sqlite_insert(Attendance).values(values[start:start + UPSERT_CHUNK_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Attendance.student_id, Attendance.day],
+            set_={"status": stmt.excluded.status, "date": stmt.excluded.date}
+        ).returning(Attendance)
+        for db_attendance in db.scalars(stmt, execution_options={"populate_existing": True}):
+            results.append(AttendanceWriteResult.model_validate({
+                "id": db_attendance.id,
+                "student_id": db_attendance.student_id,
+                "status": db_attendance.status,
+                "date": db_attendance.date,
+                "created_at": db_attendance.created_at,
+                "action": WriteAction.inserted if db_attendance.id > max_id else WriteAction.updated,
+            }))
+    refresh_streaks(db, {row["student_id"] for row in values})
     db.commit()
-    db.refresh(db_attendance)
-    return db_attendance
+    publish_attendance_changes(db, [(result.action.value, result, result.date.date()) for result in results])
+    return results
+
+
+def create_attendance_record(db: Session, attendance: AttendanceCreate) -> AttendanceWriteResult:
+    """Create or update the attendance record for a student's day"""
+    return upsert_attendance_records(db, [attendance])[0]
 
 
 def get_attendance_by_date(db: Session, target_date: date) -> List[Attendance]:
-    """Get all attendance records for a specific date"""
-    # Calculate the start and end of the target date for filtering
-    start_datetime = datetime.combine(target_date, datetime.min.time())
-    end_datetime = datetime.combine(target_date, datetime.max.time())
-    
-    return db.query(Attendance).filter(
-        Attendance.date >= start_datetime,
-        Attendance.date <= end_datetime
-    ).all()
+    """Get all attendance records for a specific date, archived ones as detached objects"""
+    records = db.query(Attendance).filter(Attendance.day == target_date).all()
+    for batch in _iter_archived_day(db, target_date):
+        records.extend(
+            Attendance(id=row["id"], student_id=row["student_id"], status=row["status"],
+                       date=datetime.combine(row["day"], time()), day=row["day"])
+            for row in batch
+        )
+    return sorted(records, key=lambda record: record.id)
+
+
+def _iter_archived_day(db: Session, target_date: date) -> Iterator[List[dict]]:
+    """A day's archived rows not shadowed by live ones; nothing unless its month is archived"""
+    if not archive.is_archived(target_date):
+        return iter(())
+    return archive.iter_archive(target_date, target_date,
+                                exclude=archive.live_keys(db, target_date, target_date))
 
 
 def get_attendance_by_student(db: Session, student_id: int) -> List[Attendance]:
@@ -36,37 +102,175 @@ def get_attendance_by_student(db: Session, student_id: int) -> List[Attendance]:
     return db.query(Attendance).filter(Attendance.student_id == student_id).all()
 
 
+def _stream_partitions(db: Session, query, batch_size: int) -> Iterator[list]:
+    """Run a Core select on a server-side cursor, yielding batch_size row mappings at a time"""
+    result = db.execute(query.execution_options(yield_per=batch_size))
+    for partition in result.mappings().partitions():
+        yield partition
+
+
+def iter_attendance_by_date(db: Session, target_date: date, batch_size: int = STREAM_BATCH_SIZE) -> Iterator[list]:
+    """
+    Yield a day's attendance with student names in batches of row mappings
+
+    Rows are plain column tuples rather than ORM objects, so nothing is
+    added to the session's identity map. A day of an archived month merges
+    its archived rows, which have no time of day or created_at, with the
+    live ones by id.
+    """
+    query = select(
+        Attendance.id, Attendance.student_id, Student.name.label("student_name"),
+        Attendance.status, Attendance.date, Attendance.created_at
+    ).join(Student, Student.id == Attendance.student_id).where(Attendance.day == target_date)
+
+    archived = [row for batch in _iter_archived_day(db, target_date) for row in batch]
+    if not archived:
+        yield from _stream_partitions(db, query.order_by(Attendance.id), batch_size)
+        return
+
+    # One day of one school's records, so merged in memory
+    student_ids = sorted({row["student_id"] for row in archived})
+    names = {}
+    for start in range(0, len(student_ids), archive.ID_CHUNK_SIZE):
+        names.update(db.execute(select(Student.id, Student.name).where(
+            Student.id.in_(student_ids[start:start + archive.ID_CHUNK_SIZE])
+        )).all())
+    rows = [dict(row) for row in db.execute(query).mappings()]
+    rows.extend(
+        {
+            "id": row["id"], "student_id": row["student_id"], "student_name": names.get(row["student_id"]),
+            "status": row["status"], "date": datetime.combine(row["day"], time()), "created_at": None,
+        }
+        for row in archived if row["student_id"] in names
+    )
+    rows.sort(key=lambda row: row["id"])
+    for offset in range(0, len(rows), batch_size):
+        yield rows[offset:offset + batch_size]
+
+
+def iter_attendance_by_student(
+    db: Session,
+    student_id: int,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    status: Optional[str] = None,
+    batch_size: int = STREAM_BATCH_SIZE,
+) -> Iterator[list]:
+    """
+    Yield a student's attendance history, archived and live, in batches of row mappings
+
+    Live rows are fetched from a server-side cursor batch_size at a time,
+    so memory use does not grow with the length of the history. The
+    archived part is one student's rows of the month partitions, merged
+    with the live rows of archived months, which are the archived records
+    reopened by a later write. Archived rows have no time of day or created_at.
+    """
+    query = select(
+        Attendance.id, Attendance.student_id, Attendance.status, Attendance.date, Attendance.created_at
+    ).where(Attendance.student_id == student_id)
+    if start:
+        query = query.where(Attendance.day >= start)
+    if end:
+        query = query.where(Attendance.day <= end)
+    if status:
+        query = query.where(Attendance.status == status)
+
+    months = archive.archived_months()
+    if months:
+        archived_until = archive.next_month(months[-1])
+        by_day = {
+            row["day"]: {
+                "id": row["id"], "student_id": row["student_id"], "status": row["status"],
+                "date": datetime.combine(row["day"], time()), "created_at": None,
+            }
+            for row in archive.read_archive(start, end, student_id=student_id, status=status).to_pylist()
+        }
+        # A live row replaces the archived copy of its day
+        for row in db.execute(query.where(Attendance.day < archived_until)).mappings():
+            by_day[row["date"].date()] = row
+        history = [by_day[day] for day in sorted(by_day)]
+        for offset in range(0, len(history), batch_size):
+            yield history[offset:offset + batch_size]
+        query = query.where(Attendance.day >= archived_until)
+
+    yield from _stream_partitions(db, query.order_by(Attendance.day), batch_size)
+
+
+def count_attendance_statuses(db: Session, *criteria) -> Dict[str, int]:
+    """Count attendance rows matching `criteria` per status, in the database"""
+    query = select(Attendance.status, func.count(Attendance.id)).where(*criteria).group_by(Attendance.status)
+    return dict(db.execute(query).all())
+
+
+def _add_archived_statuses(db: Session, counts: Dict[str, int], start: Optional[date] = None,
+                          end: Optional[date] = None, student_id: Optional[int] = None) -> Dict[str, int]:
+    """Add the archived rows of a day range and/or student to per-status counts of live rows"""
+    archived = archive.read_archive(start, end, columns=["status"], student_id=student_id,
+                                    exclude=archive.live_keys(db, start, end, student_id))
+    for entry in archived["status"].value_counts().to_pylist():
+        counts[entry["values"]] = counts.get(entry["values"], 0) + entry["counts"]
+    return counts
+
+
 def get_attendance_by_student_and_date(db: Session, student_id: int, target_date: date) -> List[Attendance]:
     """Get attendance records for a specific student on a specific date"""
-    # Calculate the start and end of the target date for filtering
-    start_datetime = datetime.combine(target_date, datetime.min.time())
-    end_datetime = datetime.combine(target_date, datetime.max.time())
-    
     return db.query(Attendance).filter(
         Attendance.student_id == student_id,
-        Attendance.date >= start_datetime,
-        Attendance.date <= end_datetime
+        Attendance.day == target_date
     ).all()
 
 
+def _find_record(db: Session, attendance_id: int) -> Optional[Attendance]:
+    """The live record with the given id, reopened from the archive if it has been archived"""
+    db_attendance = db.query(Attendance).filter(Attendance.id == attendance_id).first()
+    if db_attendance is None and archive.reopen_archived_id(db, attendance_id):
+        db_attendance = db.query(Attendance).filter(Attendance.id == attendance_id).first()
+    return db_attendance
+
+
 def update_attendance_record(db: Session, attendance_id: int, attendance_update: AttendanceUpdate) -> Attendance:
     """Update an attendance record"""
-    db_attendance = db.query(Attendance).filter(Attendance.id == attendance_id).first()
+    db_attendance = _find_record(db, attendance_id)
     if db_attendance:
+        previous_day = db_attendance.day
+        previous_student_id = db_attendance.student_id
+        # Moving onto a day with an archived record collides with it, as with a live one
+        new_day = (attendance_update.date or db_attendance.date).date()
+        if (attendance_update.student_id, new_day) != (previous_student_id, previous_day):
+            archive.reopen_archived(db, [(attendance_update.student_id, new_day)])
         db_attendance.student_id = attendance_update.student_id
         db_attendance.status = attendance_update.status
-        db_attendance.date = attendance_update.date
+        db_attendance.date = attendance_update.date or db_attendance.date
+        db_attendance.day = db_attendance.date.date()
+        refresh_streaks(db, {previous_student_id, db_attendance.student_id})
+        db.flush()
+        # The archived copy of the old student and day is no longer shadowed by the record
+        if (db_attendance.student_id, db_attendance.day) != (previous_student_id, previous_day):
+            archive.drop_archived([(previous_student_id, previous_day)])
         db.commit()
         db.refresh(db_attendance)
+        changes = [("updated", db_attendance, db_attendance.day)]
+        if previous_day != db_attendance.day:
+            # Clients watching the old day see the record leave it; sent first
+            # so clients watching every day end up with the updated record
+            changes.insert(0, ("deleted", db_attendance, previous_day))
+        publish_attendance_changes(db, changes)
     return db_attendance
 
 
 def delete_attendance_record(db: Session, attendance_id: int) -> bool:
-    """Delete an attendance record by ID"""
-    db_attendance = db.query(Attendance).filter(Attendance.id == attendance_id).first()
+    """Delete an attendance record by ID, live or archived"""
+    db_attendance = _find_record(db, attendance_id)
     if db_attendance:
+        day = db_attendance.day
         db.delete(db_attendance)
+        refresh_streaks(db, [db_attendance.student_id])
+        db.flush()
+        # Removed from its partition too, or the archived copy would come back in reads;
+        # before the commit, so a failed rewrite leaves the record in place
+        archive.drop_archived([(db_attendance.student_id, day)])
         db.commit()
+        publish_attendance_changes(db, [("deleted", db_attendance, day)])
         return True
     return False
 
@@ -77,23 +281,12 @@ def calculate_attendance_percentage(db: Session, student_id: int) -> AttendanceP
     if not student:
         return None
     
-    all_attendance = get_attendance_by_student(db, student_id)
-    
-    if not all_attendance:
-        return AttendancePercentage(
-            student_id=student_id,
-            student_name=student.name,
-            total_days=0,
-            present_days=0,
-            absent_days=0,
-            late_days=0,
-            percentage=0.0
-        )
-    
-    total_days = len(all_attendance)
-    present_days = sum(1 for att in all_attendance if att.status.lower() == 'present')
-    absent_days = sum(1 for att in all_attendance if att.status.lower() == 'absent')
-    late_days = sum(1 for att in all_attendance if att.status.lower() == 'late')
+    counts = count_attendance_statuses(db, Attendance.student_id == student_id)
+    _add_archived_statuses(db, counts, student_id=student_id)
+    total_days = sum(counts.values())
+    present_days = counts.get(AttendanceStatus.present.value, 0)
+    absent_days = counts.get(AttendanceStatus.absent.value, 0)
+    late_days = counts.get(AttendanceStatus.late.value, 0)
     
     percentage = (present_days / total_days) * 100 if total_days > 0 else 0
     
@@ -110,12 +303,12 @@ def calculate_attendance_percentage(db: Session, student_id: int) -> AttendanceP
 
 def get_attendance_summary_by_date(db: Session, target_date: date) -> dict:
     """Get attendance summary for a specific date"""
-    attendance_records = get_attendance_by_date(db, target_date)
-    
-    total = len(attendance_records)
-    present = sum(1 for att in attendance_records if att.status.lower() == 'present')
-    absent = sum(1 for att in attendance_records if att.status.lower() == 'absent')
-    late = sum(1 for att in attendance_records if att.status.lower() == 'late')
+    counts = count_attendance_statuses(db, Attendance.day == target_date)
+    _add_archived_statuses(db, counts, target_date, target_date)
+    total = sum(counts.values())
+    present = counts.get(AttendanceStatus.present.value, 0)
+    absent = counts.get(AttendanceStatus.absent.value, 0)
+    late = counts.get(AttendanceStatus.late.value, 0)
     
     return {
         "date": target_date.isoformat(),
@@ -0,0 +1,103 @@
+"""
+AI parsing under a burst of teachers: unbounded LLM calls vs admission control
+
+Points the Groq client at benchmarks.fake_llm_server and fires `--teachers`
+concurrent commands, each teacher sending `--commands` in a row. Without
+admission control the provider answers most of the burst with 429s and the
+client's retries make those requests slow before they fall back anyway.
+
+    python -m benchmarks.bench_ai_admission --teachers 40 --commands 3
+"""
+import argparse
+import os
+import statistics
+import threading
+import time
+
+from benchmarks.fake_llm_server import FakeLLMServer
+
+server = FakeLLMServer(("127.0.0.1", 0))
+os.environ["GROQ_API_KEY"] = "fake"
+os.environ["GROQ_BASE_URL"] = server.url
+# The Groq client's own default, so 429s are retried as before admission control
+os.environ.setdefault("LLM_MAX_RETRIES", "2")
+
+import ai_parser
+from admission import AdmissionController, CircuitBreaker, queue_depth
+
+
+def run(controller: AdmissionController, teachers: int, commands: int):
+    ai_parser.llm_admission = controller
+    server.accepted = server.rate_limited = 0
+    fallbacks_before = sum(ai_parser.fallbacks._values.values())
+    latencies, max_depth = [], [0]
+    done = threading.Event()
+
+    def watch_queue():
+        while not done.is_set():
+            max_depth[0] = max(max_depth[0], queue_depth.value())
+            time.sleep(0.005)
+
+    def teacher(index):
+        for number in range(commands):
+            started = time.perf_counter()
+            ai_parser.parse_attendance_command(f"Student{index} and Pupil{number} are late")
+            latencies.append(time.perf_counter() - started)
+
+    watcher = threading.Thread(target=watch_queue)
+    watcher.start()
+    threads = [threading.Thread(target=teacher, args=(index,)) for index in range(teachers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    watcher.join()
+
+    latencies.sort()
+    return {
+        "elapsed": elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p95": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "max": latencies[-1] * 1000,
+        "llm": server.accepted,
+        "429": server.rate_limited,
+        "fallback": sum(ai_parser.fallbacks._values.values()) - fallbacks_before,
+        "max_depth": max_depth[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--teachers", type=int, default=40)
+    parser.add_argument("--commands", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--provider-limit", type=int, default=10, help="fake provider requests/second")
+    args = parser.parse_args()
+
+    server.latency, server.limit = args.latency, args.provider_limit
+    server.start()
+    print(f"{args.teachers} teachers x {args.commands} commands, provider {args.provider_limit} req/s, "
+          f"{args.latency * 1000:.0f} ms latency")
+
+    # Silence the parser's per-request debug prints; keep the breaker out of the comparison
+    ai_parser.print = lambda *a, **k: None
+    ai_parser.llm_breaker = CircuitBreaker(failure_threshold=10**9)
+    ai_parser.LLM_DEADLINE_SECONDS = 30.0
+
+    unbounded = AdmissionController(max_concurrency=10**6, rate_per_second=10**6, burst=10**6, max_queue=10**6)
+    guarded = AdmissionController(
+        max_concurrency=4, rate_per_second=args.provider_limit * 0.8, burst=4, max_queue=16, max_wait=1.0
+    )
+    for label, controller in (("unbounded", unbounded), ("admission", guarded)):
+        result = run(controller, args.teachers, args.commands)
+        print(f"{label:>9}: {result['elapsed']:.1f}s total, p50 {result['p50']:.0f} ms, "
+              f"p95 {result['p95']:.0f} ms, max {result['max']:.0f} ms | "
+              f"LLM answers {result['llm']}, provider 429s {result['429']}, "
+              f"fallbacks {result['fallback']}, peak queue {result['max_depth']:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+AI parsing against a flaky provider: deadlines, circuit breaker and hedging
+
+Drives parse_attendance_command through four provider phases (healthy,
+failing with 500s, stalled, recovered) served by benchmarks.fake_llm_server,
+once without a breaker, once with one, and once with hedging enabled.
+
+    python -m benchmarks.bench_ai_breaker --commands 40 --deadline 1.0
+"""
+import argparse
+import os
+import statistics
+import threading
+import time
+
+from benchmarks.fake_llm_server import FakeLLMServer
+
+server = FakeLLMServer(("127.0.0.1", 0), latency=0.2, jitter=0.05, limit=1000)
+os.environ["GROQ_API_KEY"] = "fake"
+os.environ["GROQ_BASE_URL"] = server.url
+
+import ai_parser
+from admission import AdmissionController, CircuitBreaker
+
+PHASES = [
+    ("healthy", {"error_rate": 0.0, "stall": 0.0}),
+    ("failing", {"error_rate": 1.0, "stall": 0.0}),
+    ("stalled", {"error_rate": 0.0, "stall": 5.0}),
+    ("recovered", {"error_rate": 0.0, "stall": 0.0}),
+]
+
+
+def llm_answers(hedge: bool) -> int:
+    if hedge:
+        return ai_parser.hedges.value(winner="llm")
+    return ai_parser.llm_seconds.count(outcome="ok")
+
+
+def run_phase(commands: int, teachers: int, hedge: bool):
+    latencies = []
+    accepted_before = server.accepted
+    answers_before = llm_answers(hedge)
+
+    def teacher(index):
+        for number in range(index, commands, teachers):
+            started = time.perf_counter()
+            ai_parser.parse_attendance_command(f"Student {chr(65 + number % 26)}{'x' * (number // 26)} is late")
+            latencies.append(time.perf_counter() - started)
+            time.sleep(0.1)
+
+    threads = [threading.Thread(target=teacher, args=(index,)) for index in range(teachers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+    return {
+        "elapsed": time.perf_counter() - started,
+        "p50": statistics.median(latencies) * 1000,
+        "max": latencies[-1] * 1000,
+        "llm_calls": server.accepted - accepted_before,
+        "llm_answers": llm_answers(hedge) - answers_before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--commands", type=int, default=40, help="commands per phase")
+    parser.add_argument("--teachers", type=int, default=4)
+    parser.add_argument("--deadline", type=float, default=1.0)
+    parser.add_argument("--hedge-after", type=float, default=0.3)
+    parser.add_argument("--reset", type=float, default=1.0, help="seconds before the breaker half-opens")
+    args = parser.parse_args()
+
+    server.start()
+    ai_parser.print = lambda *a, **k: None
+    ai_parser.llm_admission = AdmissionController(max_concurrency=64, rate_per_second=1000, burst=1000)
+    ai_parser.LLM_DEADLINE_SECONDS = args.deadline
+    ai_parser.LLM_HEDGE_AFTER_SECONDS = args.hedge_after
+    print(f"{args.commands} commands per phase from {args.teachers} teachers, "
+          f"{args.deadline:.1f}s deadline, provider latency {server.latency * 1000:.0f} ms")
+
+    setups = [
+        ("no breaker", CircuitBreaker(failure_threshold=10**9), False),
+        ("breaker", CircuitBreaker(failure_threshold=3, reset_timeout=args.reset), False),
+        ("breaker+hedge", CircuitBreaker(failure_threshold=3, reset_timeout=args.reset), True),
+    ]
+    for label, breaker, hedge in setups:
+        ai_parser.llm_breaker = breaker
+        ai_parser.LLM_HEDGE = hedge
+        print(f"\n{label}")
+        for phase, settings in PHASES:
+            for name, value in settings.items():
+                setattr(server, name, value)
+            # Let background calls drain and an open breaker reach its half-open window
+            time.sleep(args.reset + args.deadline)
+            result = run_phase(args.commands, args.teachers, hedge)
+            print(f"  {phase:>9}: {result['elapsed']:5.1f}s, p50 {result['p50']:6.0f} ms, "
+                  f"max {result['max']:6.0f} ms, provider calls {result['llm_calls']:3d}, "
+                  f"answered by LLM {result['llm_answers']:3d}, breaker {breaker.state}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Parquet archive benchmark: compression ratio and report query time
+
+    python -m benchmarks.bench_archive --students 500 --days 365
+"""
+import argparse
+import os
+from datetime import date
+
+from sqlalchemy import text
+
+import archive
+from utils import reporting
+from benchmarks.common import temp_database, seed, timed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    with temp_database() as (engine, SessionLocal, workdir):
+        archive_dir = workdir / "archive"
+        db = SessionLocal()
+        seed(db, args.students, args.days)
+        rows = db.execute(text("SELECT count(*) FROM attendance")).scalar()
+        probe = date(2024, 3, 12)
+
+        live_ms = timed(lambda: reporting.get_attendance_summary(db, probe))
+
+        db.execute(text("VACUUM"))
+        sqlite_bytes = os.path.getsize(workdir / "bench.db")
+
+        original_dir = archive.ARCHIVE_DIR
+        archive.ARCHIVE_DIR = archive_dir
+        try:
+            archive.archive_closed_months(db, before=date(2025, 1, 1), archive_dir=archive_dir)
+            db.execute(text("VACUUM"))
+            parquet_bytes = sum(p.stat().st_size for p in archive_dir.rglob("*.parquet"))
+            archived_ms = timed(lambda: reporting.get_attendance_summary(db, probe))
+            year_ms = timed(lambda: archive.read_archive(date(2024, 1, 1), date(2024, 12, 31), columns=["status"]), 3)
+        finally:
+            archive.ARCHIVE_DIR = original_dir
+        db.close()
+
+    print(f"rows:                  {rows}")
+    print(f"sqlite file:           {sqlite_bytes / 1e6:.2f} MB")
+    print(f"parquet partitions:    {parquet_bytes / 1e6:.2f} MB  (ratio {sqlite_bytes / parquet_bytes:.1f}x)")
+    print(f"day summary, live:     {live_ms:.2f} ms")
+    print(f"day summary, archived: {archived_ms:.2f} ms")
+    print(f"year status scan:      {year_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
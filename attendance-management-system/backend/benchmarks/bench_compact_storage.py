@@ -0,0 +1,148 @@
+"""
+Compact attendance encoding: file size, index size and aggregate queries
+
+Builds a database in the previous text layout (ISO date strings, status
+names, DATETIME strings), copies it and runs the migrations on the copy,
+then compares the two files' table and index sizes (from dbstat) and the
+time of the aggregate queries the reports and summaries run.
+
+    python -m benchmarks.bench_compact_storage --students 2000 --days 180
+"""
+import argparse
+import random
+import shutil
+import sqlite3
+import tempfile
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import create_engine
+
+from benchmarks.common import STATUSES, timed
+from migrations import run_migrations
+from models import Base, EPOCH_DAY, STATUS_CODES
+
+LEGACY_SCHEMA = """
+CREATE TABLE students (
+    id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, created_at DATETIME DEFAULT (CURRENT_TIMESTAMP)
+);
+CREATE TABLE attendance (
+    id INTEGER PRIMARY KEY,
+    student_id INTEGER NOT NULL REFERENCES students (id),
+    date DATETIME DEFAULT (CURRENT_TIMESTAMP),
+    status VARCHAR NOT NULL,
+    created_at DATETIME DEFAULT (CURRENT_TIMESTAMP),
+    day DATE
+);
+CREATE INDEX ix_attendance_id ON attendance (id);
+CREATE INDEX ix_attendance_day ON attendance (day);
+CREATE UNIQUE INDEX uq_attendance_student_day ON attendance (student_id, day);
+PRAGMA user_version = 1;
+"""
+
+
+def build_legacy(path: Path, students: int, days: int):
+    """Seed a database in the text layout the first migration left behind"""
+    rng = random.Random(42)
+    con = sqlite3.connect(path)
+    con.executescript(LEGACY_SCHEMA)
+    con.executemany("INSERT INTO students (name) VALUES (?)", [(f"Student {i}",) for i in range(1, students + 1)])
+    day = date(2024, 1, 1)
+    for _ in range(days):
+        if day.weekday() < 5:
+            stamp = datetime.combine(day, datetime.min.time()) + timedelta(hours=8, minutes=rng.randrange(60))
+            con.executemany(
+                "INSERT INTO attendance (student_id, date, status, created_at, day) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (student_id, stamp.isoformat(" ", "microseconds"), rng.choice(STATUSES),
+                     stamp.isoformat(" ", "microseconds"), day.isoformat())
+                    for student_id in range(1, students + 1)
+                ],
+            )
+        day += timedelta(days=1)
+    con.commit()
+    con.execute("VACUUM")
+    con.close()
+
+
+def object_sizes(path: Path) -> dict:
+    """Bytes used by the attendance table and its indexes"""
+    con = sqlite3.connect(path)
+    rows = con.execute(
+        "SELECT dbstat.name, sum(pgsize) FROM dbstat JOIN sqlite_master USING (name) "
+        "WHERE tbl_name = 'attendance' GROUP BY dbstat.name ORDER BY dbstat.name"
+    ).fetchall()
+    con.close()
+    return dict(rows)
+
+
+def queries(compact: bool, day: date, start: date, end: date) -> dict:
+    """The reports' aggregates, with parameters encoded for each layout"""
+    def day_value(value: date):
+        return (value - EPOCH_DAY).days if compact else value.isoformat()
+
+    status = "status" if compact else "lower(status)"
+    present = STATUS_CODES["Present"] if compact else "Present"
+    return {
+        "day summary": (
+            "SELECT status, count(*) FROM attendance WHERE day = ? GROUP BY status", (day_value(day),)
+        ),
+        "student percentage": (
+            f"SELECT {status}, count(*) FROM attendance WHERE student_id = ? GROUP BY 1", (17,)
+        ),
+        "month by day": (
+            "SELECT day, count(*) FROM attendance WHERE day BETWEEN ? AND ? AND status = ? GROUP BY day",
+            (day_value(start), day_value(end), present),
+        ),
+        "all-time by status": (f"SELECT {status}, count(*) FROM attendance GROUP BY 1", ()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=180)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        legacy = Path(workdir) / "legacy.db"
+        compact = Path(workdir) / "compact.db"
+        build_legacy(legacy, args.students, args.days)
+        shutil.copy(legacy, compact)
+
+        engine = create_engine(f"sqlite:///{compact}")
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        engine.dispose()
+        con = sqlite3.connect(compact)
+        con.execute("VACUUM")
+        rows = con.execute("SELECT count(*) FROM attendance").fetchone()[0]
+        con.close()
+        print(f"{rows:,} attendance rows ({args.students} students, {args.days} days)\n")
+
+        legacy_size, compact_size = legacy.stat().st_size, compact.stat().st_size
+        print(f"{'file':<32}{legacy_size / 1e6:>10.1f} MB{compact_size / 1e6:>10.1f} MB"
+              f"{compact_size / legacy_size:>8.0%}")
+        legacy_objects, compact_objects = object_sizes(legacy), object_sizes(compact)
+        for name in sorted(set(legacy_objects) | set(compact_objects)):
+            before, after = legacy_objects.get(name, 0), compact_objects.get(name, 0)
+            ratio = f"{after / before:>8.0%}" if before else ""
+            print(f"{name:<32}{before / 1e6:>10.1f} MB{after / 1e6:>10.1f} MB{ratio}")
+
+        print(f"\n{'query (best of 5)':<32}{'text':>13}{'compact':>13}")
+        day, start, end = date(2024, 3, 5), date(2024, 3, 1), date(2024, 3, 31)
+        connections = {layout: sqlite3.connect(path) for layout, path in (("text", legacy), ("compact", compact))}
+        text_queries = queries(False, day, start, end)
+        compact_queries = queries(True, day, start, end)
+        for name in text_queries:
+            times = []
+            for layout, (sql, params) in (("text", text_queries[name]), ("compact", compact_queries[name])):
+                con = connections[layout]
+                times.append(timed(lambda: con.execute(sql, params).fetchall()))
+            print(f"{name:<32}{times[0]:>10.2f} ms{times[1]:>10.2f} ms")
+        for con in connections.values():
+            con.close()
+
+
+if __name__ == "__main__":
+    main()
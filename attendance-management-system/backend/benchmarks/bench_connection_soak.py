@@ -0,0 +1,143 @@
+"""
+Connection soak: pooled connections and open database files under sustained load
+
+Runs thousands of authenticated requests from many threads against a file
+database, sampling connections checked out of the pools, SQLite files held
+open by the process, leak warnings and pool timeouts as it goes. Three
+phases: an auth dependency opening its own never-closed session (the
+pattern api/routes.py had), the same auth sharing the request's session,
+and the application's own routes.
+
+    python -m benchmarks.bench_connection_soak --requests 6000 --threads 16
+"""
+import argparse
+import os
+import tempfile
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+_workdir = tempfile.TemporaryDirectory()
+DB_PATH = Path(_workdir.name) / "soak.db"
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault("DB_POOL_TIMEOUT_SECONDS", "2")
+os.environ.setdefault("ATTENDANCE_ARCHIVE_DIR", str(Path(_workdir.name) / "archive"))
+
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+import db_monitor
+from database import ReadSessionLocal, SessionLocal, engine, get_read_db, get_write_db
+from models import Base, Student, User
+
+
+def open_database_files() -> int:
+    """SQLite files (database, WAL, shm) the process holds open"""
+    count = 0
+    for fd in os.listdir("/proc/self/fd"):
+        try:
+            count += os.readlink(f"/proc/self/fd/{fd}").startswith(str(DB_PATH))
+        except OSError:
+            pass
+    return count
+
+
+def _user(db: Session) -> User:
+    user = db.query(User).filter(User.username == "teacher").first()
+    if not user:
+        raise HTTPException(status_code=401)
+    return user
+
+
+def leaky_user(db: Session = Depends(lambda: ReadSessionLocal())):
+    return _user(db)
+
+
+def shared_user(db: Session = Depends(get_read_db)):
+    return _user(db)
+
+
+def soak_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(db_monitor.LeakDetectionMiddleware)
+
+    @app.get("/leaky/students", dependencies=[Depends(leaky_user)])
+    def leaky_students(db: Session = Depends(get_write_db)):
+        return {"students": db.query(Student).count()}
+
+    @app.get("/shared/students", dependencies=[Depends(shared_user)])
+    def shared_students(db: Session = Depends(get_write_db)):
+        return {"students": db.query(Student).count()}
+
+    return app
+
+
+def sample() -> dict:
+    return {
+        "checked_out": sum(db_monitor.checked_out.value(pool=pool) for pool in ("read", "write")),
+        "files": open_database_files(),
+        "leaked": sum(db_monitor.leaked.value(pool=pool) for pool in ("read", "write")),
+        "timeouts": sum(db_monitor.timeouts.value(pool=pool) for pool in ("read", "write")),
+    }
+
+
+def soak(name: str, app: FastAPI, requests, total: int, threads: int):
+    print(f"\n{name}")
+    print(f"{'requests':>10}{'errors':>8}{'req/s':>8}{'checked out':>13}{'open files':>12}"
+          f"{'leaked':>8}{'timeouts':>10}")
+    clients = [TestClient(app) for _ in range(threads)]
+    errors = 0
+    started = time.perf_counter()
+    step = total // 6
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for done in range(step, total + 1, step):
+            def one(index):
+                method, path, body = requests(index)
+                try:
+                    return clients[index % threads].request(method, path, json=body).status_code < 400
+                except Exception:
+                    return False
+            errors += sum(not ok for ok in pool.map(one, range(done - step, done)))
+            state = sample()
+            print(f"{done:>10}{errors:>8}{done / (time.perf_counter() - started):>8.0f}{state['checked_out']:>13.0f}"
+                  f"{state['files']:>12}{state['leaked']:>8.0f}{state['timeouts']:>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=6000)
+    parser.add_argument("--threads", type=int, default=16)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.add(User(username="teacher", email="teacher@example.com", hashed_password="x"))
+    db.execute(insert(Student), [{"name": f"Student {i}"} for i in range(1, 501)])
+    db.commit()
+    db.close()
+    warnings.simplefilter("ignore", db_monitor.ConnectionLeakWarning)
+    print(f"{args.requests} requests per phase from {args.threads} threads; before: {sample()}")
+
+    app = soak_app()
+    soak("auth with its own unclosed session", app,
+         lambda index: ("GET", "/leaky/students", None), args.requests, args.threads)
+    soak("auth sharing the request's session", app,
+         lambda index: ("GET", "/shared/students", None), args.requests, args.threads)
+
+    from main import app as main_app
+
+    def app_requests(index):
+        if index % 4 == 0:
+            return "POST", "/attendance/manual", {
+                "student_id": index % 500 + 1, "status": "Present", "date": "2024-09-02T08:00:00"
+            }
+        return "GET", ("/students/?limit=50", "/attendance/date/2024-09-02", "/attendance/flagged")[index % 3], None
+
+    soak("application routes", main_app, app_requests, args.requests, args.threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Conditional GET benchmark: DB statements and latency for a polling dashboard
+
+Simulates a dashboard that polls the day's records, the day's summary and the
+roster every few seconds while a teacher marks one student now and then.
+
+    python -m benchmarks.bench_etag --polls 300 --write-every 25
+"""
+import argparse
+import os
+import time
+from datetime import date
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from benchmarks.common import temp_database, seed, app_client, QueryCounter
+
+DAY = date(2024, 1, 2)
+URLS = [f"/attendance/date/{DAY}", f"/attendance/summary/{DAY}", "/students/"]
+
+
+def poll(client, counter, polls, write_every, conditional):
+    etags = {}
+    counter.count = 0
+    started = time.perf_counter()
+    for index in range(polls):
+        if index and index % write_every == 0:
+            client.post("/attendance/manual", json={
+                "student_id": index % 50 + 1, "status": "Late", "date": f"{DAY}T09:00:00"
+            })
+        for url in URLS:
+            headers = {"If-None-Match": etags[url]} if conditional and url in etags else {}
+            response = client.get(url, headers=headers)
+            if response.status_code == 200:
+                etags[url] = response.headers["ETag"]
+    elapsed = time.perf_counter() - started
+    return counter.count, elapsed * 1000 / (polls * len(URLS))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--polls", type=int, default=300)
+    parser.add_argument("--write-every", type=int, default=25)
+    args = parser.parse_args()
+
+    with temp_database() as (engine, SessionLocal, _):
+        db = SessionLocal()
+        seed(db, 100, 10)
+        db.close()
+        client = app_client(SessionLocal)
+        counter = QueryCounter(engine)
+
+        plain_queries, plain_ms = poll(client, counter, args.polls, args.write_every, conditional=False)
+        etag_queries, etag_ms = poll(client, counter, args.polls, args.write_every, conditional=True)
+
+    print(f"polls: {args.polls} x {len(URLS)} endpoints, one write every {args.write_every} polls")
+    print(f"without If-None-Match: {plain_queries} statements, {plain_ms:.2f} ms/request")
+    print(f"with If-None-Match:    {etag_queries} statements, {etag_ms:.2f} ms/request")
+    print(f"DB statements saved:   {100 * (1 - etag_queries / plain_queries):.1f}%")
+
+
+if __name__ == "__main__":
+    main()
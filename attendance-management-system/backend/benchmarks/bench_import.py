@@ -0,0 +1,63 @@
+"""
+Bulk import benchmark: roster plus attendance history from CSV
+
+The database has the production schema (migrations.bootstrap_schema), so
+every stored row also fires the sync and day version triggers.
+
+    python -m benchmarks.bench_import --rows 1000000 --students 2000 --workers 4
+"""
+import argparse
+import csv
+import random
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+from importer import import_file, _Import, IMPORT_WORKERS
+from schemas import ImportKind
+from benchmarks.common import temp_database
+
+
+def write_attendance_csv(path, rows: int, students: int):
+    rng = random.Random(7)
+    days = -(-rows // students)
+    with open(path, "w", newline="") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(["student", "date", "status"])
+        written = 0
+        for offset in range(days):
+            day = (date(2015, 1, 1) + timedelta(days=offset)).isoformat()
+            for student in range(students):
+                if written == rows:
+                    return
+                writer.writerow([f"Student {student}", day, rng.choice(("Present", "Absent", "late", "P"))])
+                written += 1
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=IMPORT_WORKERS)
+    args = parser.parse_args()
+
+    with temp_database() as (engine, SessionLocal, workdir):
+        source = workdir / "attendance.csv"
+        write_attendance_csv(source, args.rows, args.students)
+
+        db = SessionLocal()
+        state = _Import(ImportKind.attendance, source.name)
+        started = time.perf_counter()
+        import_file(db, state, source, workers=args.workers)
+        elapsed = time.perf_counter() - started
+        stored = db.execute(text("SELECT count(*) FROM attendance")).scalar()
+        db.close()
+
+    print(f"rows: {state.rows_read}, stored: {stored}, students created: {state.students_created}, "
+          f"errors: {state.error_count}")
+    print(f"workers: {args.workers}, elapsed: {elapsed:.1f} s, {state.rows_read / elapsed:,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Live feed fan-out: 1,000 SSE clients on /attendance/live
+
+Starts the API in a subprocess on a throwaway database, connects `--clients`
+SSE clients, and marks attendance through /attendance/manual. Checks that
+every client receives every change and compares write latency with and
+without the clients connected. A second part subscribes clients that never
+read straight on the hub and checks they are dropped once their buffer is
+full while the writer's publish cost stays flat.
+
+    python -m benchmarks.bench_live_feed --clients 1000 --writes 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+PORT = 8791
+BASE_URL = f"http://127.0.0.1:{PORT}"
+
+
+def start_server(workdir: str) -> subprocess.Popen:
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{workdir}/live.db", GROQ_API_KEY="")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(PORT), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f"{BASE_URL}/metrics", timeout=1)
+            return process
+        except httpx.TransportError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("server did not start")
+
+
+async def write_latencies(client: httpx.AsyncClient, student_ids: list, writes: int, sent_at: dict) -> list:
+    latencies = []
+    for index in range(writes):
+        started = sent_at[index] = time.perf_counter()
+        response = await client.post("/attendance/manual", json={
+            "student_id": student_ids[index % len(student_ids)],
+            "status": ["Present", "Absent", "Late"][index % 3],
+            "date": f"2024-01-{index % 20 + 1:02d}T09:00:00",
+        })
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0.02)
+    return latencies
+
+
+async def http_fan_out(clients: int, writes: int):
+    limits = httpx.Limits(max_connections=clients + 10, max_keepalive_connections=clients + 10)
+    async with httpx.AsyncClient(base_url=BASE_URL, limits=limits, timeout=60) as client:
+        student_ids = [
+            (await client.post("/students/", json={"name": f"Student {index}"})).json()["id"]
+            for index in range(20)
+        ]
+        baseline = await write_latencies(client, student_ids, writes, {})
+
+        received = [0] * clients
+        last_seen = {}
+        connected = asyncio.Event()
+        ready = [0]
+
+        async def listen(number: int):
+            async with client.stream("GET", "/attendance/live") as response:
+                ready[0] += 1
+                if ready[0] == clients:
+                    connected.set()
+                async for line in response.aiter_lines():
+                    if line == "event: attendance":
+                        last_seen[received[number]] = time.perf_counter()
+                        received[number] += 1
+                        if received[number] == writes:
+                            return
+
+        started = time.perf_counter()
+        listeners = [asyncio.create_task(listen(number)) for number in range(clients)]
+        await asyncio.wait_for(connected.wait(), 120)
+        await asyncio.sleep(0.5)
+        print(f"{clients} clients connected in {time.perf_counter() - started:.1f}s")
+
+        sent_at = {}
+        with_clients = await write_latencies(client, student_ids, writes, sent_at)
+        await asyncio.wait_for(asyncio.gather(*listeners), 120)
+
+    complete = sum(count == writes for count in received)
+    delivery = [last_seen[index] - sent_at[index] for index in range(writes)]
+    print(f"write p50 without clients: {statistics.median(baseline) * 1000:6.1f} ms")
+    print(f"write p50 with clients:    {statistics.median(with_clients) * 1000:6.1f} ms")
+    print(f"clients with all {writes} changes: {complete}/{clients}")
+    print(f"from write request to the last client having it: p50 {statistics.median(delivery) * 1000:.0f} ms, "
+          f"max {max(delivery) * 1000:.0f} ms")
+
+
+async def slow_clients(fast: int, slow: int, events: int):
+    from live_feed import LiveFeed
+
+    hub = LiveFeed(buffer_size=64)
+    fast_subscriptions = [hub.subscribe() for _ in range(fast)]
+    slow_subscriptions = [hub.subscribe() for _ in range(slow)]
+    received = [0] * fast
+
+    async def drain(number: int, subscription):
+        async for message in subscription.messages(heartbeat=5):
+            received[number] += 1
+            if received[number] == events:
+                return
+
+    readers = [asyncio.create_task(drain(number, sub)) for number, sub in enumerate(fast_subscriptions)]
+    costs = []
+    for index in range(events):
+        started = time.perf_counter()
+        hub.publish("attendance", {"id": index, "status": "Present"}, None)
+        costs.append(time.perf_counter() - started)
+        # Let the readers run between writes, as they would between requests
+        await asyncio.sleep(0)
+    await asyncio.wait_for(asyncio.gather(*readers), 60)
+
+    dropped = sum(sub.dropped for sub in slow_subscriptions)
+    early = statistics.mean(costs[:32]) * 1e6
+    late = statistics.mean(costs[-32:]) * 1e6
+    print(f"\nhub: {fast} reading + {slow} stalled clients, {events} events, 64-event buffers")
+    print(f"stalled clients dropped: {dropped}/{slow}; reading clients with every event: "
+          f"{sum(count == events for count in received)}/{fast}")
+    print(f"publish cost: {early:.0f} us/event before the drops, {late:.0f} us/event after")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--writes", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        server = start_server(workdir)
+        try:
+            asyncio.run(http_fan_out(args.clients, args.writes))
+        finally:
+            server.terminate()
+            server.wait()
+
+    asyncio.run(slow_clients(args.clients - 100, 100, 500))
+
+
+if __name__ == "__main__":
+    main()
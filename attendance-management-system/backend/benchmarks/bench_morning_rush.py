@@ -0,0 +1,268 @@
+"""
+Morning rush: teachers logging in, fetching rosters and marking attendance at once
+
+Starts the API with uvicorn on a throwaway database and points its Groq
+client at benchmarks.fake_llm_server, then replays `--teachers` teachers
+arriving over `--window` seconds, at most `--concurrency` of them active at
+a time. Each teacher logs in (/users/login), fetches their class
+(/students/), marks it (/attendance/manual per student; `--ai-share` of the
+teachers name their absentees in one /attendance/ai command instead) and
+checks the day's totals (/attendance/summary). Throughput, p50/p95/p99
+latency and error rate per route are printed and written as JSON and HTML.
+
+    python -m benchmarks.bench_morning_rush --teachers 300 --window 900 --concurrency 100
+    python -m benchmarks.bench_morning_rush --teachers 60 --window 30 --json rush.json --html rush.html
+"""
+import argparse
+import asyncio
+import html
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, datetime
+from pathlib import Path
+
+import httpx
+
+from benchmarks.fake_llm_server import FakeLLMServer
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+PASSWORD = "morning-rush"
+SYLLABLES = ["ba", "de", "fi", "go", "ku", "la", "me", "ni", "po", "ru", "sa", "te", "vi", "wo", "za", "yu"]
+MANUAL_STATUSES = ["Present"] * 8 + ["Late"]
+
+
+def student_names(count: int, seed_value: int = 7) -> list:
+    """Distinct one-word names, so the fake LLM's capitalized-word extraction finds each whole"""
+    rng = random.Random(seed_value)
+    names = set()
+    while len(names) < count:
+        names.add("".join(rng.choice(SYLLABLES) for _ in range(4)).capitalize())
+    return sorted(names)
+
+
+def seed_database(database_url: str, teachers: int, class_size: int):
+    """Create the schema, `teachers` teacher accounts and one class of students per teacher"""
+    os.environ["DATABASE_URL"] = database_url
+    from sqlalchemy import insert
+    from auth import get_password_hash
+    from database import SessionLocal, engine
+    from models import Base, Student, User
+
+    Base.metadata.create_all(bind=engine)
+    hashed = get_password_hash(PASSWORD)
+    db = SessionLocal()
+    db.execute(insert(User), [
+        {"username": f"teacher{index}", "email": f"teacher{index}@example.com", "hashed_password": hashed}
+        for index in range(teachers)
+    ])
+    db.execute(insert(Student), [{"name": name} for name in student_names(teachers * class_size)])
+    db.commit()
+    db.close()
+    engine.dispose()
+
+
+def start_server(database_url: str, port: int, llm_url: str) -> subprocess.Popen:
+    env = dict(os.environ, DATABASE_URL=database_url, GROQ_API_KEY="fake", GROQ_BASE_URL=llm_url)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/metrics", timeout=1)
+            return process
+        except httpx.TransportError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("server did not start")
+
+
+class Recorder:
+    """Latencies and status codes per route"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    async def call(self, client: httpx.AsyncClient, route: str, method: str, path: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError:
+            response, status = None, "transport error"
+        self.latencies[route].append(time.perf_counter() - started)
+        self.statuses[route][status] += 1
+        return response if status == 200 else None
+
+
+async def teacher(client: httpx.AsyncClient, recorder: Recorder, index: int, args, rng: random.Random):
+    """One teacher's morning: log in, fetch the class, mark it, check the totals"""
+
+    async def think():
+        await asyncio.sleep(rng.uniform(0, args.think))
+
+    response = await recorder.call(client, "POST /users/login", "POST", "/users/login",
+                                   json={"username": f"teacher{index}", "password": PASSWORD})
+    if response is None:
+        return
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    await think()
+
+    response = await recorder.call(client, "GET /students/", "GET", "/students/", headers=headers,
+                                   params={"skip": index * args.class_size, "limit": args.class_size})
+    if response is None:
+        return
+    students = response.json()
+    await think()
+
+    stamp = datetime.combine(date.today(), datetime.min.time()).replace(hour=8).isoformat()
+    absent = {student["id"] for student in rng.sample(students, min(len(students), rng.randint(0, 3)))}
+    uses_ai = bool(absent) and rng.random() < args.ai_share
+    if uses_ai:
+        names = [student["name"] for student in students if student["id"] in absent]
+        command = f"{', '.join(names[:-1])} and {names[-1]} are absent" if len(names) > 1 else f"{names[0]} is absent"
+        await recorder.call(client, "POST /attendance/ai", "POST", "/attendance/ai", headers=headers,
+                            json={"command": command})
+        await think()
+    for student in students:
+        if uses_ai and student["id"] in absent:
+            continue
+        status = "Absent" if student["id"] in absent else rng.choice(MANUAL_STATUSES)
+        await recorder.call(client, "POST /attendance/manual", "POST", "/attendance/manual", headers=headers,
+                            json={"student_id": student["id"], "status": status, "date": stamp})
+        await think()
+
+    await recorder.call(client, "GET /attendance/summary/{date}", "GET",
+                        f"/attendance/summary/{date.today().isoformat()}", headers=headers)
+
+
+async def rush(base_url: str, args) -> tuple:
+    recorder = Recorder()
+    rng = random.Random(args.seed)
+    arrivals = sorted((rng.uniform(0, args.window), index) for index in range(args.teachers))
+    slots = asyncio.Semaphore(args.concurrency)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        started = time.perf_counter()
+
+        async def arrive(at: float, index: int):
+            await asyncio.sleep(max(0.0, at - (time.perf_counter() - started)))
+            async with slots:
+                await teacher(client, recorder, index, args, random.Random(args.seed * 100_003 + index))
+
+        await asyncio.gather(*(arrive(at, index) for at, index in arrivals))
+        elapsed = time.perf_counter() - started
+    return recorder, elapsed
+
+
+def percentile(ordered: list, fraction: float) -> float:
+    return ordered[max(0, int(len(ordered) * fraction) - 1)]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    routes = {}
+    for route, latencies in recorder.latencies.items():
+        ordered = sorted(latencies)
+        statuses = recorder.statuses[route]
+        errors = sum(count for status, count in statuses.items() if status != 200)
+        routes[route] = {
+            "requests": len(ordered),
+            "errors": errors,
+            "error_rate": errors / len(ordered),
+            "throughput_rps": len(ordered) / elapsed,
+            "p50_ms": percentile(ordered, 0.50) * 1000,
+            "p95_ms": percentile(ordered, 0.95) * 1000,
+            "p99_ms": percentile(ordered, 0.99) * 1000,
+            "max_ms": ordered[-1] * 1000,
+            "statuses": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        }
+    requests = sum(route["requests"] for route in routes.values())
+    errors = sum(route["errors"] for route in routes.values())
+    return {
+        "elapsed_seconds": elapsed,
+        "requests": requests,
+        "errors": errors,
+        "error_rate": errors / requests if requests else 0.0,
+        "throughput_rps": requests / elapsed,
+        "routes": routes,
+    }
+
+
+def render_html(report: dict) -> str:
+    columns = ["requests", "errors", "error_rate", "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+    rows = "".join(
+        f"<tr><td>{html.escape(route)}</td>"
+        + "".join(f"<td>{stats[column]:.3f}</td>" if isinstance(stats[column], float) else f"<td>{stats[column]}</td>"
+                  for column in columns)
+        + f"<td>{html.escape(json.dumps(stats['statuses']))}</td></tr>"
+        for route, stats in report["routes"].items()
+    )
+    config = html.escape(json.dumps(report["config"]))
+    return (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'><title>Morning rush</title><style>"
+        "body{font-family:sans-serif}table{border-collapse:collapse}"
+        "td,th{border:1px solid #ccc;padding:4px 8px;text-align:right}td:first-child{text-align:left}"
+        "</style></head><body><h1>Morning rush</h1>"
+        f"<p>{report['requests']} requests in {report['elapsed_seconds']:.1f}s "
+        f"({report['throughput_rps']:.1f} req/s), error rate {report['error_rate']:.2%}</p>"
+        f"<p><code>{config}</code></p><table><tr><th>route</th>"
+        + "".join(f"<th>{column}</th>" for column in columns)
+        + f"<th>statuses</th></tr>{rows}</table></body></html>"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--teachers", type=int, default=300)
+    parser.add_argument("--class-size", type=int, default=30)
+    parser.add_argument("--window", type=float, default=60, help="seconds over which teachers arrive (900 for 15 minutes)")
+    parser.add_argument("--concurrency", type=int, default=100, help="teachers active at once")
+    parser.add_argument("--think", type=float, default=0.5, help="longest pause between a teacher's requests, in seconds")
+    parser.add_argument("--ai-share", type=float, default=0.3, help="share of teachers using /attendance/ai")
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--llm-limit", type=int, default=30, help="fake LLM requests per second before 429")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--port", type=int, default=8792)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", default="morning_rush.json")
+    parser.add_argument("--html", default="morning_rush.html")
+    args = parser.parse_args()
+
+    llm = FakeLLMServer(("127.0.0.1", 0), latency=args.llm_latency, limit=args.llm_limit).start()
+    with tempfile.TemporaryDirectory() as workdir:
+        database_url = f"sqlite:///{workdir}/rush.db"
+        seed_database(database_url, args.teachers, args.class_size)
+        server = start_server(database_url, args.port, llm.url)
+        try:
+            recorder, elapsed = asyncio.run(rush(f"http://127.0.0.1:{args.port}", args))
+        finally:
+            server.terminate()
+            server.wait()
+    llm.shutdown()
+
+    report = summarize(recorder, elapsed)
+    report["config"] = {key: value for key, value in vars(args).items() if key not in ("json", "html")}
+    report["llm"] = {"accepted": llm.accepted, "rate_limited": llm.rate_limited}
+
+    print(f"{args.teachers} teachers over {args.window:.0f}s, {args.concurrency} at a time: "
+          f"{report['requests']} requests in {elapsed:.1f}s ({report['throughput_rps']:.1f} req/s)")
+    print(f"{'route':<32}{'requests':>9}{'errors':>8}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for route, stats in report["routes"].items():
+        print(f"{route:<32}{stats['requests']:>9}{stats['error_rate']:>8.1%}{stats['throughput_rps']:>8.1f}"
+              f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}")
+
+    Path(args.json).write_text(json.dumps(report, indent=2))
+    Path(args.html).write_text(render_html(report))
+    print(f"wrote {args.json} and {args.html}")
+
+
+if __name__ == "__main__":
+    main()
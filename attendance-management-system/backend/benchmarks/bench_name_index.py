@@ -0,0 +1,133 @@
+"""
+Fuzzy name resolution at school-district scale
+
+Builds the trigram index over `--students` synthetic names and times lookups
+of exact names, misspelled names and first names alone, next to the old
+`ILIKE '%name%'` query the AI route used.
+
+    python -m benchmarks.bench_name_index --students 50000 --lookups 2000
+"""
+import argparse
+import random
+import statistics
+import time
+import tracemalloc
+
+from sqlalchemy import insert
+
+from models import Student
+from name_index import NameIndex
+from student_manager import get_student_by_name
+from benchmarks.common import temp_database
+
+FIRST = [
+    "Muhammad", "Ahmed", "Ali", "Hamza", "Bilal", "Usman", "Omar", "Hassan", "Hussain", "Ibrahim",
+    "Yusuf", "Zain", "Saad", "Fahad", "Imran", "Kamran", "Rehan", "Faisal", "Tariq", "Asad",
+    "Ayesha", "Fatima", "Zainab", "Maryam", "Khadija", "Sana", "Hira", "Amna", "Iqra", "Noor",
+    "Sara", "Mehwish", "Rabia", "Sadia", "Nida", "Anum", "Bushra", "Farah", "Laiba", "Hafsa",
+]
+LAST = [
+    "Khan", "Ahmed", "Ali", "Hussain", "Shah", "Malik", "Qureshi", "Siddiqui", "Chaudhry", "Butt",
+    "Sheikh", "Raza", "Iqbal", "Akhtar", "Aslam", "Javed", "Rashid", "Mirza", "Baig", "Abbasi",
+    "Hashmi", "Farooq", "Nawaz", "Zaidi", "Rizvi", "Anwar", "Saleem", "Tahir", "Younis", "Haider",
+]
+
+
+def make_names(count: int, rng: random.Random) -> list[str]:
+    """Unique "First [Middle] Last" names"""
+    names, seen = [], set()
+    while len(names) < count:
+        parts = [rng.choice(FIRST), rng.choice(FIRST + LAST), rng.choice(LAST)]
+        name = " ".join(parts if rng.random() < 0.8 else parts[::2])
+        if name not in seen:
+            seen.add(name)
+            names.append(name)
+    return names
+
+
+def misspell(name: str, rng: random.Random) -> str:
+    """One typo in a word of four or more letters: substitution, deletion or swap"""
+    words = name.split()
+    index = rng.choice([i for i, word in enumerate(words) if len(word) >= 4] or [0])
+    word = list(words[index])
+    position = rng.randrange(1, len(word) - 1)
+    edit = rng.choice(["substitute", "delete", "swap"])
+    if edit == "substitute":
+        word[position] = rng.choice("aeiouy")
+    elif edit == "delete":
+        del word[position]
+    else:
+        word[position], word[position + 1] = word[position + 1], word[position]
+    words[index] = "".join(word)
+    return " ".join(words)
+
+
+def time_lookups(fn, queries) -> float:
+    """Median lookup time in microseconds"""
+    samples = []
+    for query in queries:
+        started = time.perf_counter()
+        fn(query)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=50000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    names = make_names(args.students, rng)
+    rows = list(enumerate(names, start=1))
+
+    index = NameIndex()
+    tracemalloc.start()
+    started = time.perf_counter()
+    index.load(rows)
+    build_seconds = time.perf_counter() - started
+    memory_mb = tracemalloc.get_traced_memory()[0] / 2**20
+    tracemalloc.stop()
+    print(f"{len(index)} students indexed in {build_seconds:.2f}s, {memory_mb:.0f} MB")
+
+    sample = rng.sample(rows, args.lookups)
+    exact = [name for _, name in sample]
+    typos = [misspell(name, rng) for _, name in sample]
+    first_names = [name.split()[0] for _, name in sample]
+
+    index.loaded = True
+    print(f"exact name:        median {time_lookups(index.match, exact):8.0f} us")
+    print(f"misspelled name:   median {time_lookups(index.search, typos):8.0f} us")
+    print(f"first name only:   median {time_lookups(index.search, first_names):8.0f} us")
+
+    # Decisions the AI route would take for the misspelled names
+    resolved = correct = ambiguous = 0
+    for (student_id, _), typo in zip(sample, typos):
+        match, candidates = index.match(typo)
+        if match is not None:
+            resolved += 1
+            correct += match == student_id
+        elif candidates:
+            ambiguous += 1 if any(c.id == student_id for c in candidates) else 0
+    print(f"misspelled names: {resolved} resolved ({correct} to the right student), "
+          f"{ambiguous} ambiguous with the right student among the candidates, "
+          f"{args.lookups - resolved - ambiguous} other")
+
+    # Incremental updates
+    started = time.perf_counter()
+    for student_id, name in rows[:1000]:
+        index.add(student_id, name + " Jr")
+    print(f"rename:            {(time.perf_counter() - started) * 1000:.2f} us per student")
+
+    with temp_database() as (engine, SessionLocal, _):
+        db = SessionLocal()
+        db.execute(insert(Student), [{"name": name} for name in names])
+        db.commit()
+        ilike_us = time_lookups(lambda name: get_student_by_name(db, name), typos[:200])
+        db.close()
+    print(f"old ILIKE lookup:  median {ilike_us:8.0f} us (and no fuzzy match)")
+
+
+if __name__ == "__main__":
+    main()
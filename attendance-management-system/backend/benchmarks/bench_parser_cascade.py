@@ -0,0 +1,180 @@
+"""
+Parser cascade: how many commands the local grammar answers, and how accurately
+
+Loads benchmarks/command_corpus.jsonl (commands with the students, status,
+section and date the teacher meant) into a throwaway database holding the
+corpus's students and sections, then parses every command with each tier
+on its own: the local grammar and the LLM. A parse is correct when it marks
+the same students (after the route's name resolution), status, section,
+exceptions and day. Reports each tier's accuracy, how many commands the
+grammar takes at each confidence threshold and how accurate those are, the
+LLM calls the cascade saves, and per-command latency of the cascade
+(grammar, plus the LLM for escalated commands) against sending everything
+to the LLM.
+
+The LLM tier is benchmarks.fake_llm_server unless --groq is given, which
+calls the real Groq API with GROQ_API_KEY; the fake only copies capitalized
+words, so its accuracy says little about the real model.
+
+    python -m benchmarks.bench_parser_cascade
+    GROQ_API_KEY=... python -m benchmarks.bench_parser_cascade --groq --verbose
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+CORPUS = Path(__file__).resolve().parent / "command_corpus.jsonl"
+SECTIONS = {"7B": ["Ali", "Sara", "Hamza", "Zainab", "Ayesha"], "8A": ["Omar", "Hina", "Usman", "Imran", "Noor"]}
+
+_workdir = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{_workdir.name}/cascade.db"
+os.environ.setdefault("LLM_RATE_PER_SECOND", "100")
+os.environ.setdefault("LLM_BURST", "100")
+if "--groq" not in sys.argv:
+    from benchmarks.fake_llm_server import FakeLLMServer
+    server = FakeLLMServer(("127.0.0.1", 0), latency=0.3, limit=1000).start()
+    os.environ["GROQ_API_KEY"] = "fake"
+    os.environ["GROQ_BASE_URL"] = server.url
+
+import ai_parser
+from database import SessionLocal, engine
+from models import Base, ClassSection, SectionMembership, Student
+from name_index import normalize_name, student_names
+
+
+def load_corpus() -> list:
+    with open(CORPUS) as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def seed_roster(db, corpus: list):
+    """Every student the corpus means, except the ones it expects to be new, plus the sections"""
+    names = {name for case in corpus for name in case["students"] + case["except_students"]}
+    names |= {name for members in SECTIONS.values() for name in members}
+    names.discard("Yusuf")
+    students = {name: Student(name=name) for name in sorted(names)}
+    db.add_all(students.values())
+    db.flush()
+    for section_name, members in SECTIONS.items():
+        section = ClassSection(name=section_name)
+        db.add(section)
+        db.flush()
+        db.add_all(SectionMembership(section_id=section.id, student_id=students[name].id) for name in members)
+    db.commit()
+
+
+def _student(db, name: str):
+    """The student the route would mark for a name, or the name itself if it would create one"""
+    student_id, _ = student_names.resolve(db, name)
+    return student_id if student_id is not None else normalize_name(name)
+
+
+def outcome(db, students, status, section, except_students, except_status, day) -> tuple:
+    except_ids = frozenset(_student(db, name) for name in except_students)
+    return (
+        frozenset(_student(db, name) for name in students), status,
+        section.upper() if section else None, except_ids, except_status if except_ids else None, day,
+    )
+
+
+def expected_outcome(db, case: dict, today: date) -> tuple:
+    day = {None: today, "yesterday": today - timedelta(days=1)}.get(case["date"]) or date.fromisoformat(case["date"])
+    return outcome(db, case["students"], case["status"], case["section"], case["except_students"],
+                   case["except_status"], day)
+
+
+def parsed_outcome(db, parsed) -> tuple:
+    return outcome(
+        db, parsed.students, parsed.status.value, parsed.section, parsed.except_students,
+        parsed.except_status.value if parsed.except_status else None, parsed.date.date(),
+    )
+
+
+def percentile(ordered: list, fraction: float) -> float:
+    return ordered[max(0, int(len(ordered) * fraction) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--groq", action="store_true", help="use the real Groq API for the LLM tier")
+    parser.add_argument("--verbose", action="store_true", help="list every command a tier got wrong")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    seed_roster(db, corpus)
+    today = datetime.utcnow().date()
+
+    results = []
+    for case in corpus:
+        expected = expected_outcome(db, case, today)
+
+        started = time.perf_counter()
+        local = ai_parser.local_parse_attendance_command(case["command"], db)
+        local_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        llm = ai_parser._call_llm(case["command"], time.monotonic() + ai_parser.LLM_DEADLINE_SECONDS)
+        llm_seconds = time.perf_counter() - started
+
+        results.append({
+            "command": case["command"],
+            "confidence": local.confidence,
+            "local_ok": parsed_outcome(db, local.result) == expected,
+            "llm_ok": llm is not None and parsed_outcome(db, llm) == expected,
+            "llm_failed": llm is None,
+            "local_seconds": local_seconds,
+            "llm_seconds": llm_seconds,
+        })
+    db.close()
+
+    total = len(results)
+    local_correct = sum(result["local_ok"] for result in results)
+    llm_correct = sum(result["llm_ok"] for result in results)
+    print(f"{total} commands; LLM tier: {'Groq' if args.groq else 'fake LLM server'}")
+    print(f"local grammar accuracy on all commands: {local_correct}/{total} ({local_correct / total:.0%})")
+    failed = sum(result["llm_failed"] for result in results)
+    print(f"LLM accuracy on all commands:           {llm_correct}/{total} ({llm_correct / total:.0%}), "
+          f"{failed} calls failed")
+
+    print(f"\n{'threshold':>10}{'local share':>13}{'local precision':>17}{'cascade accuracy':>18}{'LLM calls saved':>17}")
+    for threshold in (0.5, 0.6, 0.7, 0.8, 0.9, 1.0):
+        accepted = [result for result in results if result["confidence"] >= threshold]
+        precision = sum(result["local_ok"] for result in accepted) / len(accepted) if accepted else 0.0
+        cascade = sum(
+            result["local_ok"] if result["confidence"] >= threshold else result["llm_ok"] for result in results
+        )
+        marker = "*" if threshold == ai_parser.PARSER_CONFIDENCE_THRESHOLD else " "
+        print(f"{threshold:>9.1f}{marker}{len(accepted) / total:>13.0%}{precision:>17.0%}"
+              f"{cascade / total:>18.0%}{len(accepted) / total:>17.0%}")
+
+    threshold = ai_parser.PARSER_CONFIDENCE_THRESHOLD
+    cascade_latency = sorted(
+        result["local_seconds"] + (result["llm_seconds"] if result["confidence"] < threshold else 0.0)
+        for result in results
+    )
+    llm_latency = sorted(result["llm_seconds"] for result in results)
+    print(f"\nper-command parse latency at threshold {threshold}:")
+    print(f"  cascade:  p50 {statistics.median(cascade_latency) * 1000:7.2f} ms  "
+          f"p95 {percentile(cascade_latency, 0.95) * 1000:7.2f} ms")
+    print(f"  LLM only: p50 {statistics.median(llm_latency) * 1000:7.2f} ms  "
+          f"p95 {percentile(llm_latency, 0.95) * 1000:7.2f} ms")
+
+    if args.verbose:
+        print("\nwrong answers (confidence, tier, command):")
+        for result in results:
+            if not result["local_ok"] and result["confidence"] >= threshold:
+                print(f"  {result['confidence']:.2f} local  {result['command']}")
+            if not result["llm_ok"]:
+                print(f"  {result['confidence']:.2f} llm    {result['command']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Mixed workload benchmark: write latency while reports run in parallel
+
+Compares one shared engine (the previous setup) against the split
+read-only / writer engines from database.py.
+
+    python -m benchmarks.bench_read_write --readers 6 --writes 300
+"""
+import argparse
+import statistics
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from attendance_manager import upsert_attendance_records
+from database import make_read_engine, make_write_engine
+from schemas import AttendanceCreate, AttendanceStatus
+from utils import reporting
+from benchmarks.common import temp_database, seed
+
+
+def run(read_factory, write_factory, readers: int, writes: int):
+    stop = threading.Event()
+    reports = [0]
+
+    def reader():
+        while not stop.is_set():
+            db = read_factory()
+            try:
+                reporting.get_attendance_summary(db)
+                reports[0] += 1
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+
+    latencies = []
+    for index in range(writes):
+        record = AttendanceCreate(
+            student_id=index % 200 + 1, status=AttendanceStatus.late, date=datetime(2030, 1, 1 + index // 200)
+        )
+        started = time.perf_counter()
+        db = write_factory()
+        try:
+            upsert_attendance_records(db, [record])
+        finally:
+            db.close()
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+        "max": latencies[-1],
+        "reports": reports[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--readers", type=int, default=6)
+    parser.add_argument("--writes", type=int, default=300)
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    with temp_database() as (engine, SessionLocal, workdir):
+        db = SessionLocal()
+        seed(db, args.students, args.days)
+        db.close()
+        engine.dispose()
+        url = f"sqlite:///{workdir / 'bench.db'}"
+
+        shared = create_engine(url, connect_args={"check_same_thread": False})
+        shared_factory = sessionmaker(bind=shared)
+        before = run(shared_factory, shared_factory, args.readers, args.writes)
+        shared.dispose()
+
+        writer = make_write_engine(url)
+        reader = make_read_engine(url)
+        after = run(sessionmaker(bind=reader), sessionmaker(bind=writer), args.readers, args.writes)
+        writer.dispose()
+        reader.dispose()
+
+    print(f"{args.readers} report readers, {args.writes} sequential writes")
+    for label, result in (("shared engine", before), ("read/write split", after)):
+        print(f"{label:17} write p50 {result['p50']:7.2f} ms  p95 {result['p95']:7.2f} ms  "
+              f"max {result['max']:7.2f} ms  reports {result['reports']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Snapshot cache for closed-period reports: cold vs warm download latency
+
+Seeds a few closed months and downloads each cached report twice over:
+once cold (cache cleared, so the report renders) and then warm `--repeat`
+times, served straight from the snapshot file. A write to the month at the
+end shows the next download rendering again.
+
+    python -m benchmarks.bench_report_cache --students 1000 --days 90 --repeat 20
+"""
+import argparse
+import os
+import statistics
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import archive
+from report_cache import report_cache
+from benchmarks.common import temp_database, seed, app_client
+
+URLS = [
+    "/reports/month/2024-02/summary",
+    "/reports/month/2024-02/export/csv",
+    "/reports/month/2024-02/export/excel",
+    "/reports/summary/2024-02-06",
+    "/reports/export/csv/2024-02-06",
+    "/reports/export/excel/2024-02-06",
+]
+
+
+def download(client, url: str) -> float:
+    started = time.perf_counter()
+    response = client.get(url)
+    response.raise_for_status()
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with temp_database() as (engine, SessionLocal, workdir):
+        db = SessionLocal()
+        seed(db, args.students, args.days)
+        db.close()
+        archive.ARCHIVE_DIR = workdir / "archive"
+        report_cache.cache_dir = workdir / "cache"
+        client = app_client(SessionLocal)
+
+        print(f"{args.students} students, {args.days} days\n")
+        print(f"{'report':<40}{'cold':>10}{'warm p50':>12}{'speedup':>10}")
+        for url in URLS:
+            report_cache.clear()
+            cold = download(client, url)
+            warm = statistics.median(download(client, url) for _ in range(args.repeat))
+            print(f"{url:<40}{cold:>7.1f} ms{warm:>9.2f} ms{cold / warm:>9.0f}x")
+
+        client.post("/attendance/manual", json={"student_id": 1, "status": "Late", "date": "2024-02-06T09:00:00"})
+        url = URLS[1]
+        print(f"\nafter a write to 2024-02-06: {url} {download(client, url):.1f} ms, "
+              f"then {download(client, url):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Peak memory of reports over a large attendance table
+
+Runs each report in its own process and records the growth in peak RSS,
+next to the previous implementation that loaded every row (ORM objects or
+a full list of dicts) before aggregating or writing.
+
+    python -m benchmarks.bench_report_memory --students 2000 --days 365
+"""
+import argparse
+import csv
+import shutil
+import tempfile
+from collections import Counter
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from attendance_manager import calculate_attendance_percentage, get_attendance_summary_by_date
+from models import Attendance, Student
+from utils import reporting
+from benchmarks.common import temp_database, seed, peak_rss
+
+PROBE_DAY = "2024-03-05"
+
+
+def _session(db_path: str):
+    engine = create_engine(f"sqlite:///{db_path}")
+    return sessionmaker(bind=engine)()
+
+
+def export_before(db_path: str, out: str):
+    db = _session(db_path)
+    rows = []
+    for att_id, student_id, day, status, created_at in db.query(
+        Attendance.id, Attendance.student_id, Attendance.day, Attendance.status, Attendance.created_at
+    ):
+        rows.append({"id": att_id, "student_id": student_id, "day": day, "status": status, "created_at": created_at})
+    names = dict(db.query(Student.id, Student.name))
+    for row in rows:
+        row["student_name"] = names.get(row["student_id"], "Unknown")
+    rows.sort(key=lambda row: (row["day"], row["id"]))
+    with open(out, "w", newline="") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(reporting.EXPORT_COLUMNS)
+        writer.writerows(reporting._export_values(row) for row in rows)
+
+
+def export_after(db_path: str, out: str):
+    reporting.write_attendance_export(_session(db_path), Path(out), "csv")
+
+
+def summary_before(db_path: str):
+    db = _session(db_path)
+    Counter(status.lower() for (status,) in db.query(Attendance.status))
+
+
+def summary_after(db_path: str):
+    reporting.get_attendance_summary(_session(db_path))
+
+
+def day_before(db_path: str):
+    from datetime import date
+    db = _session(db_path)
+    records = db.query(Attendance).filter(Attendance.day == date.fromisoformat(PROBE_DAY)).all()
+    Counter(record.status.lower() for record in records)
+
+
+def day_after(db_path: str):
+    from datetime import date
+    get_attendance_summary_by_date(_session(db_path), date.fromisoformat(PROBE_DAY))
+
+
+def student_before(db_path: str):
+    db = _session(db_path)
+    records = db.query(Attendance).filter(Attendance.student_id == 17).all()
+    Counter(record.status.lower() for record in records)
+
+
+def student_after(db_path: str):
+    calculate_attendance_percentage(_session(db_path), 17)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    with temp_database() as (engine, SessionLocal, workdir):
+        db = SessionLocal()
+        seed(db, args.students, args.days)
+        rows = db.query(Attendance).count()
+        db.close()
+        engine.dispose()
+        # The report processes open their own engines on a copy of the file
+        db_path = str(workdir / "reports.db")
+        shutil.copy(workdir / "bench.db", db_path)
+        out = str(workdir / "export.csv")
+
+        print(f"{rows:,} attendance rows\n")
+        print(f"{'report':<28}{'before':>22}{'after':>22}")
+        reports = [
+            ("CSV export, all rows", (export_before, db_path, out), (export_after, db_path, out)),
+            ("summary, all days", (summary_before, db_path), (summary_after, db_path)),
+            ("summary, one day", (day_before, db_path), (day_after, db_path)),
+            ("student percentage", (student_before, db_path), (student_after, db_path)),
+        ]
+        for name, before, after in reports:
+            cells = []
+            for fn, *fn_args in (before, after):
+                seconds, grown = peak_rss(fn, *fn_args)
+                cells.append(f"{grown / 1e6:7.1f} MB {seconds * 1000:7.0f} ms")
+            print(f"{name:<28}{cells[0]:>22}{cells[1]:>22}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Response cache benchmark: roster fetches with and without the cache
+
+Fetches GET /students/ the way the frontend does on every page load (no
+If-None-Match), for several roster sizes, first with the response cache
+off and then on. A student is renamed every `--write-every` fetches, so the
+cached run pays for a render after each write.
+
+    python -m benchmarks.bench_roster_cache --fetches 500 --write-every 100
+"""
+import argparse
+import os
+import statistics
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import insert
+
+from benchmarks.common import temp_database, app_client, QueryCounter
+from models import Student
+from response_cache import lookups, responses
+
+
+def fetch(client, counter, size: int, fetches: int, write_every: int) -> dict:
+    counter.count = 0
+    latencies = []
+    for index in range(fetches):
+        if index and index % write_every == 0:
+            client.put("/students/1", json={"name": f"Renamed {index}"})
+        started = time.perf_counter()
+        response = client.get("/students/", params={"limit": size})
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+    return {"p50": statistics.median(latencies) * 1000, "mean": statistics.mean(latencies) * 1000,
+            "statements": counter.count}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fetches", type=int, default=500)
+    parser.add_argument("--write-every", type=int, default=100)
+    args = parser.parse_args()
+
+    with temp_database() as (engine, SessionLocal, _):
+        db = SessionLocal()
+        db.execute(insert(Student), [{"name": f"Student {i}"} for i in range(1, 5001)])
+        db.commit()
+        db.close()
+        client = app_client(SessionLocal)
+        counter = QueryCounter(engine)
+
+        print(f"{args.fetches} fetches per run, a rename every {args.write_every}")
+        print(f"{'students':>9}{'uncached p50':>15}{'cached p50':>12}{'speedup':>9}"
+              f"{'uncached SQL':>14}{'cached SQL':>12}{'hit ratio':>11}")
+        for size in (100, 1000, 5000):
+            responses.max_entries = 0
+            responses.clear()
+            uncached = fetch(client, counter, size, args.fetches, args.write_every)
+
+            responses.max_entries = 256
+            hits_before = lookups.value(endpoint="students", result="hit")
+            misses_before = lookups.value(endpoint="students", result="miss")
+            cached = fetch(client, counter, size, args.fetches, args.write_every)
+            hits = lookups.value(endpoint="students", result="hit") - hits_before
+            misses = lookups.value(endpoint="students", result="miss") - misses_before
+
+            print(f"{size:>9}{uncached['p50']:>12.2f} ms{cached['p50']:>9.2f} ms"
+                  f"{uncached['p50'] / cached['p50']:>8.1f}x{uncached['statements']:>14}{cached['statements']:>12}"
+                  f"{hits / (hits + misses):>11.1%}")
+
+
+if __name__ == "__main__":
+    main()
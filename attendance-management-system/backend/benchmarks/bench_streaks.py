@@ -0,0 +1,87 @@
+"""
+Absence streaks: flagged-student lookups and the cost of keeping state current
+
+Seeds a term, builds the streak table with a full recompute, then compares
+listing flagged students from the table with computing the same list from
+every student's history, and times single writes with and without the
+incremental refresh.
+
+    python -m benchmarks.bench_streaks --students 2000 --days 180 --writes 200
+"""
+import argparse
+import os
+import statistics
+import time
+from datetime import date, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import archive
+import attendance_manager
+import streaks
+from attendance_manager import get_attendance_by_student
+from models import Student
+from benchmarks.common import temp_database, seed, app_client, timed
+
+
+def flagged_from_histories(db) -> int:
+    """What the list costs without stored state: every student's full history"""
+    flagged = 0
+    for (student_id,) in db.query(Student.id):
+        records = sorted(((record.day, record.status) for record in get_attendance_by_student(db, student_id)),
+                         reverse=True)
+        state = streaks.compute_streak(records)
+        flagged += bool(state and state["flagged"])
+    return flagged
+
+
+def write_latencies(client, students: int, writes: int, start: date) -> list:
+    latencies = []
+    for index in range(writes):
+        day = start + timedelta(days=index // students)
+        started = time.perf_counter()
+        client.post("/attendance/manual", json={
+            "student_id": index % students + 1, "status": "Absent", "date": f"{day}T09:00:00"
+        }).raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--writes", type=int, default=200)
+    args = parser.parse_args()
+
+    with temp_database() as (engine, SessionLocal, workdir):
+        archive.ARCHIVE_DIR = workdir / "archive"
+        db = SessionLocal()
+        seed(db, args.students, args.days)
+        started = time.perf_counter()
+        streaks.recompute_all(db)
+        print(f"{args.students} students, {args.days} days; full recompute {time.perf_counter() - started:.1f}s")
+
+        client = app_client(SessionLocal)
+        flagged = len(client.get("/attendance/flagged").json())
+        print(f"\nflagged students: {flagged}")
+        print(f"GET /attendance/flagged:        {timed(lambda: client.get('/attendance/flagged'), 20):8.2f} ms")
+        print(f"from every student's history:   {timed(lambda: flagged_from_histories(db), 1):8.0f} ms")
+
+        next_day = date(2024, 1, 1) + timedelta(days=args.days)
+        with_refresh = write_latencies(client, args.students, args.writes, next_day)
+        differences = streaks.recompute_all(db, check=True)
+        refresh = attendance_manager.refresh_streaks
+        attendance_manager.refresh_streaks = lambda db, student_ids: None
+        try:
+            without_refresh = write_latencies(client, args.students, args.writes, next_day + timedelta(days=7))
+        finally:
+            attendance_manager.refresh_streaks = refresh
+        print(f"\nPOST /attendance/manual p50 without refresh: {statistics.median(without_refresh):.2f} ms")
+        print(f"POST /attendance/manual p50 with refresh:    {statistics.median(with_refresh):.2f} ms")
+        print(f"stored vs recomputed after the refreshed writes: {len(differences)} students differ")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Delta sync vs full refetch for a tablet catching up on a day with few changes
+
+Seeds a term, marks the whole of today, and records the tablet's sync
+cursor. Then a handful of marks are corrected and a student renamed, and
+the tablet catches up either by re-downloading today's attendance and the
+student list, or with one GET /sync from its cursor. Reports bytes and
+latency of each, and of a retried offline upload.
+
+    python -m benchmarks.bench_sync --students 2000 --days 180 --changes 20
+"""
+import argparse
+import os
+import time
+from datetime import date, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import archive
+from benchmarks.common import temp_database, seed, app_client, timed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--changes", type=int, default=20)
+    args = parser.parse_args()
+
+    with temp_database() as (engine, SessionLocal, workdir):
+        archive.ARCHIVE_DIR = workdir / "archive"
+        db = SessionLocal()
+        seed(db, args.students, args.days)
+        db.close()
+        client = app_client(SessionLocal)
+
+        today = date(2024, 1, 1) + timedelta(days=args.days)
+        client.post("/attendance/bulk", json=[
+            {"student_id": student_id, "status": "Present", "date": f"{today}T08:00:00"}
+            for student_id in range(1, args.students + 1)
+        ]).raise_for_status()
+
+        cursor = 0
+        while True:
+            batch = client.get("/sync", params={"since": cursor, "limit": 10_000}).json()
+            cursor = batch["next"]
+            if not batch["has_more"]:
+                break
+        print(f"{args.students} students, {args.days} days; tablet cursor {cursor}, "
+              f"{args.changes} changes since\n")
+
+        for student_id in range(1, args.changes + 1):
+            client.post("/attendance/manual", json={
+                "student_id": student_id * 7 % args.students + 1, "status": "Late", "date": f"{today}T08:30:00"
+            }).raise_for_status()
+        client.put("/students/1", json={"name": "Student One"}).raise_for_status()
+
+        def full():
+            return [client.get(f"/attendance/date/{today}"), client.get("/students/")]
+
+        def delta():
+            return [client.get("/sync", params={"since": cursor})]
+
+        print(f"{'':<28}{'bytes':>10}{'latency':>13}")
+        for name, fetch in (("full refetch (day + roster)", full), ("GET /sync?since=cursor", delta)):
+            size = sum(len(response.content) for response in fetch())
+            print(f"{name:<28}{size:>10,}{timed(fetch, 10):>10.2f} ms")
+
+        uploads = [
+            {"client_id": f"tablet-1:{student_id}", "student_id": student_id, "status": "Absent",
+             "date": f"{today + timedelta(days=1)}T08:00:00"}
+            for student_id in range(1, 41)
+        ]
+        for attempt in ("upload of 40 offline marks", "same upload retried"):
+            started = time.perf_counter()
+            response = client.post("/sync/attendance", json=uploads)
+            elapsed = (time.perf_counter() - started) * 1000
+            applied = sum(result["result"] == "applied" for result in response.json())
+            print(f"{attempt:<28}{len(response.content):>10,}{elapsed:>10.2f} ms  ({applied} applied)")
+
+if __name__ == "__main__":
+    main()
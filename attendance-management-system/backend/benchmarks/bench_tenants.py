@@ -0,0 +1,171 @@
+"""
+Tenants: aggregate write throughput of one database per school vs one shared database
+
+Seeds `--schools` schools with `--class-size` students each, once all in
+the default database and once as one tenant database per school, then
+runs `--workers` threads each marking attendance for schools in turn, one
+transaction of `--batch` records per write, through the tenant-aware
+SessionLocal that get_db uses. The shared database serializes every write
+on one SQLite write lock; tenant databases only serialize writes of the
+same school. Commits in WAL mode with synchronous=NORMAL do not wait for
+the disk, so on a fast disk or a single CPU both setups are bound by
+Python and come out alike; `--synchronous FULL` makes every commit fsync,
+which is where separate write locks pay off. With `--max-engines` below `--schools` the engine LRU keeps
+closing and reopening tenants, which shows the cost of a too-small LRU.
+
+    python -m benchmarks.bench_tenants --schools 50 --workers 16 --writes 5000
+    python -m benchmarks.bench_tenants --synchronous FULL
+    python -m benchmarks.bench_tenants --max-engines 10
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+_workdir = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{_workdir.name}/shared.db"
+os.environ["TENANT_DIR"] = f"{_workdir.name}/tenants"
+
+from sqlalchemy import event, insert
+from sqlalchemy.pool import Pool
+
+from attendance_manager import upsert_attendance_records
+from database import SessionLocal, current_tenant, engine, tenant_engine_events, tenant_engines
+from migrations import bootstrap_schema
+from models import Student
+from schemas import AttendanceCreate, AttendanceStatus
+
+STATUSES = [AttendanceStatus.present] * 8 + [AttendanceStatus.absent, AttendanceStatus.late]
+
+
+def set_synchronous(mode: str):
+    """Switch every pooled write connection, shared or tenant, to the given synchronous mode"""
+
+    @event.listens_for(Pool, "checkout")
+    def _synchronous(dbapi_connection, connection_record, connection_proxy):
+        if connection_record.info.get("synchronous") != mode:
+            cursor = dbapi_connection.cursor()
+            if not cursor.execute("PRAGMA query_only").fetchone()[0]:
+                cursor.execute(f"PRAGMA synchronous={mode}")
+            cursor.close()
+            connection_record.info["synchronous"] = mode
+
+
+def school_name(school: int) -> str:
+    return f"school-{school}"
+
+
+def seed(schools: int, class_size: int):
+    """Every school's students in the shared database, and in each school's own"""
+    bootstrap_schema(engine)
+    db = SessionLocal()
+    db.execute(insert(Student), [
+        {"name": f"Student {school}-{index}"} for school in range(schools) for index in range(class_size)
+    ])
+    db.commit()
+    db.close()
+
+    for school in range(schools):
+        token = current_tenant.set(school_name(school))
+        db = SessionLocal()
+        db.execute(insert(Student), [{"name": f"Student {school}-{index}"} for index in range(class_size)])
+        db.commit()
+        db.close()
+        current_tenant.reset(token)
+
+
+def run(tenanted: bool, args) -> dict:
+    """`args.writes` transactions spread over the schools by `args.workers` threads"""
+    latencies = []
+    lock = threading.Lock()
+    counter = iter(range(args.writes))
+    first_day = datetime(2030, 1, 1, 8)
+
+    def worker(seed_value: int):
+        rng = random.Random(seed_value)
+        local = []
+        for write in iter(lambda: next(counter, None), None):
+            school = rng.randrange(args.schools)
+            # In the shared database each school's students follow the previous school's
+            offset = 0 if tenanted else school * args.class_size
+            day = first_day + timedelta(days=write // (args.schools * args.class_size))
+            records = [
+                AttendanceCreate(student_id=offset + rng.randrange(args.class_size) + 1, status=rng.choice(STATUSES),
+                                 date=day)
+                for _ in range(args.batch)
+            ]
+            if tenanted:
+                current_tenant.set(school_name(school))
+            started = time.perf_counter()
+            db = SessionLocal()
+            try:
+                upsert_attendance_records(db, records)
+            finally:
+                db.close()
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(args.seed + index,)) for index in range(args.workers)]
+    opened_before = tenant_engine_events.value(event="opened")
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "writes_per_second": len(latencies) / elapsed,
+        "records_per_second": len(latencies) * args.batch / elapsed,
+        "mean": statistics.mean(latencies) * 1000,
+        "p50": statistics.median(latencies) * 1000,
+        "p95": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "opened": tenant_engine_events.value(event="opened") - opened_before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--schools", type=int, default=50)
+    parser.add_argument("--class-size", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=16, help="threads writing at once")
+    parser.add_argument("--writes", type=int, default=5000, help="transactions per run")
+    parser.add_argument("--batch", type=int, default=1, help="records per transaction")
+    parser.add_argument("--max-engines", type=int, default=None,
+                        help="tenant engine LRU size (default: TENANT_MAX_ENGINES, at least --schools)")
+    parser.add_argument("--synchronous", choices=["NORMAL", "FULL"], default="NORMAL",
+                        help="SQLite synchronous mode of the write connections")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    tenant_engines.max_engines = args.max_engines or max(tenant_engines.max_engines, args.schools)
+    if args.synchronous != "NORMAL":
+        set_synchronous(args.synchronous)
+    seed(args.schools, args.class_size)
+
+    print(f"{args.schools} schools x {args.class_size} students, {args.workers} writer threads, "
+          f"{args.writes} transactions of {args.batch} record(s), tenant LRU of {tenant_engines.max_engines}, synchronous={args.synchronous}")
+    print(f"{'':20}{'writes/s':>10}{'records/s':>11}{'mean ms':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'opens':>7}")
+    results = {}
+    for label, tenanted in (("shared database", False), ("database per school", True)):
+        results[label] = result = run(tenanted, args)
+        print(f"{label:20}{result['writes_per_second']:>10.0f}{result['records_per_second']:>11.0f}"
+              f"{result['mean']:>9.2f}{result['p50']:>9.2f}{result['p95']:>9.2f}{result['p99']:>9.2f}"
+              f"{result['opened'] if tenanted else '':>7}")
+    speedup = results["database per school"]["writes_per_second"] / results["shared database"]["writes_per_second"]
+    print(f"aggregate write throughput: {speedup:.2f}x the shared database")
+
+    tenant_engines.close_all()
+    engine.dispose()
+    _workdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Term report batch: throughput and scaling with the number of workers
+
+Seeds a term of attendance and writes one report per student with 1, 2, 4
+... workers (up to `--max-workers`), printing reports per second, the
+speedup over one worker and how evenly the partitions spread.
+
+    python -m benchmarks.bench_term_reports --students 2000 --days 120 --max-workers 8
+"""
+import argparse
+import os
+import statistics
+from datetime import date
+
+import archive
+from term_reports import generate_term_reports
+from benchmarks.common import temp_database, seed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=120)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with temp_database() as (engine, SessionLocal, workdir):
+        db = SessionLocal()
+        seed(db, args.students, args.days)
+        db.close()
+        # Keep the pool processes away from the real archive
+        os.environ["ATTENDANCE_ARCHIVE_DIR"] = str(workdir / "archive")
+        archive.ARCHIVE_DIR = workdir / "archive"
+
+        print(f"{args.students} students, {args.days} days, {os.cpu_count()} CPUs\n")
+        print(f"{'workers':>7}{'seconds':>10}{'reports/s':>12}{'speedup':>10}{'busy spread':>14}")
+        baseline = None
+        workers = 1
+        while workers <= args.max_workers:
+            stats = generate_term_reports(
+                date(2024, 1, 1), date(2024, 12, 31), workdir / f"reports-{workers}",
+                workers=workers, database_url=str(engine.url)
+            )
+            baseline = baseline or stats["seconds"]
+            busy = [worker["seconds"] for worker in stats["workers"].values()]
+            spread = max(busy) / statistics.mean(busy)
+            print(f"{workers:>7}{stats['seconds']:>10.1f}{stats['reports'] / stats['seconds']:>12.0f}"
+                  f"{baseline / stats['seconds']:>9.2f}x{spread:>13.2f}x")
+            workers *= 2
+
+
+if __name__ == "__main__":
+    main()
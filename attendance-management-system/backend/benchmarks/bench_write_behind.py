@@ -0,0 +1,124 @@
+"""
+Write-behind check-ins: burst throughput
+
+Runs a morning check-in burst (every student once, from many threads)
+against a WAL database through create_attendance_record directly and
+through the write-behind journal, reporting acknowledgement latency and
+the time until every check-in is in the database. Crash recovery is
+covered by tests/test_write_behind.py.
+
+    python -m benchmarks.bench_write_behind --students 3000 --threads 32
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import sessionmaker
+
+import archive
+from attendance_manager import create_attendance_record
+from database import make_write_engine
+from models import Attendance, Base, Student
+from schemas import AttendanceCreate
+from write_behind import WriteBehindJournal
+
+STATUSES = ["Present", "Absent", "Late"]
+CHECKIN_TIME = datetime(2024, 9, 2, 8, 0)
+
+
+def open_database(path: Path) -> sessionmaker:
+    engine = make_write_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def new_database(workdir: Path, name: str, students: int) -> sessionmaker:
+    SessionLocal = open_database(workdir / f"{name}.db")
+    db = SessionLocal()
+    db.execute(insert(Student), [{"name": f"Student {i}"} for i in range(1, students + 1)])
+    db.commit()
+    db.close()
+    return SessionLocal
+
+
+def checkin(student_id: int, status: str = None) -> AttendanceCreate:
+    return AttendanceCreate(
+        student_id=student_id,
+        status=status or STATUSES[student_id % 3],
+        date=CHECKIN_TIME + timedelta(seconds=student_id % 600),
+    )
+
+
+def burst(write, students: int, threads: int) -> list:
+    """Check every student in once from a thread pool; returns per-call latencies in ms"""
+    def one(student_id):
+        started = time.perf_counter()
+        write(checkin(student_id))
+        return (time.perf_counter() - started) * 1000
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(one, range(1, students + 1)))
+
+
+def report(name: str, latencies: list, seconds: float):
+    latencies = sorted(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{name:<16}{len(latencies) / seconds:>10.0f}/s{seconds:>9.2f} s"
+          f"{statistics.median(latencies):>10.2f} ms{p99:>10.2f} ms")
+
+
+def run_direct(workdir: Path, students: int, threads: int):
+    SessionLocal = new_database(workdir, "direct", students)
+
+    def write(record):
+        db = SessionLocal()
+        try:
+            create_attendance_record(db, record)
+        finally:
+            db.close()
+
+    started = time.perf_counter()
+    latencies = burst(write, students, threads)
+    report("direct", latencies, time.perf_counter() - started)
+
+
+def run_write_behind(workdir: Path, students: int, threads: int, flush_ms: int, batch_size: int):
+    SessionLocal = new_database(workdir, "write_behind", students)
+    journal = WriteBehindJournal(workdir / "checkins.journal", SessionLocal, flush_ms, batch_size)
+    journal.start()
+    started = time.perf_counter()
+    latencies = burst(lambda record: journal.submit([record]), students, threads)
+    acknowledged = time.perf_counter() - started
+    journal.stop()
+    written = time.perf_counter() - started
+    report("write-behind", latencies, acknowledged)
+    db = SessionLocal()
+    rows = db.scalar(select(func.count(Attendance.id)))
+    db.close()
+    print(f"{'':<16}all {rows} in the database after {written:.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=3000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--flush-ms", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        workdir = Path(workdir)
+        archive.ARCHIVE_DIR = workdir / "archive"
+        print(f"{args.students} check-ins from {args.threads} threads\n")
+        print(f"{'':<16}{'throughput':>12}{'burst':>11}{'ack p50':>13}{'ack p99':>13}")
+        run_direct(workdir, args.students, args.threads)
+        run_write_behind(workdir, args.students, args.threads, args.flush_ms, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
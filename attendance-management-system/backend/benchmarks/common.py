@@ -0,0 +1,131 @@
+"""Shared fixtures for the benchmark scripts (run from the backend directory)"""
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, date, timedelta
+from pathlib import Path
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from migrations import bootstrap_schema
+from models import Attendance, Student
+
+STATUSES = ["Present", "Present", "Present", "Present", "Absent", "Late"]
+
+
+@contextmanager
+def temp_database():
+    """
+    Yield (engine, SessionLocal, workdir) for a throwaway SQLite file
+
+    The schema is built by migrations.bootstrap_schema, as for a real
+    database, so writes pay for the sync and version triggers.
+    """
+    with tempfile.TemporaryDirectory() as workdir:
+        path = Path(workdir) / "bench.db"
+        engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        bootstrap_schema(engine)
+        try:
+            yield engine, sessionmaker(autocommit=False, autoflush=False, bind=engine), Path(workdir)
+        finally:
+            engine.dispose()
+
+
+def seed(db, students: int, days: int, start: date = date(2024, 1, 1), seed_value: int = 42):
+    """Insert `students` students and one attendance row per student per school day"""
+    rng = random.Random(seed_value)
+    db.execute(insert(Student), [{"name": f"Student {i}"} for i in range(1, students + 1)])
+    batch = []
+    day = start
+    for _ in range(days):
+        if day.weekday() < 5:
+            stamp = datetime.combine(day, datetime.min.time()) + timedelta(hours=8)
+            for student_id in range(1, students + 1):
+                batch.append({"student_id": student_id, "date": stamp, "status": rng.choice(STATUSES)})
+            if len(batch) >= 50_000:
+                db.execute(insert(Attendance), batch)
+                batch = []
+        day += timedelta(days=1)
+    if batch:
+        db.execute(insert(Attendance), batch)
+    db.commit()
+
+
+def timed(fn, repeat: int = 5):
+    """Return the best wall time of `repeat` calls, in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def _status_bytes(field: str) -> int:
+    with open("/proc/self/status") as handle:
+        for line in handle:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) * 1024
+
+
+def _measure(fn, args, results):
+    # Reset the peak RSS (VmHWM) to the current RSS before running
+    with open("/proc/self/clear_refs", "w") as handle:
+        handle.write("5")
+    baseline = _status_bytes("VmRSS")
+    started = time.perf_counter()
+    fn(*args)
+    elapsed = time.perf_counter() - started
+    results.put((elapsed, max(0, _status_bytes("VmHWM") - baseline)))
+
+
+def peak_rss(fn, *args) -> tuple[float, int]:
+    """
+    Run fn(*args) in a fresh process; return (seconds, peak RSS growth in bytes)
+
+    Each measurement gets its own process so memory kept by earlier runs
+    (allocator pools, caches) doesn't hide growth. fn must be importable
+    (module level); its module's imports happen before the baseline is
+    taken. Linux only.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_measure, args=(fn, args, results))
+    process.start()
+    outcome = results.get()
+    process.join()
+    return outcome
+
+
+def app_client(SessionLocal):
+    """TestClient for the app with every route using the given session factory"""
+    from fastapi.testclient import TestClient
+    from database import get_read_db, get_write_db
+    from main import app
+
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_read_db] = override_get_db
+    app.dependency_overrides[get_write_db] = override_get_db
+    return TestClient(app)
+
+
+class QueryCounter:
+    """Count SQL statements executed on an engine"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
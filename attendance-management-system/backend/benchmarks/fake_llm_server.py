@@ -0,0 +1,128 @@
+"""
+Local stand-in for the Groq chat completions API with injected latency
+
+Answers every completion after `latency` seconds (plus jitter) and, like the
+real provider, returns 429 once more than `limit` requests arrive within a
+one-second window. `error_rate` makes a share of requests fail with 500 and
+`stall` holds every response for that many extra seconds, to simulate a
+flaky or hanging provider.
+
+    python -m benchmarks.fake_llm_server --port 8099 --latency 0.3 --limit 10 --error-rate 0.2
+    GROQ_API_KEY=fake GROQ_BASE_URL=http://127.0.0.1:8099 uvicorn main:app
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency: float = 0.3, jitter: float = 0.1, limit: int = 10,
+                 error_rate: float = 0.0, stall: float = 0.0):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.limit = limit
+        self.error_rate = error_rate
+        self.stall = stall
+        self.accepted = 0
+        self.rate_limited = 0
+        self._recent = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def admit(self) -> bool:
+        """Sliding one-second window rate limit"""
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0] > 1.0:
+                self._recent.popleft()
+            if len(self._recent) >= self.limit:
+                self.rate_limited += 1
+                return False
+            self._recent.append(now)
+            self.accepted += 1
+            return True
+
+    def handle_error(self, request, client_address):
+        # Clients that hit their deadline hang up mid-response; that's expected here
+        pass
+
+    def start(self) -> "FakeLLMServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def _completion(command: str) -> dict:
+    """Answer the prompt the way the model would for simple commands"""
+    names = re.findall(r'\b[A-Z][a-z]+\b', command)
+    status = next((word for word in ("absent", "late") if word in command.lower()), "present")
+    content = json.dumps({"students": names, "status": status, "date": None})
+    return {
+        "id": "fake-completion",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": "llama-3.1-8b-instant",
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.server.admit():
+            self._reply(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                        {"retry-after": "1"})
+            return
+        time.sleep(max(0.0, self.server.latency + random.uniform(-1, 1) * self.server.jitter) + self.server.stall)
+        if random.random() < self.server.error_rate:
+            self._reply(500, {"error": {"message": "Internal server error", "type": "internal_server_error"}})
+            return
+        prompt = body.get("messages", [{}])[-1].get("content", "")
+        match = re.search(r'Text to parse: "(.*)"', prompt)
+        self._reply(200, _completion(match.group(1) if match else ""))
+
+    def _reply(self, status: int, payload: dict, headers: dict = None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--limit", type=int, default=10, help="requests per second before 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 500")
+    parser.add_argument("--stall", type=float, default=0.0, help="extra seconds before every response")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(("127.0.0.1", args.port), args.latency, args.jitter, args.limit,
+                           args.error_rate, args.stall)
+    print(f"Fake LLM listening on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
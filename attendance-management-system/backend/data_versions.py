@@ -0,0 +1,155 @@
+import hashlib
+import threading
+import uuid
+from collections import defaultdict
+from datetime import date
+from typing import Iterable, List, Optional
+
+from fastapi import Request, Response
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from database import current_tenant
+from models import DataVersion, DayVersion
+
+# Table versions (data_versions) and the versions of each day's attendance
+# (day_versions) live in the database, bumped by triggers on every insert,
+# update and delete, so writes by any process, a second worker or a
+# command-line tool, are seen by all of them. Each tenant's database holds
+# its own. The "epoch" row is a random number drawn when the database is
+# created, so tags from a database that was since replaced never match.
+# Tables whose writes bump a version, and the version they bump: the
+# section lists change with memberships as well as with sections
+VERSIONED_TABLES = {
+    "students": "students",
+    "class_sections": "class_sections",
+    "section_memberships": "class_sections",
+}
+
+EPOCH_ROW = "epoch"
+
+# Check-ins waiting in the write-behind journal are merged into reads of
+# their day but only exist in this process, so they are versioned here,
+# under a per-process epoch.
+_EPOCH = uuid.uuid4().hex[:8]
+_lock = threading.Lock()
+_pending_versions = defaultdict(int)  # (tenant, day) -> version
+
+
+def _version_triggers(table: str, name: str) -> List[str]:
+    """Triggers bumping version `name` on every insert, update and delete of table"""
+    return [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS version_{table}_{event.lower()} AFTER {event} ON {table}
+        BEGIN
+            INSERT INTO data_versions (name, version) VALUES ('{name}', 1)
+            ON CONFLICT (name) DO UPDATE SET version = version + 1;
+        END
+        """
+        for event in ("INSERT", "UPDATE", "DELETE")
+    ]
+
+
+def _day_triggers() -> List[str]:
+    """Triggers bumping the day_versions of the days an attendance write touches"""
+    bump = """
+            INSERT INTO day_versions (day, version) VALUES ({row}.day, 1)
+            ON CONFLICT (day) DO UPDATE SET version = version + 1;"""
+    return [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS version_attendance_{event.lower()} AFTER {event} ON attendance
+        BEGIN{"".join(bump.format(row=row) for row in rows)}
+        END
+        """
+        for event, rows in (("INSERT", ["NEW"]), ("UPDATE", ["OLD", "NEW"]), ("DELETE", ["OLD"]))
+    ]
+
+
+def install_version_tracking(conn):
+    """Create the triggers keeping data_versions and day_versions up to date, and draw the epoch"""
+    for table, name in VERSIONED_TABLES.items():
+        for trigger in _version_triggers(table, name):
+            conn.execute(text(trigger))
+    for trigger in _day_triggers():
+        conn.execute(text(trigger))
+    conn.execute(text(
+        f"INSERT OR IGNORE INTO data_versions (name, version) VALUES ('{EPOCH_ROW}', abs(random() % 2147483648))"
+    ))
+
+
+def bump_pending(days: Iterable[date]):
+    """Record a change to the pending check-ins of the given days"""
+    tenant = current_tenant.get()
+    with _lock:
+        for day in set(days):
+            _pending_versions[tenant, day] += 1
+
+
+def table_version(db: Session, table: str) -> int:
+    """Get the current version of a table, as committed by any process"""
+    return db.execute(select(DataVersion.version).where(DataVersion.name == table)).scalar() or 0
+
+
+def day_version(db: Session, day: date) -> int:
+    """Get the current version of a day's attendance, as committed by any process"""
+    return db.execute(select(DayVersion.version).where(DayVersion.day == day)).scalar() or 0
+
+
+def pending_version(day: date) -> str:
+    """Get the version of a day's pending check-ins in this process, "0" if it never had any"""
+    version = _pending_versions[current_tenant.get(), day]
+    return f"{_EPOCH}.{version}" if version else "0"
+
+
+def range_fingerprint(db: Session, start: date, end: date, tables: Iterable[str] = ()) -> str:
+    """
+    Hash the versions of every day in [start, end] and of the given tables
+
+    Any write to a day in the range, or to one of the tables, changes the
+    hash, whichever process makes it. Like the ETags it includes the
+    database's epoch, and the tenant.
+    """
+    days = [
+        (day.isoformat(), version) for day, version in db.execute(
+            select(DayVersion.day, DayVersion.version)
+            .where(DayVersion.day >= start, DayVersion.day <= end)
+            .order_by(DayVersion.day)
+        )
+    ]
+    versions = [(table, table_version(db, table)) for table in sorted(tables)]
+    epoch = table_version(db, EPOCH_ROW)
+    return hashlib.sha256(repr((epoch, current_tenant.get(), days, versions)).encode()).hexdigest()
+
+
+def make_etag(db: Session, *parts) -> str:
+    """Build a strong ETag from the versions a response was rendered from, and the database's epoch"""
+    tenant = current_tenant.get()
+    epoch = str(table_version(db, EPOCH_ROW))
+    prefix = [epoch] if tenant is None else [epoch, tenant]
+    return '"' + "-".join([*prefix, *(str(part) for part in parts)]) + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check whether the request's If-None-Match header matches etag"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so ignore any W/ prefix
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag in candidates
+
+
+def conditional_response(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """
+    Tag a response with etag, or return a 304 if the client already has it
+
+    Compute etag from the versions before querying, so a write racing with
+    the query can only make the tag older than the body, never newer.
+    """
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -1,22 +1,316 @@
-from sqlalchemy import create_engine
+from fastapi import Depends
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextvars import ContextVar
 from pathlib import Path
+from typing import Callable, List, Optional
+import os
+import threading
+import time
+from db_monitor import TimedQueuePool, instrument_engine
+from metrics import Counter, Gauge
 
 # Create the database path relative to this file
 BASE_DIR = Path(__file__).resolve().parent
 DATABASE_PATH = BASE_DIR / "attendance.db"
-DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
+DATABASE_URL = os.environ.get("DATABASE_URL", f"sqlite:///{DATABASE_PATH}")
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Writes serialize on SQLite's lock anyway, so a couple of writer connections
+# suffice; reports get a larger pool of read-only connections with more cache
+WRITE_POOL_SIZE = int(os.environ.get("DB_WRITE_POOL_SIZE", 2))
+READ_POOL_SIZE = int(os.environ.get("DB_READ_POOL_SIZE", 8))
+READ_CACHE_KIB = int(os.environ.get("DB_READ_CACHE_KIB", 64 * 1024))
+POOL_TIMEOUT_SECONDS = float(os.environ.get("DB_POOL_TIMEOUT_SECONDS", 30))
+
+# Each school (tenant) gets its own database file in TENANT_DIR. At most
+# TENANT_MAX_ENGINES tenants keep engines open; tenants idle for
+# TENANT_IDLE_SECONDS are closed too. Tenant pools are small, since each
+# file has its own write lock and sees a fraction of the traffic.
+TENANT_DIR = Path(os.environ.get("TENANT_DIR", BASE_DIR / "tenants"))
+TENANT_MAX_ENGINES = int(os.environ.get("TENANT_MAX_ENGINES", 32))
+TENANT_IDLE_SECONDS = float(os.environ.get("TENANT_IDLE_SECONDS", 300))
+TENANT_WRITE_POOL_SIZE = int(os.environ.get("DB_TENANT_WRITE_POOL_SIZE", 1))
+TENANT_READ_POOL_SIZE = int(os.environ.get("DB_TENANT_READ_POOL_SIZE", 2))
+
+tenant_engines_open = Gauge("tenant_engines_open", "Tenant databases with open engines")
+tenant_engine_events = Counter("tenant_engine_events_total", "Tenant engines opened, and closed by reason")
+tenant_engines_open.set(0)
+
+# The school whose database the current request or job uses; None means the
+# default database. Set by tenants.TenantMiddleware, and copied into the
+# threadpool that runs sync routes and into background jobs.
+current_tenant: ContextVar[Optional[str]] = ContextVar("current_tenant", default=None)
+
+
+def _is_file_database(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+
+def make_write_engine(database_url: str = DATABASE_URL, pool_size: int = WRITE_POOL_SIZE):
+    """Create the engine used for writes, in WAL mode so readers never block it"""
+    url = make_url(database_url)
+    pool_args = {}
+    if _is_file_database(url):
+        pool_args = {
+            "poolclass": TimedQueuePool, "pool_size": pool_size, "max_overflow": 0,
+            "pool_timeout": POOL_TIMEOUT_SECONDS,
+        }
+    write_engine = create_engine(
+        url, connect_args={"check_same_thread": False}, pool_logging_name="write", **pool_args
+    )
+    instrument_engine(write_engine, "write")
+
+    @event.listens_for(write_engine, "connect")
+    def _configure_writer(dbapi_connection, connection_record):
+        if _is_file_database(url):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.close()
+
+    return write_engine
+
+
+def make_read_engine(database_url: str = DATABASE_URL, pool_size: int = READ_POOL_SIZE):
+    """Create the engine used for reads, opening the database read-only"""
+    url = make_url(database_url)
+    pool_args = {}
+    if _is_file_database(url):
+        # mode=ro makes SQLite itself reject writes on these connections
+        path = Path(url.database).resolve().as_posix()
+        url = url.set(database=f"file:{path}", query={"mode": "ro", "uri": "true"})
+        pool_args = {
+            "poolclass": TimedQueuePool, "pool_size": pool_size, "max_overflow": pool_size,
+            "pool_timeout": POOL_TIMEOUT_SECONDS,
+        }
+    read_engine = create_engine(
+        url, connect_args={"check_same_thread": False}, pool_logging_name="read", **pool_args
+    )
+    instrument_engine(read_engine, "read")
+
+    @event.listens_for(read_engine, "connect")
+    def _configure_reader(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA query_only=ON")
+        cursor.execute(f"PRAGMA cache_size=-{READ_CACHE_KIB}")
+        cursor.close()
+
+    return read_engine
+
+
+class _TenantDatabase:
+    def __init__(self, tenant: str, directory: Path):
+        url = f"sqlite:///{directory / f'{tenant}.db'}"
+        self.write_engine = make_write_engine(url, pool_size=TENANT_WRITE_POOL_SIZE)
+        self.read_engine = None
+        self.write_sessions = sessionmaker(autocommit=False, autoflush=False, bind=self.write_engine)
+        self.read_sessions = None
+        self.last_used = time.monotonic()
+
+    def open_reader(self):
+        # The read-only engine can only open the file once the writer has created it
+        self.read_engine = make_read_engine(self.write_engine.url.render_as_string(), pool_size=TENANT_READ_POOL_SIZE)
+        self.read_sessions = sessionmaker(autocommit=False, autoflush=False, bind=self.read_engine)
+
+    def dispose(self):
+        # Connections still checked out by running requests are closed when they come back
+        for tenant_engine in (self.write_engine, self.read_engine):
+            if tenant_engine is not None:
+                tenant_engine.dispose()
+
+
+class TenantEngines:
+    """
+    Engines for each tenant's database, opened on first use and kept in an LRU
+
+    Opening a tenant creates its database file if needed and brings the
+    schema up to date (migrations.bootstrap_schema), without holding up
+    requests for tenants that are already open. Past max_engines open
+    tenants, or after idle_seconds without use, a tenant's engines are
+    disposed and the on_close callbacks run, so per-tenant in-memory state
+    can be dropped; the next request for it opens them again.
+    """
+
+    def __init__(self, directory: Path = TENANT_DIR, max_engines: int = TENANT_MAX_ENGINES,
+                 idle_seconds: float = TENANT_IDLE_SECONDS):
+        self.directory = directory
+        self.max_engines = max_engines
+        self.idle_seconds = idle_seconds
+        self.on_close: List[Callable[[str], None]] = []
+        self._databases = OrderedDict()  # tenant -> _TenantDatabase, least recently used first
+        self._opening = {}  # tenant -> Future of the _TenantDatabase being opened
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._databases)
+
+    def exists(self, tenant: str) -> bool:
+        """Whether the tenant's database has been created"""
+        return tenant in self._databases or (self.directory / f"{tenant}.db").exists()
+
+    def get(self, tenant: str) -> _TenantDatabase:
+        # Opening a tenant runs its migrations, so it happens outside the lock;
+        # concurrent requests for the same tenant wait on the first one's future
+        with self._lock:
+            database = self._databases.get(tenant)
+            opening = self._opening.get(tenant) if database is None else None
+            opener = database is None and opening is None
+            if opener:
+                opening = self._opening[tenant] = Future()
+        if opener:
+            try:
+                database = self._open(tenant)
+            except BaseException as e:
+                with self._lock:
+                    del self._opening[tenant]
+                opening.set_exception(e)
+                raise
+        elif database is None:
+            database = opening.result()
+
+        closed = []
+        with self._lock:
+            if opener:
+                del self._opening[tenant]
+                self._databases[tenant] = database
+                tenant_engine_events.inc(event="opened")
+            if self._databases.get(tenant) is database:
+                self._databases.move_to_end(tenant)
+            database.last_used = now = time.monotonic()
+            # Least recently used first: stop at the first tenant still in use
+            while len(self._databases) > 1:
+                if len(self._databases) > self.max_engines:
+                    reason = "lru"
+                elif now - next(iter(self._databases.values())).last_used > self.idle_seconds:
+                    reason = "idle"
+                else:
+                    break
+                closed.append((*self._databases.popitem(last=False), reason))
+            tenant_engines_open.set(len(self._databases))
+        if opener:
+            opening.set_result(database)
+        for closed_tenant, closed_database, reason in closed:
+            self._close(closed_tenant, closed_database, reason)
+        return database
+
+    def _open(self, tenant: str) -> _TenantDatabase:
+        from migrations import bootstrap_schema
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        database = _TenantDatabase(tenant, self.directory)
+        try:
+            bootstrap_schema(database.write_engine)
+            database.open_reader()
+        except BaseException:
+            database.dispose()
+            raise
+        return database
+
+    def _close(self, tenant: str, database: _TenantDatabase, reason: str):
+        database.dispose()
+        tenant_engine_events.inc(event=f"closed_{reason}")
+        for callback in self.on_close:
+            callback(tenant)
+
+    def close_all(self):
+        with self._lock:
+            databases = list(self._databases.items())
+            self._databases.clear()
+            tenant_engines_open.set(0)
+        for tenant, database in databases:
+            self._close(tenant, database, "shutdown")
+
+
+tenant_engines = TenantEngines()
+
+
+class TenantSessionFactory:
+    """
+    Session factory for the current tenant's database
+
+    Outside any tenant it makes sessions on the default engine, so
+    single-school deployments and the command-line tools work as before.
+    """
+
+    def __init__(self, default: sessionmaker, readonly: bool):
+        self.default = default
+        self.readonly = readonly
+
+    def __call__(self, **kwargs):
+        tenant = current_tenant.get()
+        if tenant is None:
+            return self.default(**kwargs)
+        database = tenant_engines.get(tenant)
+        return (database.read_sessions if self.readonly else database.write_sessions)(**kwargs)
+
+
+engine = make_write_engine()
+read_engine = make_read_engine()
+SessionLocal = TenantSessionFactory(sessionmaker(autocommit=False, autoflush=False, bind=engine), readonly=False)
+ReadSessionLocal = TenantSessionFactory(sessionmaker(autocommit=False, autoflush=False, bind=read_engine), readonly=True)
 
 Base = declarative_base()
 
-def get_db():
-    """Dependency for getting database session"""
-    db = SessionLocal()
+
+class RequestSessions:
+    """
+    The database sessions of one request, created on first use
+
+    Every dependency of a request gets the same sessions, so an auth
+    dependency and the route share one connection instead of each opening
+    their own. Once the request opens a writer session, its reads go
+    through it too, and a reader session opened before then is closed,
+    returning its connection to the pool.
+    """
+
+    def __init__(self):
+        self._read = None
+        self._write = None
+
+    @property
+    def read(self):
+        if self._write is not None:
+            return self._write
+        if self._read is None:
+            self._read = ReadSessionLocal()
+        return self._read
+
+    @property
+    def write(self):
+        if self._write is None:
+            self._write = SessionLocal()
+            if self._read is not None:
+                self._read.close()
+        return self._write
+
+    def close(self):
+        for session in (self._read, self._write):
+            if session is not None:
+                session.close()
+
+
+def get_request_sessions():
+    """Dependency for the request's sessions, closed when the request ends"""
+    sessions = RequestSessions()
     try:
-        yield db
+        yield sessions
     finally:
-        db.close()
\ No newline at end of file
+        sessions.close()
+
+
+def get_write_db(sessions: RequestSessions = Depends(get_request_sessions)):
+    """Dependency for the request's session on the writer pool"""
+    return sessions.write
+
+
+def get_read_db(sessions: RequestSessions = Depends(get_request_sessions)):
+    """Dependency for the request's session on the read-only pool, or its writer session if it has one"""
+    return sessions.read
+
+
+# Routes that both read and write use the writer pool
+get_db = get_write_db
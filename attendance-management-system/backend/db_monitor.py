@@ -0,0 +1,115 @@
+import contextvars
+import itertools
+import threading
+import time
+import warnings
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from metrics import Counter, Gauge, Histogram
+
+checkouts = Counter("db_pool_checkouts_total", "Connections checked out of the pool")
+checked_out = Gauge("db_pool_checked_out", "Connections currently checked out of the pool")
+wait_seconds = Histogram("db_pool_wait_seconds", "Time spent waiting for a pooled connection")
+hold_seconds = Histogram("db_pool_hold_seconds", "Time a connection stays checked out")
+timeouts = Counter("db_pool_timeouts_total", "Checkouts that gave up waiting for a connection")
+leaked = Counter("db_connections_leaked_total", "Connections still checked out after their request ended")
+
+# (request number, "METHOD /path") of the HTTP request being handled, if any;
+# copied into the threadpool that runs sync dependencies and routes
+_current_request: contextvars.ContextVar[Optional[Tuple[int, str]]] = contextvars.ContextVar(
+    "current_request", default=None
+)
+_request_ids = itertools.count(1)
+_lock = threading.Lock()
+_outstanding: Dict[int, dict] = {}  # request number -> {connection record: (pool, checked out at)}
+
+
+class ConnectionLeakWarning(RuntimeWarning):
+    """A database connection outlived the request that checked it out"""
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a free connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            timeouts.inc(pool=self.logging_name)
+            raise
+        finally:
+            wait_seconds.observe(time.perf_counter() - started, pool=self.logging_name)
+
+
+def instrument_engine(engine, pool_name: str):
+    """Count checkouts and hold times of an engine's pool and tie each checkout to its request"""
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        now = time.perf_counter()
+        request = _current_request.get()
+        connection_record.info["checked_out_at"] = now
+        connection_record.info["request"] = request
+        checkouts.inc(pool=pool_name)
+        checked_out.inc(pool=pool_name)
+        if request:
+            with _lock:
+                _outstanding.setdefault(request[0], {})[connection_record] = (pool_name, now)
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        started = connection_record.info.pop("checked_out_at", None)
+        request = connection_record.info.pop("request", None)
+        if started is None:
+            return  # never handed out, e.g. closed after a failed connect
+        checked_out.dec(pool=pool_name)
+        hold_seconds.observe(time.perf_counter() - started, pool=pool_name)
+        if request:
+            with _lock:
+                connections = _outstanding.get(request[0])
+                if connections is not None:
+                    connections.pop(connection_record, None)
+
+
+def _report_leaks(request: Tuple[int, str]):
+    """Warn about connections the finished request never returned"""
+    with _lock:
+        connections = _outstanding.pop(request[0], {})
+    now = time.perf_counter()
+    for pool_name, started in connections.values():
+        leaked.inc(pool=pool_name)
+        warnings.warn(
+            f"{request[1]} finished with a connection from the {pool_name} pool still checked out "
+            f"({now - started:.2f}s); a session was not closed",
+            ConnectionLeakWarning,
+            stacklevel=2,
+        )
+
+
+class LeakDetectionMiddleware:
+    """
+    ASGI middleware tagging connection checkouts with the request that made them
+
+    Once the response is finished, any connection the request checked out
+    and did not return counts as leaked: it is reported with a
+    ConnectionLeakWarning and in db_connections_leaked_total.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        request = (next(_request_ids), f"{scope['method']} {scope['path']}")
+        token = _current_request.set(request)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_request.reset(token)
+            _report_leaks(request)
@@ -0,0 +1,197 @@
+import contextvars
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from database import BASE_DIR, ReadSessionLocal, current_tenant
+from schemas import ExportJob, ExportJobCreate, JobStatus
+from utils.reporting import write_attendance_export
+
+SPOOL_DIR = Path(os.environ.get("EXPORT_SPOOL_DIR", BASE_DIR / "export_spool"))
+EXPORT_WORKERS = int(os.environ.get("EXPORT_WORKERS", 2))
+MAX_QUEUED_JOBS = int(os.environ.get("EXPORT_MAX_QUEUED_JOBS", 20))
+MAX_AGE_SECONDS = int(os.environ.get("EXPORT_MAX_AGE_SECONDS", 3600))
+MAX_SPOOL_BYTES = int(os.environ.get("EXPORT_MAX_SPOOL_BYTES", 512 * 1024 * 1024))
+
+FILE_EXTENSIONS = {"csv": "csv", "excel": "xlsx"}
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "excel": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+class ExportQueueFull(Exception):
+    """Raised when too many export jobs are already waiting or running"""
+
+
+class _Job:
+    """Mutable state of one export job, shared between the API and a worker"""
+
+    def __init__(self, request: ExportJobCreate, spool_dir: Path):
+        self.id = uuid.uuid4().hex
+        self.request = request
+        self.tenant = current_tenant.get()
+        self.status = JobStatus.pending
+        self.rows_written = 0
+        self.rows_total = None
+        self.created_at = datetime.utcnow()
+        self.finished_at = None
+        self.error = None
+        self.path = spool_dir / f"{self.id}.{FILE_EXTENSIONS[request.format.value]}"
+
+    @property
+    def filename(self) -> str:
+        request = self.request
+        return f"attendance_{request.start_date}_{request.end_date}.{FILE_EXTENSIONS[request.format.value]}"
+
+    @property
+    def media_type(self) -> str:
+        return MEDIA_TYPES[self.request.format.value]
+
+    def to_schema(self) -> ExportJob:
+        if self.status == JobStatus.done:
+            progress = 100.0
+        elif self.rows_total:
+            progress = round(self.rows_written / self.rows_total * 100, 1)
+        else:
+            progress = 0.0
+        return ExportJob(
+            id=self.id,
+            status=self.status,
+            request=self.request,
+            progress=progress,
+            rows_written=self.rows_written,
+            rows_total=self.rows_total,
+            created_at=self.created_at,
+            finished_at=self.finished_at,
+            error=self.error,
+            download_url=f"/jobs/{self.id}/download" if self.status == JobStatus.done else None,
+        )
+
+
+class ExportJobRunner:
+    """
+    Runs attendance exports on a bounded thread pool, spooling results to disk
+
+    Identical requests submitted while a matching job is still pending or
+    running share that job. Finished files are evicted once they are older
+    than max_age_seconds or the spool grows beyond max_spool_bytes.
+    """
+
+    def __init__(
+        self,
+        spool_dir: Path = SPOOL_DIR,
+        workers: int = EXPORT_WORKERS,
+        max_queued: int = MAX_QUEUED_JOBS,
+        max_age_seconds: int = MAX_AGE_SECONDS,
+        max_spool_bytes: int = MAX_SPOOL_BYTES,
+        session_factory=ReadSessionLocal,
+    ):
+        self.spool_dir = Path(spool_dir)
+        self.max_queued = max_queued
+        self.max_age_seconds = max_age_seconds
+        self.max_spool_bytes = max_spool_bytes
+        self.session_factory = session_factory
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export")
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._active = {}  # (tenant, request) key -> job id, for pending and running jobs
+
+    def submit(self, request: ExportJobCreate) -> ExportJob:
+        """Queue an export, or return the matching job that is already queued"""
+        key = (current_tenant.get(), request.model_dump_json())
+        self.evict()
+        with self._lock:
+            active_id = self._active.get(key)
+            if active_id:
+                return self._jobs[active_id].to_schema()
+            if len(self._active) >= self.max_queued:
+                raise ExportQueueFull(f"{len(self._active)} export jobs are already queued")
+
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+            job = _Job(request, self.spool_dir)
+            self._jobs[job.id] = job
+            self._active[key] = job.id
+        # The worker reads from the submitting request's tenant database
+        self._executor.submit(contextvars.copy_context().run, self._run, job, key)
+        return job.to_schema()
+
+    def _job(self, job_id: str) -> Optional[_Job]:
+        # Another tenant's jobs are invisible, as if they did not exist
+        job = self._jobs.get(job_id)
+        return job if job and job.tenant == current_tenant.get() else None
+
+    def get(self, job_id: str) -> Optional[ExportJob]:
+        """Get the current state of a job"""
+        job = self._job(job_id)
+        return job.to_schema() if job else None
+
+    def result(self, job_id: str) -> Optional[_Job]:
+        """Get a finished job whose file is still in the spool"""
+        job = self._job(job_id)
+        if job and job.status == JobStatus.done and job.path.exists():
+            return job
+        return None
+
+    def _run(self, job: _Job, key: tuple):
+        job.status = JobStatus.running
+
+        def progress(done: int, total: int):
+            job.rows_written = done
+            job.rows_total = total
+
+        db = self.session_factory()
+        tmp_path = job.path.with_suffix(job.path.suffix + ".part")
+        try:
+            request = job.request
+            write_attendance_export(
+                db,
+                tmp_path,
+                request.format.value,
+                start=request.start_date,
+                end=request.end_date,
+                student_id=request.student_id,
+                status=request.status.value if request.status else None,
+                progress=progress,
+            )
+            os.replace(tmp_path, job.path)
+            job.status = JobStatus.done
+        except Exception as e:
+            tmp_path.unlink(missing_ok=True)
+            job.error = str(e)
+            job.status = JobStatus.failed
+        finally:
+            db.close()
+            job.finished_at = datetime.utcnow()
+            with self._lock:
+                self._active.pop(key, None)
+        self.evict()
+
+    def evict(self):
+        """Drop finished jobs past their age limit, then the oldest while over the size limit"""
+        now = datetime.utcnow()
+        with self._lock:
+            finished = sorted(
+                (job for job in self._jobs.values() if job.finished_at is not None),
+                key=lambda job: job.finished_at,
+            )
+            expired = [job for job in finished if (now - job.finished_at).total_seconds() > self.max_age_seconds]
+            kept = [job for job in finished if job not in expired]
+
+            spool_bytes = sum(job.path.stat().st_size for job in kept if job.path.exists())
+            while kept and spool_bytes > self.max_spool_bytes:
+                job = kept.pop(0)
+                if job.path.exists():
+                    spool_bytes -= job.path.stat().st_size
+                expired.append(job)
+
+            for job in expired:
+                job.path.unlink(missing_ok=True)
+                del self._jobs[job.id]
+
+
+runner = ExportJobRunner()
@@ -0,0 +1,353 @@
+import argparse
+import contextvars
+import csv
+import multiprocessing
+import os
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, date, time
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from openpyxl import load_workbook
+from sqlalchemy import insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+import archive
+from live_feed import publish_days_reloaded
+from database import SessionLocal, current_tenant
+from models import Attendance, Student
+from name_index import normalize_name, student_names
+from streaks import refresh_streaks
+from schemas import ImportJob, ImportKind, ImportRowError, JobStatus
+
+IMPORT_CHUNK_SIZE = int(os.environ.get("IMPORT_CHUNK_SIZE", 20000))
+IMPORT_WORKERS = int(os.environ.get("IMPORT_WORKERS", min(4, os.cpu_count() or 1)))
+MAX_REPORTED_ERRORS = 1000
+
+NAME_COLUMNS = ("name", "student", "student_name")
+STATUS_VALUES = {
+    "present": "Present", "p": "Present",
+    "absent": "Absent", "a": "Absent",
+    "late": "Late", "l": "Late",
+}
+
+
+def _read_rows(path: Path) -> Iterator[tuple]:
+    """Yield the rows of a CSV or XLSX file one at a time"""
+    if path.suffix.lower() in (".xlsx", ".xlsm"):
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            yield from workbook.active.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as handle:
+            yield from csv.reader(handle)
+
+
+def _header_columns(kind: ImportKind, header: tuple) -> dict:
+    """Map the columns an import needs to their positions in the header row"""
+    positions = {str(cell).strip().lower(): index for index, cell in enumerate(header) if cell is not None}
+    columns = {"name": next((positions[name] for name in NAME_COLUMNS if name in positions), None)}
+    if kind == ImportKind.attendance:
+        columns["date"] = positions.get("date")
+        columns["status"] = positions.get("status")
+    missing = [column for column, index in columns.items() if index is None]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+    return columns
+
+
+def _chunks(rows: Iterator[tuple], size: int) -> Iterator[tuple]:
+    """Group data rows into (first line number, rows) chunks; line 1 is the header"""
+    chunk, first_line = [], 2
+    for line, row in enumerate(rows, start=2):
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield first_line, chunk
+            chunk, first_line = [], line + 1
+    if chunk:
+        yield first_line, chunk
+
+
+def _cell(row: tuple, index: int):
+    return row[index] if index < len(row) else None
+
+
+def _parse_day(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value or "").strip()
+    if not text:
+        raise ValueError("missing date")
+    try:
+        return date.fromisoformat(text[:10])
+    except ValueError:
+        raise ValueError(f"invalid date '{text}', use YYYY-MM-DD")
+
+
+def _parse_chunk(kind: ImportKind, columns: dict, first_line: int, rows: list) -> tuple:
+    """
+    Validate and normalize one chunk of rows
+
+    Runs in a worker process. Returns the parsed rows as
+    (line, normalized name, name[, day, status]) tuples and the row errors
+    as (line, message) tuples.
+    """
+    parsed, errors = [], []
+    for line, row in enumerate(rows, start=first_line):
+        if not any(cell not in (None, "") for cell in row):
+            continue
+        try:
+            name = " ".join(str(_cell(row, columns["name"]) or "").split())
+            if not name:
+                raise ValueError("missing student name")
+            if kind == ImportKind.students:
+                parsed.append((line, name.casefold(), name))
+                continue
+            day = _parse_day(_cell(row, columns["date"]))
+            raw_status = str(_cell(row, columns["status"]) or "").strip()
+            status = STATUS_VALUES.get(raw_status.lower())
+            if status is None:
+                raise ValueError(f"unknown status '{raw_status}'")
+            parsed.append((line, name.casefold(), name, day, status))
+        except ValueError as e:
+            errors.append((line, str(e)))
+    return parsed, errors
+
+
+def _parse_all(kind: ImportKind, columns: dict, chunks: Iterator[tuple], workers: int) -> Iterator[tuple]:
+    """Parse chunks in a process pool, in file order, keeping only a few in flight"""
+    if workers <= 1:
+        for first_line, rows in chunks:
+            yield _parse_chunk(kind, columns, first_line, rows)
+        return
+
+    # spawn rather than fork: imports also run from threads inside the server
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        pending = deque()
+        for first_line, rows in chunks:
+            pending.append(pool.submit(_parse_chunk, kind, columns, first_line, rows))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class _Import:
+    """Progress and row errors of one import"""
+
+    def __init__(self, kind: ImportKind, filename: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.filename = filename
+        self.tenant = current_tenant.get()
+        self.status = JobStatus.pending
+        self.rows_read = 0
+        self.students_created = 0
+        self.students_matched = 0
+        self.attendance_written = 0
+        self.error_count = 0
+        self.errors = []
+        self.created_at = datetime.utcnow()
+        self.finished_at = None
+        self.error = None
+
+    def add_errors(self, errors: list):
+        self.error_count += len(errors)
+        room = MAX_REPORTED_ERRORS - len(self.errors)
+        self.errors.extend(ImportRowError(line=line, error=message) for line, message in errors[:room])
+
+    def to_schema(self) -> ImportJob:
+        return ImportJob(
+            id=self.id,
+            kind=self.kind,
+            filename=self.filename,
+            status=self.status,
+            rows_read=self.rows_read,
+            students_created=self.students_created,
+            students_matched=self.students_matched,
+            attendance_written=self.attendance_written,
+            error_count=self.error_count,
+            errors=self.errors,
+            created_at=self.created_at,
+            finished_at=self.finished_at,
+            error=self.error,
+        )
+
+
+def _resolve_students(db: Session, known: dict, matched: set, parsed: list, state: _Import) -> list:
+    """
+    Map the chunk's normalized names to student ids in `known`, creating the
+    new students; returns the created (id, name) pairs
+    """
+    new_names, created = {}, []
+    for row in parsed:
+        if row[1] in known:
+            matched.add(known[row[1]])
+        else:
+            new_names.setdefault(row[1], row[2])
+    if new_names:
+        created = db.execute(
+            insert(Student).returning(Student.id, Student.name),
+            [{"name": name} for name in new_names.values()]
+        ).all()
+        for student_id, name in created:
+            known[normalize_name(name)] = student_id
+        state.students_created += len(new_names)
+    state.students_matched = len(matched)
+    return created
+
+
+def import_file(
+    db: Session,
+    state: _Import,
+    path: Path,
+    workers: int = IMPORT_WORKERS,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    progress: Optional[Callable[[_Import], None]] = None,
+) -> _Import:
+    """
+    Import a roster or attendance history from a CSV or XLSX file
+
+    The file is read as a stream and parsed in chunks by a process pool.
+    Students are matched to existing ones by normalized name. Each chunk
+    is written in its own transaction, and attendance uses the same
+    (student_id, day) upsert as the API. The streak state of every student
+    the file touched is refreshed once, after the last chunk, rather than
+    per chunk. Invalid rows are recorded in state.errors and skipped.
+    """
+    rows = _read_rows(Path(path))
+    header = next(rows, None)
+    if header is None:
+        raise ValueError("File is empty")
+    columns = _header_columns(state.kind, header)
+
+    # Students table is small next to attendance, so keep the lookup in memory
+    known = {}
+    for student_id, name in db.query(Student.id, Student.name).order_by(Student.id.desc()):
+        known[normalize_name(name)] = student_id
+    matched = set()
+    touched = set()
+
+    upsert = sqlite_insert(Attendance.__table__)
+    upsert = upsert.on_conflict_do_update(
+        index_elements=["student_id", "day"],
+        set_={"status": upsert.excluded.status, "date": upsert.excluded.date}
+    )
+
+    for parsed, errors in _parse_all(state.kind, columns, _chunks(rows, chunk_size), workers):
+        state.rows_read += len(parsed) + len(errors)
+        state.add_errors(errors)
+        created = _resolve_students(db, known, matched, parsed, state)
+
+        days = set()
+        if state.kind == ImportKind.attendance and parsed:
+            # History for an archived month updates the archived records rather than duplicating them
+            archive.reopen_archived(db, {(known[row[1]], row[3]) for row in parsed})
+            db.execute(upsert, [
+                {
+                    "student_id": known[normalized],
+                    "day": day,
+                    "date": datetime.combine(day, time()),
+                    "status": status,
+                }
+                for _, normalized, _, day, status in parsed
+            ])
+            days = {row[3] for row in parsed}
+            state.attendance_written += len(parsed)
+            touched.update(known[row[1]] for row in parsed)
+        db.commit()
+
+        if created:
+            for student_id, name in created:
+                student_names.add(student_id, name)
+        if days:
+            publish_days_reloaded(db, days)
+        if progress:
+            progress(state)
+
+    # A student's history spans many chunks, so their state is computed once from all of it
+    if touched:
+        refresh_streaks(db, touched)
+        db.commit()
+    return state
+
+
+class ImportRunner:
+    """
+    Runs uploaded imports one at a time on a background thread
+
+    Imports serialize on SQLite's write lock anyway, so a single thread is
+    enough; each import parses its file with its own process pool.
+    """
+
+    def __init__(self, session_factory=SessionLocal, workers: int = IMPORT_WORKERS):
+        self.session_factory = session_factory
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="import")
+        self._lock = threading.Lock()
+        self._imports = {}
+
+    def submit(self, kind: ImportKind, path: Path, filename: str) -> ImportJob:
+        """Queue an import of a spooled upload, which is deleted afterwards"""
+        state = _Import(kind, filename)
+        with self._lock:
+            self._imports[state.id] = state
+        # The import writes to the submitting request's tenant database
+        self._executor.submit(contextvars.copy_context().run, self._run, state, Path(path))
+        return state.to_schema()
+
+    def get(self, import_id: str) -> Optional[ImportJob]:
+        state = self._imports.get(import_id)
+        return state.to_schema() if state and state.tenant == current_tenant.get() else None
+
+    def _run(self, state: _Import, path: Path):
+        state.status = JobStatus.running
+        db = self.session_factory()
+        try:
+            import_file(db, state, path, workers=self.workers)
+            state.status = JobStatus.done
+        except Exception as e:
+            db.rollback()
+            state.error = str(e)
+            state.status = JobStatus.failed
+        finally:
+            db.close()
+            path.unlink(missing_ok=True)
+            state.finished_at = datetime.utcnow()
+
+
+runner = ImportRunner()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import a student roster or attendance history")
+    parser.add_argument("kind", choices=[kind.value for kind in ImportKind])
+    parser.add_argument("path", help="CSV or XLSX file with a header row")
+    parser.add_argument("--workers", type=int, default=IMPORT_WORKERS)
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    state = _Import(ImportKind(args.kind), Path(args.path).name)
+    started = datetime.utcnow()
+
+    def report(state: _Import):
+        elapsed = (datetime.utcnow() - started).total_seconds()
+        print(f"{state.rows_read} rows read, {state.attendance_written} attendance written, "
+              f"{state.students_created} students created, {state.error_count} errors ({elapsed:.1f}s)")
+
+    db = SessionLocal()
+    try:
+        import_file(db, state, Path(args.path), workers=args.workers, chunk_size=args.chunk_size, progress=report)
+    finally:
+        db.close()
+    for row_error in state.errors:
+        print(f"line {row_error.line}: {row_error.error}")
@@ -0,0 +1,185 @@
+import asyncio
+import itertools
+import json
+import os
+import threading
+from collections import deque
+from datetime import date
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database import current_tenant
+from metrics import Counter, Gauge
+from models import Attendance, Student
+
+LIVE_FEED_BUFFER = int(os.environ.get("LIVE_FEED_BUFFER", 256))
+LIVE_FEED_HEARTBEAT_SECONDS = float(os.environ.get("LIVE_FEED_HEARTBEAT_SECONDS", 15))
+
+# Sent to a client that fell too far behind, right before its stream ends
+RESET_MESSAGE = 'event: reset\ndata: {"reason": "client too slow, reload and reconnect"}\n\n'
+HEARTBEAT_MESSAGE = ": keep-alive\n\n"
+
+subscriber_count = Gauge("live_feed_subscribers", "Connected live feed clients")
+published = Counter("live_feed_events_total", "Events published to the live feed, by type")
+dropped = Counter("live_feed_dropped_clients_total", "Live feed clients dropped for falling behind")
+subscriber_count.set(0)
+
+
+def _json_default(value):
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+class Subscription:
+    """
+    One client's bounded buffer of pending SSE messages
+
+    Writers append from any thread and never wait: when the buffer is full
+    the client is marked dropped, gets a final reset event and is
+    disconnected, and has to reload the day and reconnect.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, day: Optional[date], buffer_size: int):
+        self.day = day
+        self.tenant = current_tenant.get()
+        self.dropped = False
+        self._loop = loop
+        self._buffer = deque()
+        self._buffer_size = buffer_size
+        self._wakeup = asyncio.Event()
+
+    def offer(self, message: str) -> bool:
+        """Queue a message; returns whether the reader needs waking up"""
+        if self.dropped:
+            return False
+        if len(self._buffer) >= self._buffer_size:
+            self.dropped = True
+            return True
+        was_empty = not self._buffer
+        self._buffer.append(message)
+        # The reader drains everything once awake, so one wakeup per batch is enough
+        return was_empty
+
+    async def messages(self, heartbeat: float = LIVE_FEED_HEARTBEAT_SECONDS) -> AsyncIterator[str]:
+        """Yield queued messages as they arrive, with heartbeats while idle"""
+        while True:
+            while self._buffer:
+                yield self._buffer.popleft()
+            if self.dropped:
+                yield RESET_MESSAGE
+                return
+            self._wakeup.clear()
+            if self._buffer or self.dropped:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                yield HEARTBEAT_MESSAGE
+
+
+class LiveFeed:
+    """In-process pub/sub hub fanning attendance events out to SSE clients of the same tenant"""
+
+    def __init__(self, buffer_size: int = LIVE_FEED_BUFFER):
+        self.buffer_size = buffer_size
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscriptions)
+
+    def subscribe(self, day: Optional[date] = None) -> Subscription:
+        """Register a client on the running event loop, optionally for one day only"""
+        subscription = Subscription(asyncio.get_running_loop(), day, self.buffer_size)
+        with self._lock:
+            self._subscriptions.add(subscription)
+            subscriber_count.set(len(self._subscriptions))
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+            subscriber_count.set(len(self._subscriptions))
+
+    def publish(self, event: str, data: dict, day: date):
+        """Encode an event once and offer it to every client of the current tenant watching `day`"""
+        tenant = current_tenant.get()
+        message = f"id: {next(self._ids)}\nevent: {event}\ndata: {json.dumps(data, default=_json_default)}\n\n"
+        published.inc(type=event)
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        wakeups = {}
+        for subscription in subscriptions:
+            if subscription.tenant != tenant or (subscription.day is not None and subscription.day != day):
+                continue
+            if subscription.offer(message):
+                wakeups.setdefault(subscription._loop, []).append(subscription._wakeup)
+            if subscription.dropped:
+                self.unsubscribe(subscription)
+                dropped.inc()
+        # One cross-thread call per event loop rather than one per client
+        for loop, events in wakeups.items():
+            loop.call_soon_threadsafe(_set_all, events)
+
+
+def _set_all(events: List[asyncio.Event]):
+    for event in events:
+        event.set()
+
+
+feed = LiveFeed()
+
+
+def _publish_counts(db: Session, days: Iterable[date]):
+    """Publish the day's status counts after a change"""
+    for day in sorted(set(days)):
+        counts = dict(
+            db.query(Attendance.status, func.count(Attendance.id))
+            .filter(Attendance.day == day)
+            .group_by(Attendance.status)
+        )
+        feed.publish("counts", {
+            "date": day,
+            "total": sum(counts.values()),
+            "present": counts.get("Present", 0),
+            "absent": counts.get("Absent", 0),
+            "late": counts.get("Late", 0),
+        }, day)
+
+
+def publish_attendance_changes(db: Session, changes: List[Tuple[str, object, date]]):
+    """
+    Publish (action, record, day) changes and the affected days' counts
+
+    `action` is "inserted", "updated" or "deleted"; records are Attendance
+    rows (deleted ones may be detached) or write results with the same
+    fields. Does nothing when no client is connected.
+    """
+    if not feed.has_subscribers or not changes:
+        return
+    student_ids = {record.student_id for _, record, _ in changes}
+    names = dict(db.query(Student.id, Student.name).filter(Student.id.in_(student_ids)))
+    for action, record, day in changes:
+        feed.publish("attendance", {
+            "action": action,
+            "id": record.id,
+            "student_id": record.student_id,
+            "student_name": names.get(record.student_id, "Unknown"),
+            "status": record.status,
+            "date": record.date,
+            "created_at": record.created_at,
+        }, day)
+    _publish_counts(db, (day for _, _, day in changes))
+
+
+def publish_days_reloaded(db: Session, days: Iterable[date]):
+    """Tell clients to reload days changed in bulk, e.g. by an import"""
+    if not feed.has_subscribers:
+        return
+    days = set(days)
+    for day in days:
+        feed.publish("reload", {"date": day}, day)
+    _publish_counts(db, days)
@@ -1,21 +1,48 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from routes.student_routes import router as student_router
 from routes.attendance_routes import router as attendance_router
 from routes.user_routes import router as user_router
-from models import Base
-from database import engine
+from routes.report_routes import router as report_router
+from routes.job_routes import router as job_router
+from routes.import_routes import router as import_router
+from routes.section_routes import router as section_router
+from routes.metrics_routes import router as metrics_router
+from routes.sync_routes import router as sync_router
+from database import engine, tenant_engines
+from db_monitor import LeakDetectionMiddleware
+from profiling import ProfilingMiddleware
+from migrations import bootstrap_schema
+from tenants import TenantMiddleware
+from write_behind import WRITE_BEHIND, checkins
 import os
 
-# Create the database tables
-Base.metadata.create_all(bind=engine)
+# Create the database tables and upgrade existing ones
+bootstrap_schema(engine)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Replays journaled check-ins a crash left unwritten before serving
+    if WRITE_BEHIND:
+        checkins.start()
+    yield
+    checkins.stop()
+    tenant_engines.close_all()
+
 
 app = FastAPI(
     title="AI-Powered Attendance Management System",
     description="A backend system for managing attendance with AI-powered natural language processing",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Picks each request's school database when MULTI_TENANT is on; added first so
+# that it runs inside CORS and its 404s carry CORS headers
+app.add_middleware(TenantMiddleware)
+
 # Add CORS middleware to allow requests from frontend
 app.add_middleware(
     CORSMiddleware,
@@ -23,12 +50,25 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Profile-File"],
 )
 
+# Warns about database connections still checked out when a request ends
+app.add_middleware(LeakDetectionMiddleware)
+
+# Profiles requests flagged with PROFILE_TOKEN, and slow ones when sampling is on
+app.add_middleware(ProfilingMiddleware)
+
 # Include the routers
 app.include_router(student_router)
 app.include_router(attendance_router)
 app.include_router(user_router)
+app.include_router(report_router)
+app.include_router(job_router)
+app.include_router(import_router)
+app.include_router(section_router)
+app.include_router(metrics_router)
+app.include_router(sync_router)
 
 @app.get("/")
 def read_root():
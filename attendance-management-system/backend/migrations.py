@@ -0,0 +1,157 @@
+from sqlalchemy import Integer, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+import archive
+
+from models import Attendance, AttendanceStatusCode, Base, STATUS_CODES
+from data_versions import install_version_tracking
+from streaks import recompute_all
+from sync import install_change_tracking
+
+
+def _add_attendance_day(conn):
+    """Add attendance.day, drop duplicate (student_id, day) rows and enforce uniqueness"""
+    columns = {column["name"] for column in inspect(conn).get_columns("attendance")}
+    if "day" not in columns:
+        conn.execute(text("ALTER TABLE attendance ADD COLUMN day DATE"))
+    conn.execute(text("UPDATE attendance SET day = date(date) WHERE day IS NULL"))
+
+    # Keep the most recent write for each student and day
+    removed = conn.execute(text("""
+        DELETE FROM attendance
+        WHERE id NOT IN (SELECT max(id) FROM attendance GROUP BY student_id, day)
+    """)).rowcount
+    if removed:
+        print(f"Removed {removed} duplicate attendance records")
+
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_attendance_day ON attendance (day)"))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_attendance_student_day ON attendance (student_id, day)"
+    ))
+
+
+def _compact_attendance(conn):
+    """
+    Rebuild attendance with integer day, status code and timestamp columns
+
+    SQLite can't change a column's type in place, so the table is renamed,
+    recreated from the model and refilled with converted values. The
+    redundant index on the primary key is not recreated.
+    """
+    columns = {column["name"]: column["type"] for column in inspect(conn).get_columns("attendance")}
+    if isinstance(columns["status"], Integer):
+        return  # created by create_all with the compact layout already
+
+    known = ", ".join(f"'{name.lower()}'" for name in STATUS_CODES)
+    unknown = [row[0] for row in conn.execute(text(
+        f"SELECT DISTINCT status FROM attendance WHERE lower(status) NOT IN ({known})"
+    ))]
+    if unknown:
+        raise RuntimeError(f"Attendance rows with unknown status values: {unknown}")
+
+    for index in ("ix_attendance_id", "ix_attendance_day", "uq_attendance_student_day"):
+        conn.execute(text(f"DROP INDEX IF EXISTS {index}"))
+    conn.execute(text("ALTER TABLE attendance RENAME TO attendance_legacy"))
+    AttendanceStatusCode.__table__.create(conn, checkfirst=True)
+    Attendance.__table__.create(conn)
+
+    status_code = " ".join(f"WHEN '{name.lower()}' THEN {code}" for name, code in STATUS_CODES.items())
+    conn.execute(text(f"""
+        INSERT INTO attendance (id, student_id, date, day, status, created_at)
+        SELECT
+            id,
+            student_id,
+            CAST(strftime('%s', date) AS INTEGER),
+            CAST(julianday(day) - julianday('1970-01-01') AS INTEGER),
+            CASE lower(status) {status_code} END,
+            CAST(strftime('%s', created_at) AS INTEGER)
+        FROM attendance_legacy
+    """))
+    conn.execute(text("DROP TABLE attendance_legacy"))
+
+
+def _build_streaks(conn):
+    """Fill attendance_streaks for the attendance recorded so far"""
+    db = Session(bind=conn)
+    try:
+        recompute_all(db)
+    finally:
+        db.close()
+
+
+def _track_sync_changes(conn):
+    """Log changes to students and attendance in sync_changes for delta sync"""
+    install_change_tracking(conn)
+
+
+def _autoincrement_attendance(conn):
+    """
+    Rebuild attendance with AUTOINCREMENT, starting after every id in use
+
+    Without it SQLite hands out the ids of archived rows again once they are
+    deleted from the live table, and a new row would be taken for the
+    archived one by the archive merge and by sync clients.
+    """
+    schema = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'attendance'")).scalar()
+    if "AUTOINCREMENT" not in schema.upper():
+        triggers = conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'attendance'"
+        )).scalars().all()
+        for trigger in triggers:
+            conn.execute(text(f"DROP TRIGGER {trigger}"))
+        for index in ("ix_attendance_day", "uq_attendance_student_day"):
+            conn.execute(text(f"DROP INDEX IF EXISTS {index}"))
+        conn.execute(text("ALTER TABLE attendance RENAME TO attendance_legacy"))
+        Attendance.__table__.create(conn)
+        conn.execute(text("""
+            INSERT INTO attendance (id, student_id, date, day, status, created_at)
+            SELECT id, student_id, date, day, status, created_at FROM attendance_legacy
+        """))
+        conn.execute(text("DROP TABLE attendance_legacy"))
+        install_change_tracking(conn)
+
+    used = [
+        conn.execute(text("SELECT max(id) FROM attendance")).scalar() or 0,
+        conn.execute(text("SELECT seq FROM sqlite_sequence WHERE name = 'attendance'")).scalar() or 0,
+        archive.max_archived_id(),
+    ]
+    conn.execute(text("DELETE FROM sqlite_sequence WHERE name = 'attendance'"))
+    conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES ('attendance', :seq)"), {"seq": max(used)})
+
+
+def _track_data_versions(conn):
+    """Bump data_versions on writes to the tables whose versions validate cached responses"""
+    install_version_tracking(conn)
+
+
+def _track_day_versions(conn):
+    """Bump day_versions on attendance writes, for ETags every process agrees on"""
+    install_version_tracking(conn)
+
+
+# Applied in order; PRAGMA user_version records how many have run
+MIGRATIONS = [
+    _add_attendance_day,
+    _compact_attendance,
+    _build_streaks,
+    _track_sync_changes,
+    _autoincrement_attendance,
+    _track_data_versions,
+    _track_day_versions,
+]
+
+
+def run_migrations(engine: Engine):
+    """Bring an existing SQLite database up to the current schema"""
+    with engine.begin() as conn:
+        version = conn.execute(text("PRAGMA user_version")).scalar()
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            migration(conn)
+            conn.execute(text(f"PRAGMA user_version = {number}"))
+
+
+def bootstrap_schema(engine: Engine):
+    """Create a new database's tables, or bring an existing one up to the current schema"""
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
@@ -1,7 +1,69 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey
+from datetime import datetime, date, timedelta, timezone
+from sqlalchemy import Column, Integer, SmallInteger, String, DateTime, Boolean, Float, ForeignKey, Index, event, text
 from sqlalchemy.sql import func
+from sqlalchemy.types import TypeDecorator
 from database import Base
 
+EPOCH_DAY = date(1970, 1, 1)
+EPOCH = datetime(1970, 1, 1)
+
+# Stored codes for AttendanceStatus values; also rows of the attendance_statuses lookup table
+STATUS_CODES = {"Present": 1, "Absent": 2, "Late": 3}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
+# Codes of the tables whose changes the sync protocol reports, stored in sync_changes.entity
+SYNC_ENTITIES = {"students": 1, "attendance": 2}
+
+# Current time as integer seconds since the epoch, evaluated by SQLite
+UNIX_NOW = text("(CAST(strftime('%s', 'now') AS INTEGER))")
+
+
+class EpochDay(TypeDecorator):
+    """A date stored as an integer count of days since 1970-01-01"""
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, int):
+            return value
+        if isinstance(value, datetime):
+            value = value.date()
+        return (value - EPOCH_DAY).days
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else EPOCH_DAY + timedelta(days=value)
+
+
+class UnixTimestamp(TypeDecorator):
+    """A naive UTC datetime stored as integer seconds since the epoch"""
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, int):
+            return value
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return int((value - EPOCH).total_seconds())
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else EPOCH + timedelta(seconds=value)
+
+
+class StatusCode(TypeDecorator):
+    """An attendance status stored as a small-integer code and read back by name"""
+    impl = SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, int):
+            return value
+        # Accept AttendanceStatus members and plain strings in any casing
+        return STATUS_CODES[str(getattr(value, "value", value)).capitalize()]
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else STATUS_NAMES[value]
+
 
 class Student(Base):
     __tablename__ = "students"
@@ -14,19 +76,146 @@ class Student(Base):
         return f"<Student(id={self.id}, name='{self.name}')>"
 
 
+def _day_of_date(context):
+    """Default for Attendance.day: the calendar day of the row's date"""
+    value = context.get_current_parameters().get("date")
+    return value.date() if value else datetime.utcnow().date()
+
+
+class AttendanceStatusCode(Base):
+    """Lookup table naming the status codes, for reading the database by hand"""
+    __tablename__ = "attendance_statuses"
+
+    id = Column(SmallInteger, primary_key=True, autoincrement=False)
+    name = Column(String, unique=True, nullable=False)
+
+
+@event.listens_for(AttendanceStatusCode.__table__, "after_create")
+def _seed_status_codes(target, connection, **kw):
+    connection.execute(target.insert(), [{"id": code, "name": name} for name, code in STATUS_CODES.items()])
+
+
 class Attendance(Base):
     __tablename__ = "attendance"
+    __table_args__ = (
+        # One record per student per day; upserts conflict on this index
+        Index("uq_attendance_student_day", "student_id", "day", unique=True),
+        # AUTOINCREMENT: ids of rows moved to the archive are never handed out again
+        {"sqlite_autoincrement": True},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    # Compact layout: integers throughout, mapped back to the usual Python
+    # types by the column types above, so queries and the API are unchanged
+    id = Column(Integer, primary_key=True)
     student_id = Column(Integer, ForeignKey("students.id"), nullable=False)
-    date = Column(DateTime(timezone=True), server_default=func.now())
-    status = Column(String, nullable=False)  # Present, Absent, Late
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    date = Column(UnixTimestamp, server_default=UNIX_NOW)
+    day = Column(EpochDay, nullable=False, index=True, default=_day_of_date)
+    status = Column(StatusCode, ForeignKey("attendance_statuses.id"), nullable=False)  # Present, Absent, Late
+    created_at = Column(UnixTimestamp, server_default=UNIX_NOW)
 
     def __repr__(self):
         return f"<Attendance(id={self.id}, student_id={self.student_id}, status='{self.status}')>"
 
 
+class AttendanceStreak(Base):
+    """Per-student absence run and rolling attendance rates, refreshed by every attendance write"""
+    __tablename__ = "attendance_streaks"
+
+    student_id = Column(Integer, ForeignKey("students.id"), primary_key=True)
+    last_day = Column(EpochDay, nullable=False)
+    last_status = Column(StatusCode, nullable=False)
+    absence_run = Column(Integer, nullable=False, default=0)  # trailing Absent records
+    absence_run_start = Column(EpochDay)
+    records_30d = Column(Integer, nullable=False, default=0)
+    rate_30d = Column(Float, nullable=False, default=0.0)  # share Present in the 30 days up to last_day
+    previous_rate_30d = Column(Float)  # the 30 days before that; null with too few records
+    flagged = Column(Boolean, nullable=False, default=False, index=True)
+
+    def __repr__(self):
+        return f"<AttendanceStreak(student_id={self.student_id}, absence_run={self.absence_run}, flagged={self.flagged})>"
+
+
+class WriteBehindCheckpoint(Base):
+    """Sequence number of the last journaled check-in applied, committed with the batch that applied it"""
+    __tablename__ = "write_behind_checkpoint"
+
+    id = Column(Integer, primary_key=True)
+    applied_seq = Column(Integer, nullable=False, default=0)
+
+
+class SyncChange(Base):
+    """
+    Latest change to each student and attendance row, written by triggers
+
+    Every insert, update or delete replaces the row's entry with a new one,
+    so seq grows with each change and a client only needs the entries after
+    the last seq it saw; deleted rows keep an entry as a tombstone.
+    """
+    __tablename__ = "sync_changes"
+    __table_args__ = (
+        Index("uq_sync_changes_entity", "entity", "entity_id", unique=True),
+        # AUTOINCREMENT: a seq is never handed out twice, even after its row is replaced
+        {"sqlite_autoincrement": True},
+    )
+
+    seq = Column(Integer, primary_key=True)
+    entity = Column(SmallInteger, nullable=False)  # SYNC_ENTITIES code
+    entity_id = Column(Integer, nullable=False)
+    deleted = Column(Boolean, nullable=False, default=False)
+
+
+class DataVersion(Base):
+    """
+    Change counter of a table, bumped by triggers (data_versions.install_version_tracking)
+
+    Kept in the database so every process, including command-line tools
+    writing directly, bumps and sees the same versions.
+    """
+    __tablename__ = "data_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class DayVersion(Base):
+    """Change counter of each day's attendance, bumped by triggers like DataVersion"""
+    __tablename__ = "day_versions"
+
+    day = Column(EpochDay, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class SyncUpload(Base):
+    """Client ids of uploaded attendance records, so a retried upload is not applied twice"""
+    __tablename__ = "sync_uploads"
+
+    client_id = Column(String, primary_key=True)
+    student_id = Column(Integer, nullable=False)
+    day = Column(EpochDay, nullable=False)
+    received_at = Column(UnixTimestamp, server_default=UNIX_NOW, index=True)
+
+
+class ClassSection(Base):
+    __tablename__ = "class_sections"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, index=True, nullable=False)  # e.g. "7B"
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<ClassSection(id={self.id}, name='{self.name}')>"
+
+
+class SectionMembership(Base):
+    __tablename__ = "section_memberships"
+
+    section_id = Column(Integer, ForeignKey("class_sections.id"), primary_key=True)
+    student_id = Column(Integer, ForeignKey("students.id"), primary_key=True, index=True)
+
+    def __repr__(self):
+        return f"<SectionMembership(section_id={self.section_id}, student_id={self.student_id})>"
+
+
 class User(Base):
     __tablename__ = "users"
 
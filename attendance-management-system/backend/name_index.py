@@ -0,0 +1,304 @@
+import heapq
+import os
+import threading
+from math import ceil
+from typing import Collection, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from data_versions import table_version
+from database import current_tenant, tenant_engines
+from models import Student, SyncChange, SYNC_ENTITIES
+from schemas import StudentCandidate
+
+# A name resolves to a student when its best score reaches NAME_MATCH_THRESHOLD
+# and beats the runner-up by NAME_MATCH_MARGIN; weaker matches down to
+# NAME_CANDIDATE_THRESHOLD are reported as candidates instead
+NAME_MATCH_THRESHOLD = float(os.environ.get("NAME_MATCH_THRESHOLD", 0.5))
+NAME_MATCH_MARGIN = float(os.environ.get("NAME_MATCH_MARGIN", 0.1))
+NAME_CANDIDATE_THRESHOLD = float(os.environ.get("NAME_CANDIDATE_THRESHOLD", 0.3))
+# How alike two words must be to count as the same word misspelled
+WORD_MATCH_THRESHOLD = 0.3
+# Name words the query doesn't mention lower the score slightly, so that
+# "Ali Khan" prefers "Ali Khan" over "Ali Khan Shah"
+EXTRA_WORD_PENALTY = 0.1
+MAX_CANDIDATES = 5
+
+
+def normalize_name(name: str) -> str:
+    """Normalize a student name for duplicate detection"""
+    return " ".join(name.split()).casefold()
+
+
+def word_trigrams(word: str) -> frozenset:
+    """Trigrams of one word, padded like pg_trgm ("  a", " al", "ali", "li ")"""
+    padded = f"  {word} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _similarity(left: frozenset, right: frozenset) -> float:
+    shared = len(left & right)
+    return shared / (len(left) + len(right) - shared) if shared else 0.0
+
+
+class NameIndex:
+    """
+    In-memory fuzzy index over student names
+
+    Names are indexed by word: each distinct word is split into padded
+    trigrams with an inverted index from trigram to word, and each word maps
+    to the students whose names contain it. A lookup finds the known words
+    similar to each query word (only visiting the postings of its rarest
+    trigrams), intersects those words' students, and scores the survivors by
+    how well their words match. Rosters reuse a small vocabulary of first and
+    family names, so both steps stay small even for large schools.
+
+    The API's own writes update the index directly. Students written by any
+    other process (the importer CLI, a second worker) are picked up on the
+    next lookup: when the students version in the database has moved, the
+    students entries of sync_changes since the last check are applied.
+    """
+
+    def __init__(self):
+        self._word_trigrams = {}   # word -> its trigrams
+        self._trigram_words = {}   # trigram -> set of words
+        self._word_students = {}   # word -> set of student ids
+        self._students = {}        # student id -> (name, words)
+        self._exact = {}           # normalized name -> set of student ids
+        self._lock = threading.Lock()
+        self._version = None       # students version the index was last checked at
+        self._seq = 0              # sync_changes seq applied up to
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._students)
+
+    def load(self, rows: Iterable[Tuple[int, str]], seq: int = 0):
+        """Replace the index contents with (student id, name) rows, current as of sync_changes seq"""
+        with self._lock:
+            self._word_trigrams, self._trigram_words, self._word_students = {}, {}, {}
+            self._students, self._exact = {}, {}
+            for student_id, name in rows:
+                self._add(student_id, name)
+            self._seq = seq
+            self.loaded = True
+
+    def ensure_loaded(self, db: Session):
+        """Load the index on first use, then catch up with students changed by any process"""
+        # Versions and seqs are read before the rows, so a write racing with
+        # the read is applied again by the next call rather than missed
+        version = table_version(db, "students")
+        if self.loaded and version == self._version:
+            return
+        seq = db.execute(select(func.max(SyncChange.seq))).scalar() or 0
+        if not self.loaded:
+            self.load(db.query(Student.id, Student.name), seq)
+        else:
+            self._apply_changes(db, seq)
+        self._version = version
+
+    def _apply_changes(self, db: Session, seq: int):
+        """Apply the students entries of sync_changes after the last applied seq, up to seq"""
+        changes = db.execute(
+            select(SyncChange.entity_id, SyncChange.deleted, Student.name)
+            .outerjoin(Student, Student.id == SyncChange.entity_id)
+            .where(SyncChange.seq > self._seq, SyncChange.seq <= seq,
+                   SyncChange.entity == SYNC_ENTITIES["students"])
+            .order_by(SyncChange.seq)
+        ).all()
+        with self._lock:
+            for student_id, deleted, name in changes:
+                self._remove(student_id)
+                if not deleted and name is not None:
+                    self._add(student_id, name)
+            self._seq = max(self._seq, seq)
+
+    def add(self, student_id: int, name: str):
+        """Index a new or renamed student"""
+        with self._lock:
+            self._remove(student_id)
+            self._add(student_id, name)
+
+    def remove(self, student_id: int):
+        with self._lock:
+            self._remove(student_id)
+
+    def _add(self, student_id: int, name: str):
+        normalized = normalize_name(name)
+        words = tuple(normalized.split())
+        self._students[student_id] = (name, words)
+        self._exact.setdefault(normalized, set()).add(student_id)
+        for word in words:
+            students = self._word_students.get(word)
+            if students is None:
+                students = self._word_students[word] = set()
+                trigrams = self._word_trigrams[word] = word_trigrams(word)
+                for trigram in trigrams:
+                    self._trigram_words.setdefault(trigram, set()).add(word)
+            students.add(student_id)
+
+    def _remove(self, student_id: int):
+        entry = self._students.pop(student_id, None)
+        if entry is None:
+            return
+        name, words = entry
+        normalized = normalize_name(name)
+        self._exact[normalized].discard(student_id)
+        if not self._exact[normalized]:
+            del self._exact[normalized]
+        for word in set(words):
+            students = self._word_students[word]
+            students.discard(student_id)
+            if students:
+                continue
+            # Last student with this word: drop it from the vocabulary
+            del self._word_students[word]
+            for trigram in self._word_trigrams.pop(word):
+                trigram_words = self._trigram_words[trigram]
+                trigram_words.discard(word)
+                if not trigram_words:
+                    del self._trigram_words[trigram]
+
+    def _similar_words(self, word: str) -> Dict[str, float]:
+        """Known words at least WORD_MATCH_THRESHOLD alike to `word`, with their similarity"""
+        if word in self._word_students:
+            matches = {word: 1.0}
+        else:
+            matches = {}
+        query = word_trigrams(word)
+        # A word scoring >= the threshold shares at least ceil(threshold * |query|)
+        # trigrams with the query, so it appears under one of the rarest |query| - that + 1
+        rarest = sorted(query, key=lambda trigram: len(self._trigram_words.get(trigram, ())))
+        prefix = len(query) - max(1, ceil(WORD_MATCH_THRESHOLD * len(query))) + 1
+        for trigram in rarest[:prefix]:
+            for candidate in self._trigram_words.get(trigram, ()):
+                if candidate not in matches:
+                    score = _similarity(query, self._word_trigrams[candidate])
+                    if score >= WORD_MATCH_THRESHOLD:
+                        matches[candidate] = score
+        return matches
+
+    def _candidates(self, word_matches: List[Dict[str, float]]) -> set:
+        """Students with a match for every query word, or for all but one if there are none"""
+        per_word = [
+            set().union(*(self._word_students[word] for word in matches)) if matches else set()
+            for matches in word_matches
+        ]
+        candidates = set.intersection(*per_word)
+        if not candidates and len(per_word) > 1:
+            # Tolerate one query word that is too garbled to match ("Kahn" for "Khan")
+            for skipped in range(len(per_word)):
+                rest = per_word[:skipped] + per_word[skipped + 1:]
+                candidates |= set.intersection(*rest)
+        return candidates
+
+    def search(self, name: str, limit: int = MAX_CANDIDATES, min_score: float = NAME_CANDIDATE_THRESHOLD,
+               among: Optional[Collection[int]] = None) -> List[StudentCandidate]:
+        """Best-scoring students for a name, highest score first, only those in `among` if given"""
+        normalized = normalize_name(name)
+        query_words = normalized.split()
+        if not query_words:
+            return []
+
+        with self._lock:
+            exact = self._exact.get(normalized, set())
+            word_matches = [self._similar_words(word) for word in query_words]
+            matched = self._candidates(word_matches) | exact
+            if among is not None:
+                matched &= set(among)
+            scored = []
+            for student_id in matched:
+                words = self._students[student_id][1]
+                if student_id in exact:
+                    score = 1.0
+                else:
+                    total = sum(max((matches.get(word, 0.0) for word in words), default=0.0)
+                                for matches in word_matches)
+                    extra = max(0, len(words) - len(query_words))
+                    score = total / (len(query_words) + EXTRA_WORD_PENALTY * extra)
+                if score >= min_score:
+                    scored.append((score, student_id))
+            return [
+                StudentCandidate(id=student_id, name=self._students[student_id][0], score=round(score, 3))
+                for score, student_id in heapq.nlargest(limit, scored)
+            ]
+
+    def resolve(self, db: Session, name: str,
+                among: Optional[Collection[int]] = None) -> Tuple[Optional[int], List[StudentCandidate]]:
+        """
+        Resolve a name to one student, among the given student ids if any
+
+        Returns (student id, candidates): the id is None when no student is a
+        confident match; candidates is then empty for an unknown name, or
+        lists the students it could mean.
+        """
+        self.ensure_loaded(db)
+        return self.match(name, among)
+
+    def match(self, name: str,
+              among: Optional[Collection[int]] = None) -> Tuple[Optional[int], List[StudentCandidate]]:
+        """resolve without catching up with the database first"""
+        with self._lock:
+            exact = list(self._exact.get(normalize_name(name), ()))
+            if among is not None:
+                exact = [student_id for student_id in exact if student_id in among]
+            if len(exact) == 1:
+                # The common case: the name is spelled as on the roster
+                student_id = exact[0]
+                return student_id, [StudentCandidate(id=student_id, name=self._students[student_id][0], score=1.0)]
+        candidates = self.search(name, among=among)
+        if not candidates:
+            return None, []
+        best = candidates[0]
+        runner_up = candidates[1].score if len(candidates) > 1 else 0.0
+        if not exact and best.score >= NAME_MATCH_THRESHOLD and best.score - runner_up >= NAME_MATCH_MARGIN:
+            return best.id, candidates
+        return None, candidates
+
+
+class TenantNameIndexes:
+    """
+    Student name indexes kept per tenant; each call goes to the current tenant's
+
+    Each index is loaded from its tenant's database on first use and
+    dropped when the tenant's engines are closed, so closed tenants hold
+    no roster in memory.
+    """
+
+    def __init__(self):
+        self._indexes = {}  # tenant (None for the default database) -> NameIndex
+        self._lock = threading.Lock()
+
+    def current(self) -> NameIndex:
+        tenant = current_tenant.get()
+        index = self._indexes.get(tenant)
+        if index is None:
+            with self._lock:
+                index = self._indexes.setdefault(tenant, NameIndex())
+        return index
+
+    def drop(self, tenant: str):
+        with self._lock:
+            self._indexes.pop(tenant, None)
+
+    def ensure_loaded(self, db: Session):
+        self.current().ensure_loaded(db)
+
+    def add(self, student_id: int, name: str):
+        self.current().add(student_id, name)
+
+    def remove(self, student_id: int):
+        self.current().remove(student_id)
+
+    def search(self, name: str, limit: int = MAX_CANDIDATES, min_score: float = NAME_CANDIDATE_THRESHOLD,
+               among: Optional[Collection[int]] = None) -> List[StudentCandidate]:
+        return self.current().search(name, limit=limit, min_score=min_score, among=among)
+
+    def resolve(self, db: Session, name: str,
+                among: Optional[Collection[int]] = None) -> Tuple[Optional[int], List[StudentCandidate]]:
+        return self.current().resolve(db, name, among=among)
+
+
+student_names = TenantNameIndexes()
+tenant_engines.on_close.append(student_names.drop)
@@ -0,0 +1,185 @@
+import hmac
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter as StackCounts
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import parse_qs
+
+from database import BASE_DIR
+from metrics import Counter, Histogram
+
+PROFILE_DIR = Path(os.environ.get("PROFILE_DIR", BASE_DIR / "profiles"))
+# Requests carrying this token in an X-Profile header or ?profile= are profiled; unset disables the flag
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", 5))
+# Profile one in every N requests automatically and keep the profile if the request
+# took at least PROFILE_SLOW_MS; 0 turns automatic sampling off
+PROFILE_SAMPLE_EVERY = int(os.environ.get("PROFILE_SAMPLE_EVERY", 0))
+PROFILE_SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", 1000))
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", 200))
+PROFILE_MAX_BYTES = int(os.environ.get("PROFILE_MAX_BYTES", 64 * 1024 * 1024))
+
+profiles_written = Counter("profiles_written_total", "Request profiles written, by why the request was profiled")
+profiles_evicted = Counter("profiles_evicted_total", "Profile files deleted to stay under the retention limits")
+profiled_seconds = Histogram("profiled_request_seconds", "Duration of profiled requests")
+
+# Files of the innermost frame a thread sits in while it has nothing to do: the
+# event loop's selector, and idle anyio or concurrent.futures workers waiting for work
+_IDLE_FILES = ("selectors.py", "threading.py", "queue.py", "thread.py")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Sampling profiler over every busy thread of the process
+
+    A background thread snapshots the Python stack of each thread every
+    interval and counts identical stacks, in the collapsed format that
+    flamegraph.pl and speedscope read ("thread;outer;...;inner count").
+    Threads parked in the selector or waiting for threadpool work are
+    skipped. Sync routes run in threadpool workers, so every thread is
+    sampled; requests running at the same time appear in the same profile
+    under their own worker threads.
+    """
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.stacks = StackCounts()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> StackCounts:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own or Path(frame.f_code.co_filename).name in _IDLE_FILES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if ident not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+
+class ProfileStore:
+    """Collapsed-stack files in a directory, oldest deleted first past max_files or max_bytes"""
+
+    def __init__(self, directory: Path = PROFILE_DIR, max_files: int = PROFILE_MAX_FILES,
+                 max_bytes: int = PROFILE_MAX_BYTES):
+        self.directory = directory
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sequence = itertools.count(1)
+
+    def name_for(self, method: str, path: str) -> str:
+        slug = "-".join(part for part in path.split("/") if part)[:80] or "root"
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        return f"{stamp}-{next(self._sequence)}-{method}-{slug}.folded"
+
+    def write(self, name: str, stacks: StackCounts):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        lines = [f"{stack} {count}\n" for stack, count in stacks.most_common()]
+        (self.directory / name).write_text("".join(lines))
+        self.evict()
+
+    def evict(self):
+        with self._lock:
+            files = sorted(self.directory.glob("*.folded"), key=lambda path: path.stat().st_mtime)
+            total = sum(path.stat().st_size for path in files)
+            while files and (len(files) > self.max_files or total > self.max_bytes):
+                oldest = files.pop(0)
+                total -= oldest.stat().st_size
+                oldest.unlink(missing_ok=True)
+                profiles_evicted.inc()
+
+
+store = ProfileStore()
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling requests on demand or by sampling
+
+    A request is profiled when it carries PROFILE_TOKEN in an X-Profile
+    header or a ?profile= query parameter; its profile is always written
+    and named in the X-Profile-File response header. With
+    PROFILE_SAMPLE_EVERY set, one in that many other requests is profiled
+    too, and its profile is kept only if the request was slower than
+    PROFILE_SLOW_MS. Only one sampled profile runs at a time.
+    """
+
+    def __init__(self, app, token: str = PROFILE_TOKEN, sample_every: int = PROFILE_SAMPLE_EVERY,
+                 slow_ms: float = PROFILE_SLOW_MS, profile_store: ProfileStore = store):
+        self.app = app
+        self.token = token
+        self.sample_every = sample_every
+        self.slow_ms = slow_ms
+        self.store = profile_store
+        self._requests = itertools.count(1)
+        self._sampling = threading.Lock()
+
+    def _requested(self, scope) -> bool:
+        if not self.token:
+            return False
+        headers = dict(scope.get("headers") or [])
+        supplied = headers.get(b"x-profile", b"")
+        if not supplied:
+            query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+            supplied = query.get("profile", [""])[0].encode("latin-1")
+        return bool(supplied) and hmac.compare_digest(supplied, self.token.encode())
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        requested = self._requested(scope)
+        sampled = (
+            not requested and self.sample_every > 0
+            and next(self._requests) % self.sample_every == 0
+            and self._sampling.acquire(blocking=False)
+        )
+        if not requested and not sampled:
+            return await self.app(scope, receive, send)
+
+        name = self.store.name_for(scope["method"], scope["path"])
+
+        async def send_with_profile_header(message):
+            if requested and message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-profile-file", name.encode())]
+            await send(message)
+
+        sampler = StackSampler().start()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_profile_header)
+        finally:
+            stacks = sampler.stop()
+            elapsed = time.perf_counter() - started
+            if sampled:
+                self._sampling.release()
+            if requested or elapsed * 1000 >= self.slow_ms:
+                profiled_seconds.observe(elapsed)
+                profiles_written.inc(reason="requested" if requested else "slow")
+                self.store.write(name, stacks)
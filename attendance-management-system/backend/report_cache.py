@@ -0,0 +1,142 @@
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from data_versions import range_fingerprint
+from database import BASE_DIR
+from metrics import Counter, Gauge
+
+REPORT_CACHE_DIR = Path(os.environ.get("REPORT_CACHE_DIR", BASE_DIR / "report_cache"))
+REPORT_CACHE_MAX_BYTES = int(os.environ.get("REPORT_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+lookups = Counter("report_cache_lookups_total", "Report snapshot cache lookups by result")
+evictions = Counter("report_cache_evictions_total", "Report snapshots evicted to stay under the size limit")
+cache_bytes = Gauge("report_cache_bytes", "Bytes of report snapshots on disk")
+cache_bytes.set(0)
+
+
+def is_closed(end: date, today: Optional[date] = None) -> bool:
+    """Whether a range ends before the current month, so its reports are final"""
+    today = today or datetime.utcnow().date()
+    return end < date(today.year, today.month, 1)
+
+
+class SnapshotCache:
+    """
+    Rendered reports of closed periods, stored on disk under a content key
+
+    The key hashes the report type, its parameters and the data versions of
+    every day it covers (and of the students table, for names). A write to
+    any of those days changes the key, so the next request renders a new
+    snapshot and the stale one ages out. Snapshots are evicted least
+    recently used first once they take more than max_bytes in total.
+
+    Data versions are kept in the database, so keys mean the same in every
+    process and across restarts: snapshots left by an earlier run are
+    indexed when the cache is first used and served like new ones. Another
+    process sharing the directory may evict a snapshot, so a hit is checked
+    on disk.
+    """
+
+    def __init__(self, cache_dir: Path = REPORT_CACHE_DIR, max_bytes: int = REPORT_CACHE_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # file name -> size, least recently used first
+        self._bytes = 0
+        self._opened = False
+
+    def _open(self):
+        """Create the directory and index an earlier run's snapshots, oldest first (caller holds the lock)"""
+        if self._opened:
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        snapshots = []
+        for path in self.cache_dir.iterdir():
+            if not path.is_file():
+                continue
+            if path.suffix == ".part":
+                # Left by a render that never finished
+                path.unlink(missing_ok=True)
+                continue
+            stat = path.stat()
+            snapshots.append((stat.st_mtime, path.name, stat.st_size))
+        for _, name, size in sorted(snapshots):
+            self._entries[name] = size
+            self._bytes += size
+        self._evict()
+        cache_bytes.set(self._bytes)
+        self._opened = True
+
+    def key(self, db: Session, report: str, start: date, end: date, **params) -> str:
+        """Content key of a report over [start, end] at the current data versions"""
+        fingerprint = range_fingerprint(db, start, end, tables=["students"])
+        return hashlib.sha256(repr((report, start, end, sorted(params.items()), fingerprint)).encode()).hexdigest()
+
+    def get_or_render(self, db: Session, report: str, start: date, end: date, suffix: str,
+                      render: Callable[[Path], None], **params) -> Path:
+        """
+        Get the path of a report's snapshot, rendering it on a miss
+
+        render(path) writes the report to a temporary path that is moved
+        into place once complete, so readers never see a partial file.
+        """
+        # Versions are read before rendering: a write racing with the render
+        # can only leave a newer body under an older key, never the reverse
+        name = f"{self.key(db, report, start, end, **params)}.{suffix}"
+        path = self.cache_dir / name
+        with self._lock:
+            self._open()
+            if name in self._entries:
+                if path.exists():
+                    self._entries.move_to_end(name)
+                    lookups.inc(result="hit")
+                    return path
+                self._bytes -= self._entries.pop(name)
+        lookups.inc(result="miss")
+
+        tmp_path = self.cache_dir / f"{name}.{uuid.uuid4().hex}.part"
+        try:
+            render(tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        size = path.stat().st_size
+        with self._lock:
+            # A concurrent miss may have stored the same snapshot already
+            self._bytes += size - self._entries.get(name, 0)
+            self._entries[name] = size
+            self._entries.move_to_end(name)
+            self._evict()
+            cache_bytes.set(self._bytes)
+        return path
+
+    def _evict(self):
+        """Drop least recently used snapshots while over the limit, always keeping the newest"""
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            name, size = self._entries.popitem(last=False)
+            (self.cache_dir / name).unlink(missing_ok=True)
+            self._bytes -= size
+            evictions.inc()
+
+    def clear(self):
+        """Delete every snapshot"""
+        with self._lock:
+            self._open()
+            for name in self._entries:
+                (self.cache_dir / name).unlink(missing_ok=True)
+            self._entries.clear()
+            self._bytes = 0
+            cache_bytes.set(0)
+
+
+report_cache = SnapshotCache()
@@ -0,0 +1,92 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterable
+
+from fastapi import Response
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
+
+from data_versions import table_version
+from database import current_tenant
+from metrics import Counter, Gauge
+
+# 0 turns the cache off: every lookup renders
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", 256))
+
+lookups = Counter("response_cache_lookups_total", "Response cache lookups by endpoint and result (hit or miss)")
+cache_entries = Gauge("response_cache_entries", "Serialized responses held in the response cache")
+cache_entries.set(0)
+
+
+class ResponseCache:
+    """
+    Serialized JSON bodies of read-mostly endpoints, keyed by tenant, endpoint and query parameters
+
+    Each entry remembers the versions of the tables it was rendered from.
+    Triggers bump a table's version in the database on every write
+    (data_versions.install_version_tracking), whichever process makes it,
+    so the next lookup after a write finds the entry out of date and
+    renders again; nothing is served across a write.
+    A hit returns the stored bytes without querying the database or running
+    the response model. Least recently used entries are dropped past
+    max_entries.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (tenant, endpoint, params) -> (table versions, body)
+        self._adapters = {}
+        self._lock = threading.Lock()
+
+    def _adapter(self, response_type) -> TypeAdapter:
+        adapter = self._adapters.get(response_type)
+        if adapter is None:
+            adapter = self._adapters[response_type] = TypeAdapter(response_type)
+        return adapter
+
+    def get_or_render(self, db: Session, endpoint: str, params: Hashable, tables: Iterable[str], response_type,
+                      render: Callable[[], Any]) -> bytes:
+        """
+        Return the JSON body for endpoint and params, rendering it on a miss
+
+        render returns what the route would (ORM objects or schemas); it is
+        validated and serialized as response_type, like FastAPI's response_model.
+        """
+        key = (current_tenant.get(), endpoint, params)
+        # Read the versions before rendering, so a write racing with the query can
+        # only make the entry look older than its body, never newer
+        versions = tuple(table_version(db, table) for table in tables)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == versions:
+                self._entries.move_to_end(key)
+                lookups.inc(endpoint=endpoint, result="hit")
+                return entry[1]
+
+        lookups.inc(endpoint=endpoint, result="miss")
+        adapter = self._adapter(response_type)
+        body = adapter.dump_json(adapter.validate_python(render(), from_attributes=True))
+        with self._lock:
+            self._entries[key] = (versions, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            cache_entries.set(len(self._entries))
+        return body
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            cache_entries.set(0)
+
+
+def json_response(body: bytes, response: Response) -> Response:
+    """A response for a cached body, with the headers the route set on its injected response (e.g. ETag)"""
+    headers = {
+        name: value for name, value in response.headers.items() if name not in ("content-length", "content-type")
+    }
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+responses = ResponseCache()
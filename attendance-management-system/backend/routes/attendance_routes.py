@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime, date
-from database import get_db
-from models import Attendance, Student
+from typing import Optional
+from database import get_read_db, get_request_sessions, get_write_db, ReadSessionLocal, RequestSessions
+from models import Student
 from schemas import (
     AttendanceCreate,
     AttendanceUpdate,
@@ -11,26 +14,40 @@ from schemas import (
     AIParseRequest,
     AIParseResponse,
     AttendancePercentage,
-    AttendanceWithStudent
+    AttendanceWithStudent,
+    AttendanceWriteResult,
+    AttendanceStatus,
+    CheckInReceipt,
+    AmbiguousName,
+    FlaggedStudent,
+    StudentCreate
 )
 from attendance_manager import (
     create_attendance_record,
-    get_attendance_by_date,
-    get_attendance_by_student,
+    upsert_attendance_records,
+    iter_attendance_by_date,
+    iter_attendance_by_student,
     update_attendance_record,
     delete_attendance_record,
     calculate_attendance_percentage,
     get_attendance_summary_by_date
 )
 from ai_parser import parse_attendance_command
-from student_manager import get_student_by_name
+from student_manager import create_student
+from name_index import student_names
+from section_manager import get_section_by_name, get_section_member_ids, mark_section_attendance
+from utils.ndjson import encode_batches, NDJSON_MEDIA_TYPE
+from data_versions import day_version, pending_version, table_version, make_etag, conditional_response
+from live_feed import feed
+from streaks import get_flagged_students
+from write_behind import record_checkin, merge_pending_rows, merge_pending_counts
 
 router = APIRouter(prefix="/attendance", tags=["attendance"])
 
 
-@router.post("/manual", response_model=AttendanceSchema)
-def create_manual_attendance(attendance: AttendanceCreate, db: Session = Depends(get_db)):
-    """Manually create an attendance record"""
+@router.post("/manual", response_model=AttendanceWriteResult)
+def create_manual_attendance(attendance: AttendanceCreate, db: Session = Depends(get_write_db)):
+    """Manually create or update a student's attendance for a day"""
     try:
         # Verify student exists
         student = db.query(Student).filter(Student.id == attendance.student_id).first()
@@ -44,38 +61,123 @@ def create_manual_attendance(attendance: AttendanceCreate, db: Session = Depends
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/ai", response_model=list[AttendanceSchema])
-def create_ai_attendance(ai_request: AIParseRequest, db: Session = Depends(get_db)):
+@router.post("/bulk", response_model=list[AttendanceWriteResult])
+def create_bulk_attendance(attendances: list[AttendanceCreate], db: Session = Depends(get_write_db)):
+    """Create or update many attendance records in one transaction"""
+    try:
+        student_ids = {attendance.student_id for attendance in attendances}
+        found = {student_id for (student_id,) in db.query(Student.id).filter(Student.id.in_(student_ids))}
+        missing = sorted(student_ids - found)
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Students not found: {missing}")
+
+        return upsert_attendance_records(db, attendances)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/checkin", response_model=CheckInReceipt)
+def create_checkin(attendance: AttendanceCreate, response: Response, db: Session = Depends(get_write_db)):
+    """
+    Record a kiosk or card reader check-in
+
+    With WRITE_BEHIND on, the check-in is journaled and acknowledged with
+    202 and written with the next batch; day reads include it meanwhile.
+    Otherwise it is written straight away like a manual mark.
+    """
+    try:
+        student = db.query(Student).filter(Student.id == attendance.student_id).first()
+        if not student:
+            raise HTTPException(status_code=404, detail="Student not found")
+
+        receipt = record_checkin(db, attendance)
+        if receipt.pending:
+            response.status_code = 202
+        return receipt
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _unresolved_names(ambiguous: list[dict]) -> HTTPException:
+    """A 409 listing the candidates of names that didn't resolve to one student"""
+    several = any(len(entry["candidates"]) > 1 for entry in ambiguous)
+    weak = any(len(entry["candidates"]) == 1 for entry in ambiguous)
+    if several and weak:
+        message = "Some names match more than one student or have no confident match"
+    elif several:
+        message = "Some names match more than one student"
+    else:
+        # A single candidate that scored too low to be taken for the name
+        message = "No confident match for some names"
+    return HTTPException(status_code=409, detail={"message": message, "ambiguous": ambiguous})
+
+
+@router.post("/ai", response_model=list[AttendanceWriteResult])
+def create_ai_attendance(ai_request: AIParseRequest, sessions: RequestSessions = Depends(get_request_sessions)):
     """Create attendance records using AI-parsed natural language command"""
     try:
-        # Parse the command using AI
-        parsed_result: AIParseResponse = parse_attendance_command(ai_request.command)
-        
-        created_attendances = []
-        
-        # Process each student in the command
+        # Parse the command on the read-only pool: a slow LLM call must not hold
+        # one of the few writer connections, which are only taken for the writes
+        parsed_result: AIParseResponse = parse_attendance_command(ai_request.command, sessions.read)
+        db = sessions.write
+
+        # "Everyone in 7B is present except Ali" marks the section in one statement
+        if parsed_result.section:
+            section = get_section_by_name(db, parsed_result.section)
+            if not section:
+                raise HTTPException(status_code=404, detail=f"Section '{parsed_result.section}' not found")
+
+            # Exceptions are resolved among the section's members only, so "Ali"
+            # can't pick a student of another class, and nothing is written
+            # while one could mean more than one member
+            member_ids = set(get_section_member_ids(db, section.id))
+            exceptions, ambiguous = {}, []
+            for student_name in parsed_result.except_students:
+                student_id, candidates = student_names.resolve(db, student_name, among=member_ids)
+                if student_id is not None:
+                    exceptions[student_id] = parsed_result.except_status
+                elif candidates:
+                    ambiguous.append(AmbiguousName(name=student_name, candidates=candidates).model_dump())
+                else:
+                    raise HTTPException(
+                        status_code=400, detail=f"'{student_name}' is not in section {section.name}"
+                    )
+            if ambiguous:
+                raise _unresolved_names(ambiguous)
+
+            return mark_section_attendance(
+                db, section.id, parsed_result.status, parsed_result.date, exceptions
+            )
+
+        # Resolve names against the fuzzy index so "Mohammad" finds "Muhammad";
+        # nothing is written while any name could mean more than one student
+        student_ids, ambiguous = [], []
         for student_name in parsed_result.students:
-            # Find student by name (case-insensitive)
-            student = get_student_by_name(db, student_name)
-
-            # If student doesn't exist, create them
-            if not student:
-                from student_manager import create_student
-                from schemas import StudentCreate
-                new_student_data = StudentCreate(name=student_name)
-                student = create_student(db, new_student_data)
-            
-            # Create attendance record
-            attendance_data = AttendanceCreate(
-                student_id=student.id,
+            student_id, candidates = student_names.resolve(db, student_name)
+            if student_id is None and candidates:
+                ambiguous.append(AmbiguousName(name=student_name, candidates=candidates).model_dump())
+            student_ids.append(student_id)
+        if ambiguous:
+            raise _unresolved_names(ambiguous)
+
+        attendance_data = []
+        for student_name, student_id in zip(parsed_result.students, student_ids):
+            # Names that match nobody are new students
+            if student_id is None:
+                student_id = create_student(db, StudentCreate(name=student_name)).id
+
+            attendance_data.append(AttendanceCreate(
+                student_id=student_id,
                 status=parsed_result.status,
                 date=parsed_result.date
-            )
-            
-            attendance_record = create_attendance_record(db, attendance_data)
-            created_attendances.append(attendance_record)
-        
-        return created_attendances
+            ))
+
+        # Re-sending the same command updates the day's records instead of duplicating them
+        return upsert_attendance_records(db, attendance_data)
     except HTTPException:
         raise
     except Exception as e:
@@ -83,45 +185,33 @@ def create_ai_attendance(ai_request: AIParseRequest, db: Session = Depends(get_d
 
 
 @router.get("/date/{date_str}", response_model=list[AttendanceWithStudent])
-def read_attendance_by_date(date_str: str, db: Session = Depends(get_db)):
+def read_attendance_by_date(date_str: str, request: Request, response: Response, db: Session = Depends(get_read_db)):
     """Get all attendance records for a specific date"""
     try:
-        # Parse the date string
         target_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-        
-        # Calculate the start and end of the target date for filtering
-        start_datetime = datetime.combine(target_date, datetime.min.time())
-        end_datetime = datetime.combine(target_date, datetime.max.time())
-
-        # Get attendance records with joined student information
-        attendance_records = db.query(Attendance, Student).join(Student).filter(
-            Attendance.date >= start_datetime,
-            Attendance.date <= end_datetime
-        ).all()
-
-        # Format the results to include student names
-        result = []
-        for attendance, student in attendance_records:
-            # Ensure SQLAlchemy session state doesn't interfere with serialization
-            attendance_dict = {
-                'id': attendance.id,
-                'student_id': attendance.student_id,
-                'student_name': student.name,
-                'status': attendance.status,
-                'date': attendance.date,
-                'created_at': attendance.created_at
-            }
-            result.append(attendance_dict)
-
-        return result
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+    try:
+        # Student names are part of the payload, so renames change the tag too
+        etag = make_etag(db, "date", target_date, day_version(db, target_date), pending_version(target_date),
+                         table_version(db, "students"))
+        not_modified = conditional_response(request, response, etag)
+        if not_modified:
+            return not_modified
+
+        # Column rows with the joined student name, without loading ORM objects
+        result = []
+        for batch in iter_attendance_by_date(db, target_date):
+            result.extend(batch)
+
+        # Check-ins acknowledged by the write-behind journal but not yet written
+        return merge_pending_rows(db, target_date, result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/student/{student_id}", response_model=list[AttendanceSchema])
-def read_attendance_by_student(student_id: int, db: Session = Depends(get_db)):
+def read_attendance_by_student(student_id: int, db: Session = Depends(get_read_db)):
     """Get all attendance records for a specific student"""
     try:
         # Verify student exists
@@ -129,7 +219,9 @@ def read_attendance_by_student(student_id: int, db: Session = Depends(get_db)):
         if not student:
             raise HTTPException(status_code=404, detail="Student not found")
         
-        attendance_records = get_attendance_by_student(db, student_id)
+        attendance_records = []
+        for batch in iter_attendance_by_student(db, student_id):
+            attendance_records.extend(batch)
         return attendance_records
     except HTTPException:
         raise
@@ -137,8 +229,75 @@ def read_attendance_by_student(student_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/student/{student_id}/stream")
+def stream_attendance_by_student(
+    student_id: int,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    status: Optional[AttendanceStatus] = None,
+    db: Session = Depends(get_read_db)
+):
+    """Stream a student's attendance history as newline-delimited JSON"""
+    student = db.query(Student).filter(Student.id == student_id).first()
+    if not student:
+        raise HTTPException(status_code=404, detail="Student not found")
+
+    def generate():
+        # The request's session is closed before the body is sent, so the
+        # stream holds its own for as long as the client is reading
+        stream_db = ReadSessionLocal()
+        try:
+            yield from encode_batches(iter_attendance_by_student(
+                stream_db, student_id, start_date, end_date, status.value if status else None
+            ))
+        finally:
+            stream_db.close()
+
+    return StreamingResponse(generate(), media_type=NDJSON_MEDIA_TYPE)
+
+
+@router.get("/live")
+async def live_attendance_feed(date: Optional[date] = None):
+    """
+    Server-sent events with attendance changes as they are written
+
+    Events: `attendance` (an inserted, updated or deleted record), `counts`
+    (the day's totals after a change), `reload` (the day changed in bulk) and
+    `reset` (the client fell behind and must reload and reconnect). Pass
+    `date` to receive only that day's events.
+    """
+    subscription = feed.subscribe(date)
+
+    async def generate():
+        try:
+            async for message in subscription.messages():
+                yield message
+        finally:
+            feed.unsubscribe(subscription)
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/flagged", response_model=list[FlaggedStudent])
+def read_flagged_students(db: Session = Depends(get_read_db)):
+    """
+    Students currently on an absence streak or with a sudden attendance drop
+
+    Served from the per-student streak state kept by every write, so the
+    cost depends on the number of flagged students only.
+    """
+    try:
+        return get_flagged_students(db)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/percentage/{student_id}", response_model=AttendancePercentage)
-def read_attendance_percentage(student_id: int, db: Session = Depends(get_db)):
+def read_attendance_percentage(student_id: int, db: Session = Depends(get_read_db)):
     """Get attendance percentage for a specific student"""
     try:
         # Verify student exists
@@ -158,7 +317,7 @@ def read_attendance_percentage(student_id: int, db: Session = Depends(get_db)):
 
 
 @router.put("/{attendance_id}", response_model=AttendanceSchema)
-def update_attendance(attendance_id: int, attendance_update: AttendanceUpdate, db: Session = Depends(get_db)):
+def update_attendance(attendance_id: int, attendance_update: AttendanceUpdate, db: Session = Depends(get_write_db)):
     """Update an attendance record"""
     try:
         updated_attendance = update_attendance_record(db, attendance_id, attendance_update)
@@ -167,12 +326,15 @@ def update_attendance(attendance_id: int, attendance_update: AttendanceUpdate, d
         return updated_attendance
     except HTTPException:
         raise
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Student already has an attendance record for that day")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.delete("/{attendance_id}")
-def delete_attendance(attendance_id: int, db: Session = Depends(get_db)):
+def delete_attendance(attendance_id: int, db: Session = Depends(get_write_db)):
     """Delete an attendance record"""
     try:
         success = delete_attendance_record(db, attendance_id)
@@ -186,14 +348,19 @@ def delete_attendance(attendance_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/summary/{date_str}", response_model=dict)
-def read_attendance_summary(date_str: str, db: Session = Depends(get_db)):
+def read_attendance_summary(date_str: str, request: Request, response: Response, db: Session = Depends(get_read_db)):
     """Get attendance summary for a specific date"""
     try:
         # Parse the date string
         target_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-        
+
+        etag = make_etag(db, "summary", target_date, day_version(db, target_date), pending_version(target_date))
+        not_modified = conditional_response(request, response, etag)
+        if not_modified:
+            return not_modified
+
         summary = get_attendance_summary_by_date(db, target_date)
-        return summary
+        return merge_pending_counts(db, target_date, summary)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
     except Exception as e:
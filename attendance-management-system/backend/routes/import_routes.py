@@ -0,0 +1,32 @@
+import shutil
+import tempfile
+from pathlib import Path
+from fastapi import APIRouter, File, HTTPException, UploadFile
+from schemas import ImportJob, ImportKind
+from importer import runner
+
+router = APIRouter(prefix="/import", tags=["import"])
+
+ALLOWED_SUFFIXES = {".csv", ".xlsx", ".xlsm"}
+
+
+@router.post("/{kind}", response_model=ImportJob, status_code=202)
+def create_import(kind: ImportKind, file: UploadFile = File(...)):
+    """Import a student roster or attendance history from a CSV or XLSX upload"""
+    suffix = Path(file.filename or "").suffix.lower()
+    if suffix not in ALLOWED_SUFFIXES:
+        raise HTTPException(status_code=400, detail="Upload a .csv or .xlsx file")
+
+    # Copy the upload in blocks to a file the background import can own
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix, prefix="import-") as spooled:
+        shutil.copyfileobj(file.file, spooled)
+    return runner.submit(kind, Path(spooled.name), file.filename)
+
+
+@router.get("/{import_id}", response_model=ImportJob)
+def read_import(import_id: str):
+    """Get the progress and row errors of an import"""
+    job = runner.get(import_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return job
@@ -0,0 +1,41 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+from schemas import ExportJob, ExportJobCreate, JobStatus
+from export_jobs import runner, ExportQueueFull
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.post("/export", response_model=ExportJob, status_code=202)
+def create_export_job(job_request: ExportJobCreate):
+    """Queue a CSV or Excel export of a date range; identical pending requests share one job"""
+    if job_request.end_date < job_request.start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    try:
+        return runner.submit(job_request)
+    except ExportQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+
+
+@router.get("/{job_id}", response_model=ExportJob)
+def read_export_job(job_id: str):
+    """Get the status and progress of an export job"""
+    job = runner.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return job
+
+
+@router.get("/{job_id}/download")
+def download_export_job(job_id: str):
+    """Download the file produced by a finished export job"""
+    job = runner.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if job.status != JobStatus.done:
+        raise HTTPException(status_code=409, detail=f"Export job is {job.status.value}")
+
+    result = runner.result(job_id)
+    if result is None:
+        raise HTTPException(status_code=410, detail="Export file has been evicted")
+    return FileResponse(result.path, media_type=result.media_type, filename=result.filename)
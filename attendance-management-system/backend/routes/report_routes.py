@@ -0,0 +1,159 @@
+import calendar
+import json
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy.orm import Session
+from datetime import datetime, date
+from pathlib import Path
+from typing import Callable, Optional
+from database import get_read_db, ReadSessionLocal
+from schemas import AttendanceStatus, ExportFormat
+from export_jobs import FILE_EXTENSIONS, MEDIA_TYPES
+from report_cache import report_cache, is_closed
+from utils.ndjson import encode_batches, NDJSON_MEDIA_TYPE
+from utils.reporting import (
+    get_attendance_summary,
+    export_attendance_to_csv,
+    export_attendance_to_excel,
+    iter_attendance_rows,
+    write_attendance_export
+)
+
+router = APIRouter(prefix="/reports", tags=["reports"])
+
+
+def _summary_renderer(db: Session, start: date, end: date) -> Callable[[Path], None]:
+    def render(path: Path):
+        # Same encoding FastAPI uses for the uncached response
+        path.write_text(json.dumps(get_attendance_summary(db, start, end), separators=(",", ":")))
+    return render
+
+
+def _cached_file(db: Session, report: str, start: date, end: date, suffix: str, render: Callable[[Path], None],
+                 media_type: str, filename: Optional[str] = None) -> FileResponse:
+    """Serve a closed period's report from the snapshot cache, rendering it on a miss"""
+    path = report_cache.get_or_render(db, report, start, end, suffix, render)
+    headers = {"Content-Disposition": f"attachment; filename={filename}"} if filename else None
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+
+@router.get("/summary/{date_str}", response_model=dict)
+def read_report_summary(date_str: str, db: Session = Depends(get_read_db)):
+    """Get attendance summary statistics for a date, including archived months"""
+    try:
+        target_date = datetime.strptime(date_str, "%Y-%m-%d").date()
+        if is_closed(target_date):
+            return _cached_file(
+                db, "summary", target_date, target_date, "json",
+                _summary_renderer(db, target_date, target_date), "application/json"
+            )
+        return get_attendance_summary(db, target_date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/export/csv/{date_str}")
+def export_csv(date_str: str, db: Session = Depends(get_read_db)):
+    """Export a day's attendance as CSV"""
+    try:
+        target_date = datetime.strptime(date_str, "%Y-%m-%d").date()
+        if is_closed(target_date):
+            return _cached_file(
+                db, "csv", target_date, target_date, "csv",
+                lambda path: path.write_bytes(export_attendance_to_csv(db, target_date).getvalue()),
+                MEDIA_TYPES["csv"], f"attendance_{date_str}.csv"
+            )
+        csv_buffer = export_attendance_to_csv(db, target_date)
+        return StreamingResponse(
+            csv_buffer,
+            media_type="text/csv",
+            headers={"Content-Disposition": f"attachment; filename=attendance_{date_str}.csv"}
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/export/excel/{date_str}")
+def export_excel(date_str: str, db: Session = Depends(get_read_db)):
+    """Export a day's attendance as an Excel workbook"""
+    try:
+        target_date = datetime.strptime(date_str, "%Y-%m-%d").date()
+        if is_closed(target_date):
+            return _cached_file(
+                db, "excel", target_date, target_date, "xlsx",
+                lambda path: path.write_bytes(export_attendance_to_excel(db, target_date).getvalue()),
+                MEDIA_TYPES["excel"], f"attendance_{date_str}.xlsx"
+            )
+        excel_buffer = export_attendance_to_excel(db, target_date)
+        return StreamingResponse(
+            excel_buffer,
+            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            headers={"Content-Disposition": f"attachment; filename=attendance_{date_str}.xlsx"}
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _closed_month(month_str: str) -> tuple:
+    """Parse YYYY-MM into the month's first and last day, rejecting open months"""
+    try:
+        start = datetime.strptime(month_str, "%Y-%m").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid month format. Use YYYY-MM")
+    end = date(start.year, start.month, calendar.monthrange(start.year, start.month)[1])
+    if not is_closed(end):
+        raise HTTPException(
+            status_code=409, detail=f"{month_str} is not closed yet; use /reports/stream or /jobs/export"
+        )
+    return start, end
+
+
+@router.get("/month/{month_str}/summary", response_model=dict)
+def read_month_summary(month_str: str, db: Session = Depends(get_read_db)):
+    """Summary statistics for a closed month, served from the snapshot cache"""
+    start, end = _closed_month(month_str)
+    try:
+        return _cached_file(db, "summary", start, end, "json", _summary_renderer(db, start, end), "application/json")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/month/{month_str}/export/{export_format}")
+def export_month(month_str: str, export_format: ExportFormat, db: Session = Depends(get_read_db)):
+    """Export a closed month as CSV or Excel, served from the snapshot cache"""
+    start, end = _closed_month(month_str)
+    extension = FILE_EXTENSIONS[export_format.value]
+    try:
+        return _cached_file(
+            db, export_format.value, start, end, extension,
+            lambda path: write_attendance_export(db, path, export_format.value, start, end),
+            MEDIA_TYPES[export_format.value], f"attendance_{month_str}.{extension}"
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/stream")
+def stream_attendance(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    student_id: Optional[int] = None,
+    status: Optional[AttendanceStatus] = None
+):
+    """Stream live and archived attendance records as newline-delimited JSON"""
+    def generate():
+        db = ReadSessionLocal()
+        try:
+            yield from encode_batches(iter_attendance_rows(
+                db, start_date, end_date, student_id, status.value if status else None
+            ))
+        finally:
+            db.close()
+
+    return StreamingResponse(generate(), media_type=NDJSON_MEDIA_TYPE)
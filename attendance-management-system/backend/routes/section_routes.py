@@ -0,0 +1,135 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from database import get_read_db, get_write_db
+from models import Student
+from schemas import (
+    AttendanceStatus,
+    AttendanceWriteResult,
+    ClassSection,
+    ClassSectionCreate,
+    SectionAttendanceCreate,
+    SectionMembers
+)
+from section_manager import (
+    get_section_by_id,
+    get_all_sections,
+    get_section_member_ids,
+    create_section,
+    add_section_members,
+    remove_section_member,
+    delete_section,
+    mark_section_attendance
+)
+from response_cache import responses, json_response
+
+router = APIRouter(prefix="/sections", tags=["sections"])
+
+
+def _section_response(db: Session, section) -> ClassSection:
+    return ClassSection(
+        id=section.id,
+        name=section.name,
+        created_at=section.created_at,
+        student_ids=get_section_member_ids(db, section.id)
+    )
+
+
+@router.post("/", response_model=ClassSection)
+def create_new_section(section: ClassSectionCreate, db: Session = Depends(get_write_db)):
+    """Create a new class section"""
+    try:
+        return _section_response(db, create_section(db, section))
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Section already exists")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/", response_model=list[ClassSection])
+def read_all_sections(response: Response, db: Session = Depends(get_read_db)):
+    """Get all class sections with their students"""
+    try:
+        # Member lists change with student deletes as well as section writes
+        body = responses.get_or_render(
+            db, "sections", (), ("class_sections", "students"), list[ClassSection],
+            lambda: [_section_response(db, section) for section in get_all_sections(db)]
+        )
+        return json_response(body, response)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/{section_id}", response_model=ClassSection)
+def read_section(section_id: int, db: Session = Depends(get_read_db)):
+    """Get a class section by ID"""
+    section = get_section_by_id(db, section_id)
+    if section is None:
+        raise HTTPException(status_code=404, detail="Section not found")
+    return _section_response(db, section)
+
+
+@router.post("/{section_id}/members", response_model=ClassSection)
+def add_members(section_id: int, members: SectionMembers, db: Session = Depends(get_write_db)):
+    """Add students to a class section"""
+    try:
+        section = get_section_by_id(db, section_id)
+        if section is None:
+            raise HTTPException(status_code=404, detail="Section not found")
+
+        student_ids = set(members.student_ids)
+        found = {student_id for (student_id,) in db.query(Student.id).filter(Student.id.in_(student_ids))}
+        missing = sorted(student_ids - found)
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Students not found: {missing}")
+
+        add_section_members(db, section_id, list(student_ids))
+        return _section_response(db, section)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.delete("/{section_id}/members/{student_id}")
+def remove_member(section_id: int, student_id: int, db: Session = Depends(get_write_db)):
+    """Remove a student from a class section"""
+    if not remove_section_member(db, section_id, student_id):
+        raise HTTPException(status_code=404, detail="Student is not in this section")
+    return {"message": "Student removed from section"}
+
+
+@router.delete("/{section_id}")
+def delete_existing_section(section_id: int, db: Session = Depends(get_write_db)):
+    """Delete a class section"""
+    if not delete_section(db, section_id):
+        raise HTTPException(status_code=404, detail="Section not found")
+    return {"message": "Section deleted successfully"}
+
+
+@router.post("/{section_id}/attendance", response_model=list[AttendanceWriteResult])
+def mark_section(section_id: int, marking: SectionAttendanceCreate, db: Session = Depends(get_write_db)):
+    """Mark a whole section for a day, except the listed students"""
+    try:
+        if get_section_by_id(db, section_id) is None:
+            raise HTTPException(status_code=404, detail="Section not found")
+
+        exceptions = {}
+        for status, student_ids in (
+            (AttendanceStatus.absent, marking.absent),
+            (AttendanceStatus.late, marking.late),
+            (AttendanceStatus.present, marking.present),
+        ):
+            for student_id in student_ids:
+                exceptions[student_id] = status
+
+        outsiders = sorted(set(exceptions) - set(get_section_member_ids(db, section_id)))
+        if outsiders:
+            raise HTTPException(status_code=400, detail=f"Students not in section: {outsiders}")
+
+        return mark_section_attendance(db, section_id, marking.status, marking.date, exceptions)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,8 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
-from database import get_db
+from database import get_read_db, get_write_db
 from models import Student
-from schemas import StudentCreate, StudentUpdate, Student
+from schemas import StudentCreate, StudentUpdate, Student, StudentCandidate
 from student_manager import (
     get_student_by_id,
     get_all_students,
@@ -11,12 +11,15 @@ from student_manager import (
     delete_student,
     search_students_by_name
 )
+from data_versions import table_version, make_etag, conditional_response
+from response_cache import responses, json_response
+from name_index import student_names
 
 router = APIRouter(prefix="/students", tags=["students"])
 
 
 @router.post("/", response_model=Student)
-def create_new_student(student: StudentCreate, db: Session = Depends(get_db)):
+def create_new_student(student: StudentCreate, db: Session = Depends(get_write_db)):
     """Create a new student"""
     try:
         return create_student(db, student)
@@ -25,17 +28,38 @@ def create_new_student(student: StudentCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/", response_model=list[Student])
-def read_all_students(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def read_all_students(
+    request: Request, response: Response, skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db)
+):
     """Get all students with pagination"""
     try:
-        students = get_all_students(db, skip=skip, limit=limit)
-        return students
+        etag = make_etag(db, "students", skip, limit, table_version(db, "students"))
+        not_modified = conditional_response(request, response, etag)
+        if not_modified:
+            return not_modified
+
+        # Every page load fetches the roster; serve the serialized body until a student changes
+        body = responses.get_or_render(
+            db, "students", (skip, limit), ("students",), list[Student],
+            lambda: get_all_students(db, skip=skip, limit=limit)
+        )
+        return json_response(body, response)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/match", response_model=list[StudentCandidate])
+def match_students(name: str, limit: int = 5, db: Session = Depends(get_read_db)):
+    """Rank students by fuzzy similarity to a possibly misspelled name"""
+    try:
+        student_names.ensure_loaded(db)
+        return student_names.search(name, limit=limit)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/{student_id}", response_model=Student)
-def read_student(student_id: int, db: Session = Depends(get_db)):
+def read_student(student_id: int, db: Session = Depends(get_read_db)):
     """Get a student by ID"""
     try:
         db_student = get_student_by_id(db, student_id)
@@ -50,7 +74,7 @@ def read_student(student_id: int, db: Session = Depends(get_db)):
 
 @router.put("/{student_id}", response_model=Student)
 def update_existing_student(
-    student_id: int, student_update: StudentUpdate, db: Session = Depends(get_db)
+    student_id: int, student_update: StudentUpdate, db: Session = Depends(get_write_db)
 ):
     """Update a student's information"""
     try:
@@ -65,7 +89,7 @@ def update_existing_student(
 
 
 @router.delete("/{student_id}")
-def delete_existing_student(student_id: int, db: Session = Depends(get_db)):
+def delete_existing_student(student_id: int, db: Session = Depends(get_write_db)):
     """Delete a student by ID"""
     try:
         success = delete_student(db, student_id)
@@ -79,7 +103,7 @@ def delete_existing_student(student_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/search", response_model=list[Student])
-def search_students(name: str, db: Session = Depends(get_db)):
+def search_students(name: str, db: Session = Depends(get_read_db)):
     """Search students by name (case-insensitive partial match)"""
     try:
         students = search_students_by_name(db, name)
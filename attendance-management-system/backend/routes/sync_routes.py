@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from database import get_read_db, get_write_db
+from schemas import SyncBatch, SyncUploadRecord, SyncUploadResult
+from sync import SYNC_BATCH_SIZE, get_changes, apply_uploads
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+
+@router.get("", response_model=SyncBatch)
+def read_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(SYNC_BATCH_SIZE, ge=1, le=10 * SYNC_BATCH_SIZE),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Students and attendance changed since a client's last sync
+
+    Start with `since=0`, apply each batch (upserts, then the ids under
+    `deleted`) and ask again with `next` while `has_more` is true. Keep the
+    last `next` for the following sync.
+    """
+    try:
+        return get_changes(db, since, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/attendance", response_model=list[SyncUploadResult])
+def upload_attendance(uploads: list[SyncUploadRecord], db: Session = Depends(get_write_db)):
+    """
+    Upload attendance marked while offline
+
+    Every record needs a `client_id` that stays the same when the upload
+    is retried: records already received are answered `duplicate` and not
+    written again. Unknown students are `rejected`; the rest are written
+    in one transaction.
+    """
+    try:
+        return apply_uploads(db, uploads)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from database import get_db
+from database import current_tenant, get_read_db, get_write_db
 from models import User
 from schemas import UserCreate, UserUpdate, User, Token, UserLogin
 from user_manager import (
@@ -20,7 +20,7 @@ router = APIRouter(prefix="/users", tags=["users"])
 
 
 @router.post("/register", response_model=User)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
+def register_user(user: UserCreate, db: Session = Depends(get_write_db)):
     """Register a new user"""
     # Check if user already exists
     db_user = get_user_by_username(db, user.username)
@@ -36,7 +36,7 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
 
 
 @router.post("/login", response_model=Token)
-def login_user(user_credentials: UserLogin, db: Session = Depends(get_db)):
+def login_user(user_credentials: UserLogin, db: Session = Depends(get_read_db)):
     """Login a user and return access token"""
     user = authenticate_user(db, user_credentials.username, user_credentials.password)
     if not user:
@@ -47,22 +47,27 @@ def login_user(user_credentials: UserLogin, db: Session = Depends(get_db)):
         )
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    claims = {"sub": user.username}
+    # Later requests with this token go to the same school's database
+    tenant = current_tenant.get()
+    if tenant is not None:
+        claims["tenant"] = tenant
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data=claims, expires_delta=access_token_expires
     )
 
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 @router.get("/", response_model=list[User])
-def read_all_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def read_all_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db)):
     """Get all users with pagination"""
     users = get_all_users(db, skip=skip, limit=limit)
     return users
 
 
 @router.get("/{user_id}", response_model=User)
-def read_user(user_id: int, db: Session = Depends(get_db)):
+def read_user(user_id: int, db: Session = Depends(get_read_db)):
     """Get a user by ID"""
     db_user = get_user_by_id(db, user_id)
     if db_user is None:
@@ -72,7 +77,7 @@ def read_user(user_id: int, db: Session = Depends(get_db)):
 
 @router.put("/{user_id}", response_model=User)
 def update_existing_user(
-    user_id: int, user_update: UserUpdate, db: Session = Depends(get_db)
+    user_id: int, user_update: UserUpdate, db: Session = Depends(get_write_db)
 ):
     """Update a user's information"""
     db_user = update_user(db, user_id, user_update)
@@ -82,7 +87,7 @@ def update_existing_user(
 
 
 @router.delete("/{user_id}")
-def delete_existing_user(user_id: int, db: Session = Depends(get_db)):
+def delete_existing_user(user_id: int, db: Session = Depends(get_write_db)):
     """Delete a user by ID"""
     success = delete_user(db, user_id)
     if not success:
@@ -91,7 +96,7 @@ def delete_existing_user(user_id: int, db: Session = Depends(get_db)):
 
 
 @router.patch("/{user_id}/deactivate")
-def deactivate_existing_user(user_id: int, db: Session = Depends(get_db)):
+def deactivate_existing_user(user_id: int, db: Session = Depends(get_write_db)):
     """Deactivate a user account"""
     db_user = deactivate_user(db, user_id)
     if db_user is None:
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import datetime, date
 from typing import Optional, List
 from enum import Enum
 
@@ -30,6 +30,17 @@ class Student(StudentBase):
         from_attributes = True
 
 
+class StudentCandidate(BaseModel):
+    id: int
+    name: str
+    score: float
+
+
+class AmbiguousName(BaseModel):
+    name: str
+    candidates: List[StudentCandidate]
+
+
 class AttendanceBase(BaseModel):
     student_id: int
     status: AttendanceStatus
@@ -52,18 +63,65 @@ class Attendance(AttendanceBase):
         from_attributes = True
 
 
+class WriteAction(str, Enum):
+    inserted = "inserted"
+    updated = "updated"
+
+
+class AttendanceWriteResult(Attendance):
+    action: WriteAction
+
+
+class CheckInReceipt(BaseModel):
+    sequence: Optional[int] = None  # journal position while pending, None once written
+    student_id: int
+    status: AttendanceStatus
+    date: datetime
+    pending: bool
+
+
 class AttendanceWithStudent(BaseModel):
-    id: int
+    id: Optional[int] = None  # None for a check-in still waiting in the write-behind journal
     student_id: int
     student_name: str
     status: AttendanceStatus
     date: Optional[datetime] = None
     created_at: Optional[datetime] = None
+    pending: bool = False
 
     class Config:
         from_attributes = True
 
 
+class ClassSectionBase(BaseModel):
+    name: str
+
+
+class ClassSectionCreate(ClassSectionBase):
+    pass
+
+
+class ClassSection(ClassSectionBase):
+    id: int
+    created_at: Optional[datetime] = None
+    student_ids: List[int] = []
+
+    class Config:
+        from_attributes = True
+
+
+class SectionMembers(BaseModel):
+    student_ids: List[int]
+
+
+class SectionAttendanceCreate(BaseModel):
+    status: AttendanceStatus = AttendanceStatus.present
+    date: Optional[datetime] = None
+    absent: List[int] = []
+    late: List[int] = []
+    present: List[int] = []
+
+
 class UserBase(BaseModel):
     username: str
     email: str
@@ -110,6 +168,11 @@ class AIParseResponse(BaseModel):
     students: List[str]
     status: AttendanceStatus
     date: Optional[datetime] = None
+    # Whole-class commands: everyone in `section` gets `status`,
+    # except `except_students`, who get `except_status`
+    section: Optional[str] = None
+    except_students: List[str] = []
+    except_status: Optional[AttendanceStatus] = None
 
 
 class AttendancePercentage(BaseModel):
@@ -119,4 +182,127 @@ class AttendancePercentage(BaseModel):
     present_days: int
     absent_days: int
     late_days: int
-    percentage: float
\ No newline at end of file
+    percentage: float
+
+
+class StreakFlag(str, Enum):
+    absence_streak = "absence_streak"
+    attendance_drop = "attendance_drop"
+
+
+class FlaggedStudent(BaseModel):
+    student_id: int
+    student_name: str
+    flags: List[StreakFlag]
+    last_day: date
+    last_status: AttendanceStatus
+    absence_run: int
+    absence_run_start: Optional[date] = None
+    rate_30d: float
+    previous_rate_30d: Optional[float] = None
+
+
+class ExportFormat(str, Enum):
+    csv = "csv"
+    excel = "excel"
+
+
+class JobStatus(str, Enum):
+    pending = "pending"
+    running = "running"
+    done = "done"
+    failed = "failed"
+
+
+class ExportJobCreate(BaseModel):
+    format: ExportFormat
+    start_date: date
+    end_date: date
+    student_id: Optional[int] = None
+    status: Optional[AttendanceStatus] = None
+
+
+class ExportJob(BaseModel):
+    id: str
+    status: JobStatus
+    request: ExportJobCreate
+    progress: float
+    rows_written: int
+    rows_total: Optional[int] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    download_url: Optional[str] = None
+
+
+
+class ImportKind(str, Enum):
+    students = "students"
+    attendance = "attendance"
+
+
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+
+class ImportJob(BaseModel):
+    id: str
+    kind: ImportKind
+    filename: str
+    status: JobStatus
+    rows_read: int
+    students_created: int
+    students_matched: int
+    attendance_written: int
+    error_count: int
+    errors: List[ImportRowError]
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+
+class SyncStudent(BaseModel):
+    id: int
+    name: str
+
+
+class SyncAttendance(BaseModel):
+    id: int
+    student_id: int
+    status: AttendanceStatus
+    date: Optional[datetime] = None
+
+
+class SyncDeleted(BaseModel):
+    students: List[int] = []
+    attendance: List[int] = []
+
+
+class SyncBatch(BaseModel):
+    since: int
+    next: int  # send as `since` to get the following batch
+    has_more: bool
+    students: List[SyncStudent]
+    attendance: List[SyncAttendance]
+    deleted: SyncDeleted
+
+
+class SyncUploadRecord(BaseModel):
+    client_id: str  # generated by the client once per record and reused on retries
+    student_id: int
+    status: AttendanceStatus
+    date: Optional[datetime] = None
+
+
+class SyncUploadStatus(str, Enum):
+    applied = "applied"
+    duplicate = "duplicate"
+    rejected = "rejected"
+
+
+class SyncUploadResult(BaseModel):
+    client_id: str
+    result: SyncUploadStatus
+    id: Optional[int] = None  # the attendance record, once written
+    detail: Optional[str] = None
@@ -0,0 +1,148 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import case, func, literal, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from datetime import datetime
+from typing import Dict, List, Optional
+from models import Attendance, ClassSection, SectionMembership
+import archive
+from schemas import AttendanceStatus, AttendanceWriteResult, ClassSectionCreate, WriteAction
+from live_feed import publish_attendance_changes
+from streaks import refresh_streaks
+
+
+def get_section_by_id(db: Session, section_id: int) -> ClassSection:
+    """Get a class section by ID"""
+    return db.query(ClassSection).filter(ClassSection.id == section_id).first()
+
+
+def get_section_by_name(db: Session, name: str) -> ClassSection:
+    """Get a class section by name (case-insensitive exact match)"""
+    return db.query(ClassSection).filter(func.lower(ClassSection.name) == name.strip().lower()).first()
+
+
+def get_all_sections(db: Session) -> List[ClassSection]:
+    """Get all class sections"""
+    return db.query(ClassSection).order_by(ClassSection.name).all()
+
+
+def get_section_member_ids(db: Session, section_id: int) -> List[int]:
+    """Get the IDs of the students in a section"""
+    return [
+        student_id for (student_id,) in
+        db.query(SectionMembership.student_id).filter(SectionMembership.section_id == section_id)
+    ]
+
+
+def create_section(db: Session, section: ClassSectionCreate) -> ClassSection:
+    """Create a new class section"""
+    db_section = ClassSection(name=section.name.strip())
+    db.add(db_section)
+    db.commit()
+    db.refresh(db_section)
+    return db_section
+
+
+def add_section_members(db: Session, section_id: int, student_ids: List[int]) -> List[int]:
+    """Add students to a section, ignoring those already in it"""
+    if student_ids:
+        stmt = sqlite_insert(SectionMembership).values([
+            {"section_id": section_id, "student_id": student_id} for student_id in set(student_ids)
+        ]).on_conflict_do_nothing()
+        db.execute(stmt)
+        db.commit()
+    return get_section_member_ids(db, section_id)
+
+
+def remove_section_member(db: Session, section_id: int, student_id: int) -> bool:
+    """Remove a student from a section"""
+    removed = db.query(SectionMembership).filter(
+        SectionMembership.section_id == section_id,
+        SectionMembership.student_id == student_id
+    ).delete()
+    db.commit()
+    return bool(removed)
+
+
+def delete_section(db: Session, section_id: int) -> bool:
+    """Delete a section and its memberships (students are kept)"""
+    db_section = get_section_by_id(db, section_id)
+    if db_section:
+        db.query(SectionMembership).filter(SectionMembership.section_id == section_id).delete()
+        db.delete(db_section)
+        db.commit()
+        return True
+    return False
+
+
+def mark_section_attendance(
+    db: Session,
+    section_id: int,
+    status: AttendanceStatus,
+    date: Optional[datetime] = None,
+    exceptions: Optional[Dict[int, AttendanceStatus]] = None,
+) -> List[AttendanceWriteResult]:
+    """
+    Mark every student of a section for one day, with per-student exceptions
+
+    All rows are written by a single INSERT ... SELECT over the section's
+    memberships, upserting on (student_id, day) like the other write paths.
+    """
+    stamp = date or datetime.utcnow()
+    day = stamp.date()
+    exceptions = exceptions or {}
+
+    # Bind through the column types so the values are stored exactly as ORM writes store them
+    status_value = literal(AttendanceStatus(status).value, Attendance.status.type)
+    by_status = {}
+    for student_id, exception_status in exceptions.items():
+        by_status.setdefault(AttendanceStatus(exception_status).value, []).append(student_id)
+    status_column = case(
+        *[
+            (SectionMembership.student_id.in_(student_ids), literal(value, Attendance.status.type))
+            for value, student_ids in by_status.items()
+        ],
+        else_=status_value
+    ) if by_status else status_value
+
+    rows = select(
+        SectionMembership.student_id,
+        literal(stamp, Attendance.date.type),
+        literal(day, Attendance.day.type),
+        status_column,
+    ).where(SectionMembership.section_id == section_id)
+
+    if archive.is_archived(day):
+        # Archived records of the day come back live first, so they are updated in place
+        member_ids = db.scalars(
+            select(SectionMembership.student_id).where(SectionMembership.section_id == section_id)
+        )
+        archive.reopen_archived(db, [(student_id, day) for student_id in member_ids])
+    max_id = db.query(func.max(Attendance.id)).scalar() or 0
+    stmt = sqlite_insert(Attendance.__table__).from_select(["student_id", "date", "day", "status"], rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["student_id", "day"],
+        set_={"status": stmt.excluded.status, "date": stmt.excluded.date}
+    )
+    db.execute(stmt)
+
+    records = db.query(Attendance).join(
+        SectionMembership, SectionMembership.student_id == Attendance.student_id
+    ).filter(
+        SectionMembership.section_id == section_id,
+        Attendance.day == day
+    ).order_by(Attendance.student_id).all()
+    results = [
+        AttendanceWriteResult.model_validate({
+            "id": record.id,
+            "student_id": record.student_id,
+            "status": record.status,
+            "date": record.date,
+            "created_at": record.created_at,
+            "action": WriteAction.inserted if record.id > max_id else WriteAction.updated,
+        })
+        for record in records
+    ]
+    refresh_streaks(db, [record.student_id for record in records])
+    db.commit()
+    publish_attendance_changes(db, [(result.action.value, result, day) for result in results])
+    return results
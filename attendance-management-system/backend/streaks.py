@@ -0,0 +1,218 @@
+import argparse
+import os
+import sys
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+import archive
+from models import Attendance, AttendanceStreak, Student
+from schemas import AttendanceStatus, FlaggedStudent, StreakFlag
+
+STREAK_THRESHOLD = int(os.environ.get("STREAK_THRESHOLD", 3))
+DROP_THRESHOLD = float(os.environ.get("ATTENDANCE_DROP_THRESHOLD", 0.3))
+DROP_MIN_RECORDS = int(os.environ.get("ATTENDANCE_DROP_MIN_RECORDS", 5))
+RATE_WINDOW_DAYS = 30
+# A student's state depends only on their records in the two rate windows up
+# to their last recorded day; absence runs are counted within it too
+LOOKBACK_DAYS = 2 * RATE_WINDOW_DAYS
+# Student ids per query, under SQLite's bound parameter limit
+BATCH_SIZE = 500
+
+STATE_COLUMNS = (
+    "last_day", "last_status", "absence_run", "absence_run_start",
+    "records_30d", "rate_30d", "previous_rate_30d", "flagged",
+)
+
+
+def _flags(absence_run: int, records_30d: int, rate_30d: float, previous_rate_30d: Optional[float]) -> List[StreakFlag]:
+    flags = []
+    if absence_run >= STREAK_THRESHOLD:
+        flags.append(StreakFlag.absence_streak)
+    if (previous_rate_30d is not None and records_30d >= DROP_MIN_RECORDS
+            and previous_rate_30d - rate_30d >= DROP_THRESHOLD):
+        flags.append(StreakFlag.attendance_drop)
+    return flags
+
+
+def compute_streak(records: List[Tuple[date, str]]) -> Optional[dict]:
+    """
+    Compute a student's streak state from their records, newest first
+
+    Only records within LOOKBACK_DAYS of the newest one are looked at, so
+    the state is the same whether the caller passes the whole history or
+    just the lookback window. Returns None for a student with no records.
+    """
+    if not records:
+        return None
+    last_day, last_status = records[0]
+    window_start = last_day - timedelta(days=RATE_WINDOW_DAYS - 1)
+    lookback_start = last_day - timedelta(days=LOOKBACK_DAYS - 1)
+
+    absence_run, absence_run_start = 0, None
+    recent, previous = [], []
+    in_run = True
+    for day, status in records:
+        if day < lookback_start:
+            break
+        if in_run and status == AttendanceStatus.absent.value:
+            absence_run += 1
+            absence_run_start = day
+        else:
+            in_run = False
+        (recent if day >= window_start else previous).append(status)
+
+    def present_rate(statuses: list) -> float:
+        return round(sum(1 for status in statuses if status == AttendanceStatus.present.value) / len(statuses), 4)
+
+    rate_30d = present_rate(recent)
+    previous_rate_30d = present_rate(previous) if len(previous) >= DROP_MIN_RECORDS else None
+    return {
+        "last_day": last_day,
+        "last_status": last_status,
+        "absence_run": absence_run,
+        "absence_run_start": absence_run_start,
+        "records_30d": len(recent),
+        "rate_30d": rate_30d,
+        "previous_rate_30d": previous_rate_30d,
+        "flagged": bool(_flags(absence_run, len(recent), rate_30d, previous_rate_30d)),
+    }
+
+
+def _histories(db: Session, student_ids: List[int], since: Optional[date]) -> Dict[int, List[Tuple[date, str]]]:
+    """Records of the students from `since` on, live and archived, newest first per student"""
+    histories = {student_id: {} for student_id in student_ids}
+    archived = archive.read_archive(start=since, columns=["student_id", "day", "status"], student_ids=student_ids)
+    for row in archived.to_pylist():
+        histories[row["student_id"]][row["day"]] = row["status"]
+    query = select(Attendance.student_id, Attendance.day, Attendance.status).where(
+        Attendance.student_id.in_(student_ids)
+    )
+    if since:
+        query = query.where(Attendance.day >= since)
+    # Live rows win over archived copies of the same day
+    for student_id, day, status in db.execute(query):
+        histories[student_id][day] = status
+    return {
+        student_id: sorted(days.items(), reverse=True)
+        for student_id, days in histories.items()
+    }
+
+
+def _write_states(db: Session, states: Dict[int, Optional[dict]]):
+    """Upsert the computed states; students without records lose their row"""
+    rows = [{"student_id": student_id, **state} for student_id, state in states.items() if state]
+    empty = [student_id for student_id, state in states.items() if not state]
+    if rows:
+        stmt = sqlite_insert(AttendanceStreak).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[AttendanceStreak.student_id],
+            set_={column: stmt.excluded[column] for column in STATE_COLUMNS}
+        )
+        db.execute(stmt)
+    if empty:
+        db.execute(delete(AttendanceStreak).where(AttendanceStreak.student_id.in_(empty)))
+
+
+def refresh_streaks(db: Session, student_ids: Iterable[int]):
+    """
+    Recompute the streak state of students whose attendance just changed
+
+    Call inside the write's transaction, before commit. Each student's
+    records are read back only as far as LOOKBACK_DAYS before their last
+    recorded day, so the cost depends on the number of students touched,
+    not on the length of their histories.
+    """
+    db.flush()
+    student_ids = sorted(set(student_ids))
+    for offset in range(0, len(student_ids), BATCH_SIZE):
+        batch = student_ids[offset:offset + BATCH_SIZE]
+        last_days = dict(db.execute(
+            select(Attendance.student_id, func.max(Attendance.day))
+            .where(Attendance.student_id.in_(batch))
+            .group_by(Attendance.student_id)
+        ).all())
+        # Students whose live rows are all gone fall back to their whole (archived) history
+        since = None
+        if len(last_days) == len(batch):
+            since = min(last_days.values()) - timedelta(days=LOOKBACK_DAYS - 1)
+        histories = _histories(db, batch, since)
+        _write_states(db, {student_id: compute_streak(histories[student_id]) for student_id in batch})
+
+
+def get_flagged_students(db: Session) -> List[FlaggedStudent]:
+    """List flagged students, longest absence run first; reads only the flagged rows"""
+    rows = db.execute(
+        select(AttendanceStreak, Student.name)
+        .join(Student, Student.id == AttendanceStreak.student_id)
+        .where(AttendanceStreak.flagged.is_(True))
+    ).all()
+    flagged = [
+        FlaggedStudent(
+            student_id=streak.student_id,
+            student_name=name,
+            flags=_flags(streak.absence_run, streak.records_30d, streak.rate_30d, streak.previous_rate_30d),
+            last_day=streak.last_day,
+            last_status=streak.last_status,
+            absence_run=streak.absence_run,
+            absence_run_start=streak.absence_run_start,
+            rate_30d=streak.rate_30d,
+            previous_rate_30d=streak.previous_rate_30d,
+        )
+        for streak, name in rows
+    ]
+    flagged.sort(key=lambda student: (-student.absence_run, student.rate_30d))
+    return flagged
+
+
+def recompute_all(db: Session, check: bool = False) -> List[tuple]:
+    """
+    Recompute every student's streak state from their full history
+
+    With check=True nothing is written; returns (student id, stored,
+    recomputed) for every student whose stored state differs. Otherwise
+    the table is rewritten and the differences it fixed are returned.
+    """
+    student_ids = [student_id for (student_id,) in db.execute(select(Student.id).order_by(Student.id))]
+    stored = {
+        streak.student_id: {column: getattr(streak, column) for column in STATE_COLUMNS}
+        for streak in db.scalars(select(AttendanceStreak))
+    }
+    differences = []
+    for offset in range(0, len(student_ids), BATCH_SIZE):
+        batch = student_ids[offset:offset + BATCH_SIZE]
+        histories = _histories(db, batch, None)
+        states = {student_id: compute_streak(histories[student_id]) for student_id in batch}
+        for student_id, state in states.items():
+            if stored.get(student_id) != state:
+                differences.append((student_id, stored.get(student_id), state))
+        if not check:
+            _write_states(db, states)
+    if not check:
+        # Rows of students that no longer exist
+        db.execute(delete(AttendanceStreak).where(AttendanceStreak.student_id.not_in(student_ids)))
+        db.commit()
+    return differences
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Recompute absence streaks and attendance drop flags from scratch")
+    parser.add_argument("--check", action="store_true", help="Only compare with the stored state; exit 1 on differences")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        differences = recompute_all(db, check=args.check)
+    finally:
+        db.close()
+    for student_id, stored, recomputed in differences[:50]:
+        print(f"student {student_id}: stored {stored}, recomputed {recomputed}")
+    verb = "differ" if args.check else "fixed"
+    print(f"{len(differences)} students {verb}")
+    if args.check and differences:
+        sys.exit(1)
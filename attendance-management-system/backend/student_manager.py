@@ -1,7 +1,8 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
-from models import Student
+from models import Student, SectionMembership, AttendanceStreak
 from schemas import StudentCreate, StudentUpdate
+from name_index import student_names
 
 
 def get_student_by_id(db: Session, student_id: int) -> Student:
@@ -25,6 +26,7 @@ def create_student(db: Session, student: StudentCreate) -> Student:
     db.add(db_student)
     db.commit()
     db.refresh(db_student)
+    student_names.add(db_student.id, db_student.name)
     return db_student
 
 
@@ -35,6 +37,7 @@ def update_student(db: Session, student_id: int, student_update: StudentUpdate)
         db_student.name = student_update.name
         db.commit()
         db.refresh(db_student)
+        student_names.add(db_student.id, db_student.name)
     return db_student
 
 
@@ -42,8 +45,11 @@ def delete_student(db: Session, student_id: int) -> bool:
     """Delete a student by ID"""
     db_student = get_student_by_id(db, student_id)
     if db_student:
+        db.query(SectionMembership).filter(SectionMembership.student_id == student_id).delete()
+        db.query(AttendanceStreak).filter(AttendanceStreak.student_id == student_id).delete()
         db.delete(db_student)
         db.commit()
+        student_names.remove(student_id)
         return True
     return False
 
@@ -0,0 +1,169 @@
+import os
+from datetime import datetime, timedelta
+from typing import List
+
+from sqlalchemy import delete, select, text, tuple_
+from sqlalchemy.orm import Session
+
+from attendance_manager import upsert_attendance_records
+from models import Attendance, Student, SyncChange, SyncUpload, SYNC_ENTITIES
+from schemas import (
+    AttendanceCreate,
+    SyncAttendance,
+    SyncBatch,
+    SyncDeleted,
+    SyncStudent,
+    SyncUploadRecord,
+    SyncUploadResult,
+    SyncUploadStatus,
+)
+
+SYNC_BATCH_SIZE = int(os.environ.get("SYNC_BATCH_SIZE", 1000))
+SYNC_UPLOAD_RETENTION_DAYS = int(os.environ.get("SYNC_UPLOAD_RETENTION_DAYS", 30))
+# Ids per IN (...) list, under SQLite's bound parameter limit
+ID_CHUNK_SIZE = 500
+
+ENTITY_NAMES = {code: name for name, code in SYNC_ENTITIES.items()}
+
+
+def _change_triggers(table: str) -> List[str]:
+    """Triggers replacing a row's sync_changes entry on every insert, update and delete"""
+    code = SYNC_ENTITIES[table]
+    # Delete then insert rather than INSERT OR REPLACE, which an outer
+    # INSERT OR IGNORE would turn into OR IGNORE and so keep the old seq
+    return [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS sync_{table}_{event.lower()} AFTER {event} ON {table}
+        BEGIN
+            DELETE FROM sync_changes WHERE entity = {code} AND entity_id = {row}.id;
+            INSERT INTO sync_changes (entity, entity_id, deleted) VALUES ({code}, {row}.id, {deleted});
+        END
+        """
+        for event, row, deleted in (("INSERT", "NEW", 0), ("UPDATE", "NEW", 0), ("DELETE", "OLD", 1))
+    ]
+
+
+def install_change_tracking(conn):
+    """Create the triggers and log the rows that exist already, oldest first"""
+    for table, code in SYNC_ENTITIES.items():
+        for trigger in _change_triggers(table):
+            conn.execute(text(trigger))
+        conn.execute(text(f"""
+            INSERT INTO sync_changes (entity, entity_id, deleted)
+            SELECT {code}, id, 0 FROM {table}
+            WHERE id NOT IN (SELECT entity_id FROM sync_changes WHERE entity = {code})
+            ORDER BY id
+        """))
+
+
+def _chunks(values: list, size: int = ID_CHUNK_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def get_changes(db: Session, since: int = 0, limit: int = SYNC_BATCH_SIZE) -> SyncBatch:
+    """
+    Get the students and attendance records changed after `since`, in seq order
+
+    Each changed row appears once with its current values, deleted rows as
+    ids under `deleted`. A client applies the batch and asks again with
+    `next` until `has_more` is false; `since=0` returns everything.
+    """
+    changes = db.execute(
+        select(SyncChange.seq, SyncChange.entity, SyncChange.entity_id, SyncChange.deleted)
+        .where(SyncChange.seq > since).order_by(SyncChange.seq).limit(limit + 1)
+    ).all()
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    changed = {"students": [], "attendance": []}
+    deleted = SyncDeleted()
+    for _, entity, entity_id, is_deleted in changes:
+        name = ENTITY_NAMES[entity]
+        (getattr(deleted, name) if is_deleted else changed[name]).append(entity_id)
+
+    students, attendance = {}, {}
+    for ids in _chunks(changed["students"]):
+        for student_id, name in db.execute(select(Student.id, Student.name).where(Student.id.in_(ids))):
+            students[student_id] = SyncStudent(id=student_id, name=name)
+    for ids in _chunks(changed["attendance"]):
+        for row in db.execute(
+            select(Attendance.id, Attendance.student_id, Attendance.status, Attendance.date)
+            .where(Attendance.id.in_(ids))
+        ).mappings():
+            attendance[row["id"]] = SyncAttendance(**row)
+
+    # A row deleted after its change was read is reported as a tombstone;
+    # its own tombstone follows in a later batch anyway
+    deleted.students += [student_id for student_id in changed["students"] if student_id not in students]
+    deleted.attendance += [record_id for record_id in changed["attendance"] if record_id not in attendance]
+    return SyncBatch(
+        since=since,
+        next=changes[-1].seq if changes else since,
+        has_more=has_more,
+        students=[students[student_id] for student_id in changed["students"] if student_id in students],
+        attendance=[attendance[record_id] for record_id in changed["attendance"] if record_id in attendance],
+        deleted=deleted,
+    )
+
+
+def apply_uploads(db: Session, uploads: List[SyncUploadRecord]) -> List[SyncUploadResult]:
+    """
+    Write attendance marked offline, skipping records already received
+
+    Each record carries a client id; records whose id was received before
+    (within SYNC_UPLOAD_RETENTION_DAYS) are reported as duplicates rather
+    than written again, so a client can safely resend a batch after losing
+    the response. New records are upserted in one transaction together
+    with their client ids; the last write for a student and day wins, as
+    for any other write.
+    """
+    now = datetime.utcnow()
+    client_ids = list({upload.client_id for upload in uploads})
+    received = {}
+    for ids in _chunks(client_ids):
+        for client_id, student_id, day in db.execute(
+            select(SyncUpload.client_id, SyncUpload.student_id, SyncUpload.day).where(SyncUpload.client_id.in_(ids))
+        ):
+            received[client_id] = (student_id, day)
+    student_ids = list({upload.student_id for upload in uploads})
+    known = set()
+    for ids in _chunks(student_ids):
+        known.update(student_id for (student_id,) in db.execute(select(Student.id).where(Student.id.in_(ids))))
+
+    results, records, keys = [], [], {}
+    for upload in uploads:
+        if upload.client_id in received or upload.client_id in keys:
+            results.append(SyncUploadResult(client_id=upload.client_id, result=SyncUploadStatus.duplicate))
+        elif upload.student_id not in known:
+            results.append(SyncUploadResult(
+                client_id=upload.client_id, result=SyncUploadStatus.rejected, detail="Student not found"
+            ))
+        else:
+            record_date = upload.date or now
+            keys[upload.client_id] = (upload.student_id, record_date.date())
+            records.append(AttendanceCreate(student_id=upload.student_id, status=upload.status, date=record_date))
+            results.append(SyncUploadResult(client_id=upload.client_id, result=SyncUploadStatus.applied))
+
+    if records:
+        db.execute(delete(SyncUpload).where(
+            SyncUpload.received_at < now - timedelta(days=SYNC_UPLOAD_RETENTION_DAYS)
+        ))
+        db.add_all(SyncUpload(client_id=client_id, student_id=student_id, day=day)
+                   for client_id, (student_id, day) in keys.items())
+        # The client ids are flushed and committed by the upsert's commit
+        upsert_attendance_records(db, records)
+
+    # Report the record each applied or duplicate upload now maps to
+    lookups = {**received, **keys}
+    ids = {}
+    for chunk in _chunks(list(set(lookups.values()))):
+        for record_id, student_id, day in db.execute(
+            select(Attendance.id, Attendance.student_id, Attendance.day)
+            .where(tuple_(Attendance.student_id, Attendance.day).in_(chunk))
+        ):
+            ids[(student_id, day)] = record_id
+    for result in results:
+        if result.client_id in lookups:
+            result.id = ids.get(lookups[result.client_id])
+    return results
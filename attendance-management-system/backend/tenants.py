@@ -0,0 +1,129 @@
+import argparse
+import json
+import os
+import re
+from typing import Optional
+
+from jose import JWTError, jwt
+
+from auth import ALGORITHM, SECRET_KEY
+from database import current_tenant, tenant_engines
+
+# Serve each school from its own database, chosen per request; off, every
+# request uses the default database
+MULTI_TENANT = os.environ.get("MULTI_TENANT", "").lower() in ("1", "true", "yes")
+# With TENANT_BASE_DOMAIN=attendance.example.com, greenfield.attendance.example.com is tenant "greenfield"
+TENANT_BASE_DOMAIN = os.environ.get("TENANT_BASE_DOMAIN", "").lower().strip(".")
+# Comma-separated tenants allowed to open a database, created on first use;
+# empty allows only tenants whose database already exists (see create_tenant)
+TENANTS = frozenset(name.strip() for name in os.environ.get("TENANTS", "").split(",") if name.strip())
+
+# Tenant names become file names, so they are kept to lowercase letters, digits and dashes
+TENANT_NAME_PATTERN = re.compile(r"^[a-z0-9][a-z0-9-]{0,62}$")
+
+
+def _tenant_from_host(host: str) -> Optional[str]:
+    hostname = host.rsplit(":", 1)[0].lower()
+    suffix = f".{TENANT_BASE_DOMAIN}"
+    if TENANT_BASE_DOMAIN and hostname.endswith(suffix):
+        return hostname[:-len(suffix)] or None
+    return None
+
+
+def _tenant_from_token(authorization: str) -> Optional[str]:
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        # An invalid token names no tenant; the route's authentication rejects it
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("tenant")
+    except JWTError:
+        return None
+
+
+def resolve_tenant(headers: dict) -> Optional[str]:
+    """
+    The tenant a request names, from the first of: an X-Tenant header, the
+    subdomain under TENANT_BASE_DOMAIN, or the "tenant" claim of its bearer token
+    """
+    tenant = headers.get(b"x-tenant", b"").decode("latin-1").strip().lower()
+    if not tenant:
+        tenant = _tenant_from_host(headers.get(b"host", b"").decode("latin-1"))
+    if not tenant:
+        tenant = _tenant_from_token(headers.get(b"authorization", b"").decode("latin-1"))
+    return tenant or None
+
+
+class UnknownTenant(Exception):
+    """Raised for a tenant name that is malformed or not allowed"""
+
+
+def check_tenant(tenant: str) -> str:
+    if not TENANT_NAME_PATTERN.match(tenant):
+        raise UnknownTenant(f"Invalid tenant name {tenant!r}")
+    allowed = tenant in TENANTS if TENANTS else tenant_engines.exists(tenant)
+    if not allowed:
+        raise UnknownTenant(f"Unknown tenant {tenant!r}")
+    return tenant
+
+
+def create_tenant(tenant: str) -> bool:
+    """Create a tenant's database and migrate it; returns False if it already existed"""
+    if not TENANT_NAME_PATTERN.match(tenant):
+        raise UnknownTenant(f"Invalid tenant name {tenant!r}")
+    existed = tenant_engines.exists(tenant)
+    tenant_engines.get(tenant)
+    return not existed
+
+
+class TenantMiddleware:
+    """
+    ASGI middleware routing each request to its tenant's database
+
+    Resolves the tenant (resolve_tenant) and sets database.current_tenant
+    for the rest of the request, so get_db and everything keyed by tenant
+    (data versions, caches, the name index, the live feed) use that school's
+    data. A request naming no tenant uses the default database; one naming
+    an invalid, disallowed or (without TENANTS) not yet created tenant gets
+    a 404, so requests cannot create databases.
+    """
+
+    def __init__(self, app, enabled: bool = MULTI_TENANT):
+        self.app = app
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        tenant = resolve_tenant(dict(scope.get("headers") or []))
+        if tenant is not None:
+            try:
+                check_tenant(tenant)
+            except UnknownTenant as e:
+                body = json.dumps({"detail": str(e)}).encode()
+                await send({"type": "http.response.start", "status": 404,
+                            "headers": [(b"content-type", b"application/json"),
+                                        (b"content-length", str(len(body)).encode())]})
+                return await send({"type": "http.response.body", "body": body})
+
+        token = current_tenant.set(tenant)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_tenant.reset(token)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create school databases for multi-tenant deployments")
+    parser.add_argument("tenants", nargs="+", help="tenant names to create")
+    args = parser.parse_args()
+
+    try:
+        for name in args.tenants:
+            try:
+                print(f"{name}: {'created' if create_tenant(name) else 'already exists, migrated'}")
+            except UnknownTenant as e:
+                parser.error(str(e))
+    finally:
+        tenant_engines.close_all()
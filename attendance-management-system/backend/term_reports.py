@@ -0,0 +1,263 @@
+import argparse
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, date
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from openpyxl import Workbook
+from sqlalchemy import select
+from sqlalchemy.orm import Session, sessionmaker
+
+import archive
+from database import DATABASE_URL, make_read_engine
+from models import Attendance, ClassSection, SectionMembership, Student
+from schemas import AttendanceStatus
+
+REPORT_WORKERS = int(os.environ.get("REPORT_WORKERS", os.cpu_count() or 1))
+# Students per task: large enough to amortize the queries, small enough to balance the pool
+REPORT_PARTITION_SIZE = int(os.environ.get("REPORT_PARTITION_SIZE", 100))
+
+REPORT_KINDS = ("student", "section")
+STATUS_MARKS = {
+    AttendanceStatus.present.value: "P",
+    AttendanceStatus.absent.value: "A",
+    AttendanceStatus.late.value: "L",
+}
+SUMMARY_COLUMNS = ["Student", "Present", "Absent", "Late", "Total", "Percentage"]
+
+# Set in each pool process by _init_worker
+_worker_sessions = None
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-") or "unnamed"
+
+
+def _report_units(db: Session, kind: str) -> List[tuple]:
+    """List (unit id, unit name, [(student id, student name), ...]) for every report to write"""
+    if kind == "student":
+        return [
+            (student_id, name, [(student_id, name)])
+            for student_id, name in db.query(Student.id, Student.name).order_by(Student.id)
+        ]
+
+    members = {}
+    for section_id, student_id, name in db.query(
+        SectionMembership.section_id, Student.id, Student.name
+    ).join(Student, Student.id == SectionMembership.student_id).order_by(Student.name):
+        members.setdefault(section_id, []).append((student_id, name))
+    return [
+        (section_id, name, members.get(section_id, []))
+        for section_id, name in db.query(ClassSection.id, ClassSection.name).order_by(ClassSection.name)
+    ]
+
+
+def _partition(units: List[tuple], size: int) -> List[List[tuple]]:
+    """Group report units into tasks of about `size` students each"""
+    partitions, current, students = [], [], 0
+    for unit in units:
+        current.append(unit)
+        students += max(1, len(unit[2]))
+        if students >= size:
+            partitions.append(current)
+            current, students = [], 0
+    if current:
+        partitions.append(current)
+    return partitions
+
+
+def _statuses(db: Session, student_ids: List[int], start: date, end: date) -> Dict[int, Dict[date, str]]:
+    """Map student id -> day -> status over the range, from the live table and the archive"""
+    statuses = {student_id: {} for student_id in student_ids}
+    archived = archive.read_archive(
+        start=start, end=end, columns=["student_id", "day", "status"], student_ids=student_ids
+    )
+    for row in archived.to_pylist():
+        statuses[row["student_id"]][row["day"]] = row["status"]
+    query = select(Attendance.student_id, Attendance.day, Attendance.status).where(
+        Attendance.student_id.in_(student_ids), Attendance.day >= start, Attendance.day <= end
+    )
+    for student_id, day, status in db.execute(query):
+        statuses[student_id][day] = status
+    return statuses
+
+
+def _write_report(path: Path, title: str, students: List[tuple], statuses: Dict[int, Dict[date, str]],
+                  start: date, end: date):
+    """Write one workbook: per-student totals and percentage, and a day-by-student grid"""
+    workbook = Workbook(write_only=True)
+
+    summary = workbook.create_sheet("Summary")
+    summary.append([title])
+    summary.append([f"{start.isoformat()} to {end.isoformat()}"])
+    summary.append([])
+    summary.append(SUMMARY_COLUMNS)
+    for student_id, name in students:
+        days = statuses[student_id].values()
+        present = sum(1 for status in days if status == AttendanceStatus.present.value)
+        absent = sum(1 for status in days if status == AttendanceStatus.absent.value)
+        late = sum(1 for status in days if status == AttendanceStatus.late.value)
+        total = len(days)
+        summary.append([name, present, absent, late, total, round(present / total * 100, 2) if total else 0.0])
+
+    grid = workbook.create_sheet("Daily")
+    grid.append(["Date"] + [name for _, name in students])
+    all_days = sorted({day for student_id, _ in students for day in statuses[student_id]})
+    for day in all_days:
+        grid.append([day.isoformat()] + [
+            STATUS_MARKS.get(statuses[student_id].get(day), "") for student_id, _ in students
+        ])
+
+    workbook.save(path)
+
+
+def _init_worker(database_url: str):
+    """Give the pool process its own read-only connection"""
+    global _worker_sessions
+    _worker_sessions = sessionmaker(bind=make_read_engine(database_url, pool_size=1))
+
+
+def _render_partition(kind: str, units: List[tuple], start: date, end: date, out_dir: str) -> dict:
+    """Write the reports of one partition; returns its timing for the throughput summary"""
+    started = time.perf_counter()
+    db = _worker_sessions()
+    try:
+        student_ids = sorted({student_id for _, _, students in units for student_id, _ in students})
+        statuses = _statuses(db, student_ids, start, end) if student_ids else {}
+    finally:
+        db.close()
+
+    for unit_id, name, students in units:
+        path = Path(out_dir) / f"{kind}-{unit_id:05d}-{_slug(name)}.xlsx"
+        _write_report(path, name, students, statuses, start, end)
+    return {
+        "pid": os.getpid(),
+        "reports": len(units),
+        "rows": sum(len(days) for days in statuses.values()),
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def generate_term_reports(
+    start: date,
+    end: date,
+    output: Path,
+    kind: str = "student",
+    workers: int = REPORT_WORKERS,
+    database_url: str = DATABASE_URL,
+    partition_size: int = REPORT_PARTITION_SIZE,
+    progress: Optional[Callable[[dict], None]] = None,
+) -> dict:
+    """
+    Write one Excel report per student or class section for a term
+
+    The report units are split into partitions of about partition_size
+    students, and a process pool renders them, each process reading
+    through its own read-only connection. An output path ending in .zip
+    gets a zip of the reports, anything else is used as a directory.
+    Returns totals and per-worker timing; `progress` gets each finished
+    partition's timing.
+    """
+    if kind not in REPORT_KINDS:
+        raise ValueError(f"Unknown report kind: {kind}")
+    started = time.perf_counter()
+
+    read_engine = make_read_engine(database_url, pool_size=1)
+    db = sessionmaker(bind=read_engine)()
+    try:
+        units = _report_units(db, kind)
+    finally:
+        db.close()
+        read_engine.dispose()
+    partitions = _partition(units, partition_size)
+
+    output = Path(output)
+    to_zip = output.suffix.lower() == ".zip"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    out_dir = Path(tempfile.mkdtemp(dir=output.parent)) if to_zip else output
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    results = []
+    try:
+        if workers <= 1:
+            _init_worker(database_url)
+            for units_part in partitions:
+                results.append(_render_partition(kind, units_part, start, end, str(out_dir)))
+                if progress:
+                    progress(results[-1])
+        else:
+            # spawn rather than fork, as for imports: the server runs threads
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(
+                max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(database_url,)
+            ) as pool:
+                futures = [
+                    pool.submit(_render_partition, kind, units_part, start, end, str(out_dir))
+                    for units_part in partitions
+                ]
+                for future in as_completed(futures):
+                    results.append(future.result())
+                    if progress:
+                        progress(results[-1])
+
+        if to_zip:
+            # Workbooks are already deflated, so store them as they are
+            tmp_path = output.with_suffix(".zip.part")
+            with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_STORED) as bundle:
+                for path in sorted(out_dir.iterdir()):
+                    bundle.write(path, path.name)
+            os.replace(tmp_path, output)
+    finally:
+        if to_zip:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+    per_worker = {}
+    for result in results:
+        worker = per_worker.setdefault(result["pid"], {"tasks": 0, "reports": 0, "rows": 0, "seconds": 0.0})
+        worker["tasks"] += 1
+        worker["reports"] += result["reports"]
+        worker["rows"] += result["rows"]
+        worker["seconds"] += result["seconds"]
+    return {
+        "reports": sum(result["reports"] for result in results),
+        "rows": sum(result["rows"] for result in results),
+        "partitions": len(partitions),
+        "seconds": time.perf_counter() - started,
+        "workers": per_worker,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write term attendance reports for every student or class section")
+    parser.add_argument("start", help="First day of the term (YYYY-MM-DD)")
+    parser.add_argument("end", help="Last day of the term (YYYY-MM-DD)")
+    parser.add_argument("output", help="Output directory, or a .zip file")
+    parser.add_argument("--by", choices=REPORT_KINDS, default="student", help="One report per student or per section")
+    parser.add_argument("--workers", type=int, default=REPORT_WORKERS)
+    parser.add_argument("--partition-size", type=int, default=REPORT_PARTITION_SIZE)
+    args = parser.parse_args()
+
+    start = datetime.strptime(args.start, "%Y-%m-%d").date()
+    end = datetime.strptime(args.end, "%Y-%m-%d").date()
+    done = [0]
+
+    def report(result: dict):
+        done[0] += result["reports"]
+        print(f"{done[0]} reports written (worker {result['pid']}: {result['reports']} in {result['seconds']:.1f}s)")
+
+    stats = generate_term_reports(
+        start, end, Path(args.output), kind=args.by, workers=args.workers,
+        partition_size=args.partition_size, progress=report
+    )
+    print(f"{stats['reports']} reports from {stats['rows']} attendance rows in {stats['seconds']:.1f}s "
+          f"({stats['reports'] / stats['seconds']:.1f} reports/s, {stats['partitions']} partitions)")
+    for pid, worker in sorted(stats["workers"].items()):
+        print(f"  worker {pid}: {worker['tasks']} tasks, {worker['reports']} reports, "
+              f"{worker['rows']} rows, {worker['seconds']:.1f}s busy")
@@ -0,0 +1,49 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Point every database, spool and cache at a throwaway directory before the
+# application modules read their settings at import time
+_workdir = Path(tempfile.mkdtemp(prefix="attendance-tests-"))
+atexit.register(shutil.rmtree, _workdir, ignore_errors=True)
+os.environ["DATABASE_URL"] = f"sqlite:///{_workdir / 'attendance.db'}"
+os.environ["ATTENDANCE_ARCHIVE_DIR"] = str(_workdir / "archive")
+os.environ["REPORT_CACHE_DIR"] = str(_workdir / "report_cache")
+os.environ["EXPORT_SPOOL_DIR"] = str(_workdir / "export_spool")
+os.environ["TENANT_DIR"] = str(_workdir / "tenants")
+os.environ["PROFILE_DIR"] = str(_workdir / "profiles")
+os.environ["WRITE_BEHIND_JOURNAL"] = str(_workdir / "checkins.journal")
+os.environ.setdefault("GROQ_API_KEY", "test")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database import SessionLocal, engine  # noqa: E402
+from migrations import bootstrap_schema  # noqa: E402
+from models import AttendanceStatusCode, Base  # noqa: E402
+from name_index import student_names  # noqa: E402
+
+bootstrap_schema(engine)
+
+
+@pytest.fixture
+def archive_dir() -> Path:
+    return Path(os.environ["ATTENDANCE_ARCHIVE_DIR"])
+
+
+@pytest.fixture
+def db(archive_dir):
+    """A session on an emptied database and archive"""
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            if table.name != AttendanceStatusCode.__tablename__:
+                conn.execute(table.delete())
+    shutil.rmtree(archive_dir, ignore_errors=True)
+    student_names.drop(None)
+    session = SessionLocal()
+    yield session
+    session.close()
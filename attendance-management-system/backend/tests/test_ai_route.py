@@ -0,0 +1,86 @@
+from fastapi.testclient import TestClient
+
+import ai_parser
+from database import engine, read_engine
+from main import app
+from models import Attendance, ClassSection, SectionMembership, Student
+
+client = TestClient(app)
+
+
+def _section(db, names, outsiders=()):
+    db.add_all([Student(name=name) for name in [*names, *outsiders]])
+    db.add(ClassSection(name="7A"))
+    db.commit()
+    db.add_all([SectionMembership(section_id=1, student_id=index + 1) for index in range(len(names))])
+    db.commit()
+
+
+def _statuses(db) -> dict:
+    return {record.student_id: record.status for record in db.query(Attendance)}
+
+
+def test_section_exception_matches_the_whole_name(db):
+    _section(db, ["Mark Ali", "Ali", "Sara"])
+
+    response = client.post("/attendance/ai", json={"command": "Everyone in 7A is present except Ali who is absent"})
+
+    assert response.status_code == 200
+    assert _statuses(db) == {1: "Present", 2: "Absent", 3: "Present"}
+
+
+def test_section_exception_resolves_among_members_only(db):
+    _section(db, ["Ali Khan", "Sara"], outsiders=["Ali Raza"])
+
+    response = client.post("/attendance/ai", json={"command": "Everyone in 7A is present except Ali who is absent"})
+
+    assert response.status_code == 200
+    assert _statuses(db) == {1: "Absent", 2: "Present"}
+
+
+def test_ambiguous_section_exception_writes_nothing(db):
+    _section(db, ["Ali Khan", "Ali Raza", "Sara"])
+
+    response = client.post("/attendance/ai", json={"command": "Everyone in 7A is present except Ali who is absent"})
+
+    assert response.status_code == 409
+    assert {candidate["name"] for candidate in response.json()["detail"]["ambiguous"][0]["candidates"]} == \
+        {"Ali Khan", "Ali Raza"}
+    assert _statuses(db) == {}
+
+
+def test_weak_single_candidate_is_not_reported_as_ambiguous(db):
+    _section(db, ["Bilal Ahmed", "Sara"])
+
+    response = client.post("/attendance/ai", json={"command": "Everyone in 7A is present except Bilaal Ahmadd Khan"})
+
+    assert response.status_code == 409
+    assert response.json()["detail"]["message"] == "No confident match for some names"
+
+
+def test_student_named_with_their_section_is_not_a_whole_class_command(db):
+    _section(db, ["Ali", "Sara", "Bilal"])
+
+    response = client.post("/attendance/ai", json={"command": "Ali from class 7A is absent"})
+
+    assert response.status_code == 200
+    assert _statuses(db) == {1: "Absent"}
+
+
+def test_no_connection_is_held_during_the_llm_call(db, monkeypatch):
+    _section(db, ["Ali", "Sara"])
+    checked_out = []
+
+    def slow_llm(command, deadline):
+        checked_out.append((engine.pool.checkedout(), read_engine.pool.checkedout()))
+        return None
+
+    monkeypatch.setattr(ai_parser, "client", object())
+    monkeypatch.setattr(ai_parser, "_call_llm", slow_llm)
+    # The test's own session holds no connection between its queries
+    db.commit()
+
+    response = client.post("/attendance/ai", json={"command": "Zed is absent"})
+
+    assert response.status_code == 200
+    assert checked_out == [(0, 0)]
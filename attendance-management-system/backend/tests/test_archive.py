@@ -0,0 +1,172 @@
+from datetime import date, datetime
+
+from fastapi.testclient import TestClient
+
+import archive
+from attendance_manager import (
+    calculate_attendance_percentage, delete_attendance_record, iter_attendance_by_student, update_attendance_record,
+    upsert_attendance_records,
+)
+from models import Attendance, ClassSection, SectionMembership, Student, SyncChange, SYNC_ENTITIES
+from main import app
+from schemas import AttendanceCreate, AttendanceStatus, AttendanceUpdate, WriteAction
+from section_manager import mark_section_attendance
+from utils.reporting import count_attendance_rows, get_attendance_summary
+
+
+def _mark(db, student_id: int, day: date, status: AttendanceStatus):
+    return upsert_attendance_records(db, [AttendanceCreate(
+        student_id=student_id, status=status, date=datetime.combine(day, datetime.min.time()).replace(hour=8)
+    )])[0]
+
+
+def _archived(archive_dir) -> list:
+    return archive.read_archive(archive_dir=archive_dir).to_pylist()
+
+
+def test_archiving_moves_closed_months(db, archive_dir):
+    db.add(Student(name="Ali"))
+    db.commit()
+    _mark(db, 1, date(2025, 9, 1), AttendanceStatus.present)
+    _mark(db, 1, date(2025, 10, 1), AttendanceStatus.late)
+
+    results = archive.archive_closed_months(db, before=date(2025, 10, 15), archive_dir=archive_dir)
+
+    assert [(result["month"], result["rows"]) for result in results] == [("2025-09", 1)]
+    assert [(row["day"], row["status"]) for row in _archived(archive_dir)] == [(date(2025, 9, 1), "Present")]
+    assert [row.day for row in db.query(Attendance)] == [date(2025, 10, 1)]
+
+
+def test_archived_ids_are_not_reused(db, archive_dir):
+    db.add(Student(name="Ali"))
+    db.commit()
+    archived = _mark(db, 1, date(2025, 9, 1), AttendanceStatus.present)
+    archive.archive_closed_months(db, before=date(2025, 10, 1), archive_dir=archive_dir)
+
+    later = _mark(db, 1, date(2025, 10, 1), AttendanceStatus.present)
+
+    assert later.id > archived.id
+
+
+def test_write_into_archived_month_then_rearchive(db, archive_dir):
+    db.add(Student(name="Ali"))
+    db.commit()
+    _mark(db, 1, date(2025, 9, 1), AttendanceStatus.present)
+    _mark(db, 1, date(2025, 9, 2), AttendanceStatus.present)
+    archive.archive_closed_months(db, before=date(2025, 10, 1), archive_dir=archive_dir)
+
+    # A late correction of an archived day
+    _mark(db, 1, date(2025, 9, 1), AttendanceStatus.absent)
+    archive.archive_closed_months(db, before=date(2025, 10, 1), archive_dir=archive_dir)
+
+    rows = sorted((row["day"], row["status"]) for row in _archived(archive_dir))
+    assert rows == [(date(2025, 9, 1), "Absent"), (date(2025, 9, 2), "Present")]
+    assert db.query(Attendance).count() == 0
+
+
+def test_archives_month_by_month_without_tombstones(db, archive_dir):
+    db.add(Student(name="Ali"))
+    db.commit()
+    for day in (date(2025, 6, 30), date(2025, 7, 1), date(2025, 9, 15), date(2025, 10, 1)):
+        _mark(db, 1, day, AttendanceStatus.present)
+
+    results = archive.archive_closed_months(db, before=date(2025, 10, 1), archive_dir=archive_dir)
+
+    assert [(result["month"], result["rows"]) for result in results] == [("2025-06", 1), ("2025-07", 1), ("2025-09", 1)]
+    assert archive.archived_months(archive_dir) == [date(2025, 6, 1), date(2025, 7, 1), date(2025, 9, 1)]
+    tombstones = db.query(SyncChange).filter(SyncChange.entity == SYNC_ENTITIES["attendance"], SyncChange.deleted)
+    assert tombstones.count() == 0
+
+
+def test_write_into_archived_month_updates_the_archived_record(db, archive_dir):
+    db.add(Student(name="Ali"))
+    db.commit()
+    archived = _mark(db, 1, date(2025, 9, 1), AttendanceStatus.present)
+    archive.archive_closed_months(db, before=date(2025, 10, 1), archive_dir=archive_dir)
+    _mark(db, 1, date(2025, 10, 1), AttendanceStatus.present)
+
+    corrected = _mark(db, 1, date(2025, 9, 1), AttendanceStatus.absent)
+
+    assert (corrected.id, corrected.action) == (archived.id, WriteAction.updated)
+    summary = get_attendance_summary(db, date(2025, 9, 1))
+    assert (summary["total_records"], summary["absent"], summary["present"]) == (1, 1, 0)
+    assert count_attendance_rows(db, date(2025, 9, 1), date(2025, 9, 30)) == 1
+    history = [row for batch in iter_attendance_by_student(db, 1) for row in batch]
+    assert [(row["id"], row["status"]) for row in history] == [(archived.id, "Absent"), (corrected.id + 1, "Present")]
+
+
+def test_percentage_counts_archived_days(db, archive_dir):
+    db.add(Student(name="Ali"))
+    db.commit()
+    _mark(db, 1, date(2025, 9, 1), AttendanceStatus.present)
+    _mark(db, 1, date(2025, 9, 2), AttendanceStatus.absent)
+    archive.archive_closed_months(db, before=date(2025, 10, 1), archive_dir=archive_dir)
+    _mark(db, 1, date(2025, 10, 1), AttendanceStatus.present)
+
+    percentage = calculate_attendance_percentage(db, 1)
+
+    assert (percentage.total_days, percentage.present_days, percentage.absent_days) == (3, 2, 1)
+
+
+def test_section_marking_into_archived_day(db, archive_dir):
+    db.add_all([Student(name="Ali"), Student(name="Sara"), ClassSection(name="7A")])
+    db.commit()
+    db.add_all([SectionMembership(section_id=1, student_id=1), SectionMembership(section_id=1, student_id=2)])
+    db.commit()
+    _mark(db, 1, date(2025, 9, 1), AttendanceStatus.present)
+    archive.archive_closed_months(db, before=date(2025, 10, 1), archive_dir=archive_dir)
+
+    results = mark_section_attendance(db, 1, AttendanceStatus.late, datetime(2025, 9, 1, 8))
+
+    assert [result.action for result in results] == [WriteAction.updated, WriteAction.inserted]
+    assert get_attendance_summary(db, date(2025, 9, 1))["total_records"] == 2
+
+
+def test_delete_archived_and_reopened_records(db, archive_dir):
+    db.add(Student(name="Ali"))
+    db.commit()
+    archived = _mark(db, 1, date(2025, 9, 1), AttendanceStatus.present)
+    _mark(db, 1, date(2025, 9, 2), AttendanceStatus.present)
+    archive.archive_closed_months(db, before=date(2025, 10, 1), archive_dir=archive_dir)
+    reopened = _mark(db, 1, date(2025, 9, 2), AttendanceStatus.absent)
+
+    assert delete_attendance_record(db, archived.id)
+    assert delete_attendance_record(db, reopened.id)
+
+    assert _archived(archive_dir) == []
+    assert db.query(Attendance).count() == 0
+    assert get_attendance_summary(db, date(2025, 9, 2))["total_records"] == 0
+    assert calculate_attendance_percentage(db, 1).total_days == 0
+
+
+def test_update_archived_record_by_id(db, archive_dir):
+    db.add_all([Student(name="Ali"), Student(name="Sara")])
+    db.commit()
+    archived = _mark(db, 1, date(2025, 9, 1), AttendanceStatus.present)
+    archive.archive_closed_months(db, before=date(2025, 10, 1), archive_dir=archive_dir)
+
+    updated = update_attendance_record(db, archived.id, AttendanceUpdate(
+        student_id=2, status=AttendanceStatus.late, date=datetime(2025, 9, 1, 8)
+    ))
+
+    assert (updated.id, updated.student_id, updated.status) == (archived.id, 2, "Late")
+    # The archived copy for Ali's day doesn't come back once the record moved to Sara
+    history = [row for batch in iter_attendance_by_student(db, 1) for row in batch]
+    assert history == []
+    assert get_attendance_summary(db, date(2025, 9, 1))["total_records"] == 1
+
+
+def test_day_of_archived_month_lists_archived_and_reopened_records(db, archive_dir):
+    db.add_all([Student(name="Ali"), Student(name="Sara")])
+    db.commit()
+    ali = _mark(db, 1, date(2025, 9, 1), AttendanceStatus.present)
+    sara = _mark(db, 2, date(2025, 9, 1), AttendanceStatus.present)
+    archive.archive_closed_months(db, before=date(2025, 10, 1), archive_dir=archive_dir)
+    _mark(db, 2, date(2025, 9, 1), AttendanceStatus.late)
+
+    response = TestClient(app).get("/attendance/date/2025-09-01")
+
+    assert response.status_code == 200
+    assert [(row["id"], row["student_name"], row["status"]) for row in response.json()] == \
+        [(ali.id, "Ali", "Present"), (sara.id, "Sara", "Late")]
+    assert TestClient(app).get("/attendance/date/2025-13-01").status_code == 400
@@ -0,0 +1,39 @@
+from datetime import date, datetime
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from database import engine
+from main import app
+from models import Student
+
+client = TestClient(app)
+
+
+def test_write_from_another_process_changes_the_etag(db):
+    db.add(Student(name="Ali"))
+    db.commit()
+    first = client.get("/attendance/date/2025-09-01")
+    etag = first.headers["etag"]
+    assert client.get("/attendance/date/2025-09-01", headers={"If-None-Match": etag}).status_code == 304
+
+    # A write no code in this process knows about, as from the importer CLI or a second worker
+    day = (date(2025, 9, 1) - date(1970, 1, 1)).days
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO attendance (student_id, day, date, status) VALUES (1, :day, :date, 1)"),
+                     {"day": day, "date": int((datetime(2025, 9, 1, 8) - datetime(1970, 1, 1)).total_seconds())})
+
+    second = client.get("/attendance/date/2025-09-01", headers={"If-None-Match": etag})
+    assert second.status_code == 200
+    assert [row["student_name"] for row in second.json()] == ["Ali"]
+
+
+def test_etag_is_stable_across_processes(db):
+    db.add(Student(name="Ali"))
+    db.commit()
+
+    etag = client.get("/students/").headers["etag"]
+
+    # Built from database versions only, so another worker serving the same data agrees
+    assert client.get("/students/", headers={"If-None-Match": etag}).status_code == 304
+    assert "." not in etag
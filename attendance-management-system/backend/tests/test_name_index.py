@@ -0,0 +1,36 @@
+from sqlalchemy import text
+
+from database import engine
+from models import Student
+from name_index import student_names
+
+
+def _write(sql: str):
+    # As the importer CLI or a second worker would: nothing in this process is told
+    with engine.begin() as conn:
+        conn.execute(text(sql))
+
+
+def test_picks_up_students_written_by_another_process(db):
+    db.add_all([Student(name="Ali Khan"), Student(name="Sara Malik")])
+    db.commit()
+    assert student_names.resolve(db, "Ali Khan")[0] == 1
+
+    _write("INSERT INTO students (name) VALUES ('Zainab Shah')")
+    _write("UPDATE students SET name = 'Sara Qureshi' WHERE id = 2")
+    _write("DELETE FROM students WHERE id = 1")
+
+    assert student_names.resolve(db, "Zainab Shah")[0] == 3
+    assert student_names.resolve(db, "Sara Qureshi")[0] == 2
+    assert [candidate.name for candidate in student_names.search("Sara Malik")] == ["Sara Qureshi"]
+    assert student_names.resolve(db, "Ali Khan") == (None, [])
+
+
+def test_single_weak_candidate_is_no_confident_match(db):
+    db.add_all([Student(name="Bilal Ahmed"), Student(name="Sara Malik")])
+    db.commit()
+
+    student_id, candidates = student_names.resolve(db, "Bilaal Ahmadd Khan")
+
+    assert student_id is None
+    assert [candidate.name for candidate in candidates] == ["Bilal Ahmed"]
@@ -0,0 +1,52 @@
+from datetime import date
+
+from sqlalchemy import text
+
+from database import engine
+from models import Student
+from report_cache import SnapshotCache
+
+
+def _render(calls: list):
+    def render(path):
+        calls.append(path)
+        path.write_text("report")
+    return render
+
+
+def test_write_from_another_process_changes_the_key(db, tmp_path):
+    cache = SnapshotCache(tmp_path)
+    db.add(Student(name="Ali"))
+    db.commit()
+    before = cache.key(db, "summary", date(2025, 9, 1), date(2025, 9, 30))
+
+    # A write to a day of the range that no code in this process knows about
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO attendance (student_id, day, date, status) VALUES (1, :day, 0, 1)"),
+                     {"day": (date(2025, 9, 15) - date(1970, 1, 1)).days})
+
+    assert cache.key(db, "summary", date(2025, 9, 1), date(2025, 9, 30)) != before
+
+
+def test_snapshots_survive_a_restart(db, tmp_path):
+    calls = []
+    first = SnapshotCache(tmp_path).get_or_render(db, "summary", date(2025, 9, 1), date(2025, 9, 30), "json",
+                                                  _render(calls))
+
+    restarted = SnapshotCache(tmp_path)
+    second = restarted.get_or_render(db, "summary", date(2025, 9, 1), date(2025, 9, 30), "json", _render(calls))
+
+    assert second == first
+    assert len(calls) == 1
+
+
+def test_snapshot_evicted_by_another_process_is_rendered_again(db, tmp_path):
+    calls = []
+    cache = SnapshotCache(tmp_path)
+    path = cache.get_or_render(db, "summary", date(2025, 9, 1), date(2025, 9, 30), "json", _render(calls))
+    path.unlink()
+
+    cache.get_or_render(db, "summary", date(2025, 9, 1), date(2025, 9, 30), "json", _render(calls))
+
+    assert path.exists()
+    assert len(calls) == 2
@@ -0,0 +1,34 @@
+from sqlalchemy import text
+
+from database import engine
+from models import Student
+from response_cache import ResponseCache
+from schemas import Student as StudentSchema
+
+
+def _roster(cache, db) -> bytes:
+    return cache.get_or_render(db, "students", (), ("students",), list[StudentSchema],
+                               lambda: db.query(Student).order_by(Student.id).all())
+
+
+def test_write_from_another_process_invalidates(db):
+    cache = ResponseCache()
+    db.add(Student(name="Ali"))
+    db.commit()
+    assert b"Ali" in _roster(cache, db)
+    db.rollback()
+
+    # Nothing in this process is told about the write, as with the importer CLI or a second worker
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO students (name) VALUES ('Sara')"))
+
+    assert b"Sara" in _roster(cache, db)
+
+
+def test_unchanged_tables_hit(db):
+    cache = ResponseCache()
+    db.add(Student(name="Ali"))
+    db.commit()
+    body = _roster(cache, db)
+
+    assert _roster(cache, db) is body
@@ -0,0 +1,63 @@
+import threading
+from datetime import date
+
+import pytest
+
+import archive
+import migrations
+from database import TenantEngines, current_tenant, tenant_engines
+from tenants import UnknownTenant, check_tenant, create_tenant
+
+
+def test_unlisted_tenant_must_be_created_first():
+    with pytest.raises(UnknownTenant):
+        check_tenant("greenfield")
+    assert not tenant_engines.exists("greenfield")
+
+    assert create_tenant("greenfield")
+    assert check_tenant("greenfield") == "greenfield"
+    assert not create_tenant("greenfield")
+    tenant_engines.close_all()
+
+
+def test_opening_a_tenant_does_not_block_open_ones(tmp_path, monkeypatch):
+    engines = TenantEngines(directory=tmp_path)
+    engines.get("riverside")
+    migrating, release = threading.Event(), threading.Event()
+    bootstrap_schema = migrations.bootstrap_schema
+
+    def slow_bootstrap(engine):
+        migrating.set()
+        release.wait(10)
+        bootstrap_schema(engine)
+
+    monkeypatch.setattr(migrations, "bootstrap_schema", slow_bootstrap)
+    opened = []
+    openers = [threading.Thread(target=lambda: opened.append(engines.get("greenfield"))) for _ in range(3)]
+    for opener in openers:
+        opener.start()
+    assert migrating.wait(10)
+
+    # Another tenant is served while greenfield migrates
+    other = threading.Thread(target=engines.get, args=("riverside",))
+    other.start()
+    other.join(5)
+    blocked = other.is_alive()
+    release.set()
+    assert not blocked
+    for opener in openers:
+        opener.join(10)
+
+    assert len(opened) == 3 and len({id(database) for database in opened}) == 1
+    assert len(engines) == 2
+    engines.close_all()
+
+
+def test_archive_partitions_are_per_tenant(archive_dir):
+    month = date(2025, 9, 1)
+    token = current_tenant.set("greenfield")
+    try:
+        assert archive.partition_path(month) == archive.partition_path(month, archive_dir / "tenants" / "greenfield")
+    finally:
+        current_tenant.reset(token)
+    assert archive.partition_path(month) == archive.partition_path(month, archive_dir)
@@ -0,0 +1,113 @@
+import multiprocessing
+import os
+import shutil
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import insert, select
+
+from database import SessionLocal
+from models import Attendance, Student, WriteBehindCheckpoint
+from schemas import AttendanceCreate
+from write_behind import WriteBehindJournal
+
+STATUSES = ["Present", "Absent", "Late"]
+CHECKIN_TIME = datetime(2024, 9, 2, 8, 0)
+STUDENTS = 50
+
+
+def _checkin(student_id: int, status: str = None) -> AttendanceCreate:
+    return AttendanceCreate(
+        student_id=student_id,
+        status=status or STATUSES[student_id % 3],
+        date=CHECKIN_TIME + timedelta(seconds=student_id),
+    )
+
+
+def _crash_child(journal_path: str, phases: list):
+    """Submit and optionally apply check-ins per phase, then die without cleaning up"""
+    journal = WriteBehindJournal(Path(journal_path), SessionLocal, flush_interval_ms=3_600_000)
+    journal.start()
+    for first, last, apply in phases:
+        journal.submit([_checkin(student_id) for student_id in range(first, last + 1)])
+        if apply:
+            journal.flush()
+    os._exit(9)
+
+
+def _crash(db, journal_path: Path, phases: list) -> set:
+    """Run _crash_child in its own process; returns the student ids whose check-ins were acknowledged"""
+    db.execute(insert(Student), [{"name": f"Student {i}"} for i in range(1, STUDENTS + 1)])
+    db.commit()
+    child = multiprocessing.get_context("spawn").Process(target=_crash_child, args=(str(journal_path), phases))
+    child.start()
+    child.join()
+    assert child.exitcode == 9
+    return {student_id for first, last, _ in phases for student_id in range(first, last + 1)}
+
+
+def _restart(journal_path: Path):
+    journal = WriteBehindJournal(journal_path, SessionLocal)
+    journal.start()
+    journal.stop()
+
+
+def _assert_written_once(db, journal_path: Path, acknowledged: set):
+    rows = db.execute(select(Attendance.student_id, Attendance.status)).all()
+    assert sorted(student_id for student_id, _ in rows) == sorted(acknowledged)
+    assert all(status == STATUSES[student_id % 3] for student_id, status in rows)
+    assert db.scalar(select(WriteBehindCheckpoint.applied_seq)) == len(acknowledged)
+    assert journal_path.stat().st_size == 0
+
+
+def test_killed_before_any_batch(db, tmp_path):
+    journal_path = tmp_path / "checkins.journal"
+    acknowledged = _crash(db, journal_path, [(1, STUDENTS, False)])
+    assert db.scalar(select(Attendance.id)) is None
+
+    _restart(journal_path)
+
+    _assert_written_once(db, journal_path, acknowledged)
+
+
+def test_killed_between_batches(db, tmp_path):
+    journal_path = tmp_path / "checkins.journal"
+    acknowledged = _crash(db, journal_path, [(1, 30, True), (31, STUDENTS, False)])
+    assert db.scalar(select(WriteBehindCheckpoint.applied_seq)) == 30
+
+    _restart(journal_path)
+
+    _assert_written_once(db, journal_path, acknowledged)
+
+
+def test_torn_last_line(db, tmp_path):
+    journal_path = tmp_path / "checkins.journal"
+    acknowledged = _crash(db, journal_path, [(1, STUDENTS, False)])
+    # Cut the journal mid-line, as a power loss during the last append would;
+    # that check-in was never acknowledged
+    lines = journal_path.read_bytes().splitlines(keepends=True)
+    journal_path.write_bytes(b"".join(lines[:-1]) + lines[-1][:len(lines[-1]) // 2])
+
+    _restart(journal_path)
+
+    _assert_written_once(db, journal_path, acknowledged - {STUDENTS})
+
+
+def test_stale_journal_after_commit_is_not_replayed(db, tmp_path):
+    # A journal that outlived its committed batch (a crash between the commit
+    # and the truncation) must not overwrite newer check-ins when replayed
+    db.execute(insert(Student), [{"name": f"Student {i}"} for i in range(1, STUDENTS + 1)])
+    db.commit()
+    journal = WriteBehindJournal(tmp_path / "live.journal", SessionLocal, flush_interval_ms=3_600_000)
+    journal.start()
+    journal.submit([_checkin(student_id) for student_id in range(1, STUDENTS + 1)])
+    shutil.copy(journal.path, tmp_path / "stale.journal")
+    journal.submit([_checkin(student_id, "Present") for student_id in range(1, 11)])
+    journal.stop()
+
+    _restart(tmp_path / "stale.journal")
+
+    statuses = dict(db.execute(select(Attendance.student_id, Attendance.status)).all())
+    assert len(statuses) == STUDENTS
+    assert all(statuses[student_id] == "Present" for student_id in range(1, 11))
+    assert (tmp_path / "stale.journal").stat().st_size == 0
@@ -0,0 +1,19 @@
+import json
+from datetime import date, datetime
+from typing import Iterable, Iterator, Mapping
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_batches(batches: Iterable[Iterable[Mapping]]) -> Iterator[bytes]:
+    """Encode batches of rows as newline-delimited JSON, one chunk per batch"""
+    for batch in batches:
+        lines = [json.dumps(dict(row), default=_default, separators=(",", ":")) for row in batch]
+        if lines:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
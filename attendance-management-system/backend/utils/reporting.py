@@ -1,41 +1,113 @@
+import csv
 import pandas as pd
 from io import BytesIO
-from fastapi import HTTPException
-from sqlalchemy.orm import Session
-from models import models
+from collections import Counter
 from datetime import date
-import crud
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+from openpyxl import Workbook
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from models import Attendance, Student
+import archive
+
+EXPORT_COLUMNS = ["ID", "Student Name", "Date", "Status", "Created At"]
+EXPORT_CHUNK_SIZE = 5000
+STREAM_BATCH_SIZE = 1000
+
+
+def _live_query(db: Session, columns: list, start: date = None, end: date = None,
+                student_id: int = None, status: str = None):
+    """Query the live attendance table with optional day range and filters"""
+    query = db.query(*columns)
+    if start:
+        query = query.filter(Attendance.day >= start)
+    if end:
+        query = query.filter(Attendance.day <= end)
+    if student_id is not None:
+        query = query.filter(Attendance.student_id == student_id)
+    if status:
+        query = query.filter(Attendance.status == status)
+    return query
+
+
+def count_attendance_rows(db: Session, start: date = None, end: date = None,
+                          student_id: int = None, status: str = None) -> int:
+    """Count live and archived attendance rows matching the filters"""
+    live = _live_query(db, [func.count(Attendance.id)], start, end, student_id, status).scalar()
+    archived = archive.read_archive(start=start, end=end, columns=["id"], student_id=student_id, status=status,
+                                    exclude=archive.live_keys(db, start, end, student_id))
+    return live + archived.num_rows
+
+
+def iter_attendance_rows(db: Session, start: date = None, end: date = None, student_id: int = None,
+                         status: str = None, batch_size: int = STREAM_BATCH_SIZE) -> Iterator[list[dict]]:
+    """
+    Yield archived then live attendance rows in batches, with student names
+
+    Live rows come from a server-side cursor as column tuples, never ORM
+    objects, and archived rows one month partition at a time, so memory
+    stays flat regardless of the range. Archived rows have no created_at,
+    and those reopened by a later write are read from the live table only.
+    """
+    names = {}
+
+    def with_names(batch: list[dict]) -> list[dict]:
+        # Look up only the students this batch introduces
+        missing = {row["student_id"] for row in batch} - names.keys()
+        if missing:
+            names.update(db.query(Student.id, Student.name).filter(Student.id.in_(missing)))
+        for row in batch:
+            row["student_name"] = names.get(row["student_id"], "Unknown")
+        return batch
+
+    shadowed = archive.live_keys(db, start, end, student_id)
+    for batch in archive.iter_archive(start, end, student_id=student_id, status=status, batch_size=batch_size,
+                                      exclude=shadowed):
+        for row in batch:
+            row["created_at"] = None
+        yield with_names(batch)
+
+    statement = _live_query(
+        db, [Attendance.id, Attendance.student_id, Attendance.day, Attendance.status, Attendance.created_at],
+        start, end, student_id, status
+    ).order_by(Attendance.day, Attendance.id).statement.execution_options(yield_per=batch_size)
+    for partition in db.execute(statement).mappings().partitions():
+        yield with_names([dict(row) for row in partition])
+
+
+def _export_values(row: dict) -> list:
+    """Format one attendance row in EXPORT_COLUMNS order"""
+    return [
+        row["id"],
+        row["student_name"],
+        row["day"].strftime("%Y-%m-%d") if row["day"] else "",
+        row["status"],
+        row["created_at"].strftime("%Y-%m-%d %H:%M:%S") if row["created_at"] else ""
+    ]
+
+
+def _attendance_dataframe(db: Session, target_date: date = None) -> pd.DataFrame:
+    """Build the export DataFrame shared by the CSV and Excel reports"""
+    data = [
+        _export_values(row)
+        for batch in iter_attendance_rows(db, target_date, target_date)
+        for row in batch
+    ]
+    return pd.DataFrame(data, columns=EXPORT_COLUMNS)
 
 
 def export_attendance_to_csv(db: Session, target_date: date = None):
     """
     Export attendance data to CSV format
     """
-    if target_date:
-        attendances = crud.get_attendance_by_date(db=db, target_date=target_date)
-    else:
-        attendances = db.query(models.Attendance).all()
-    
-    # Prepare data for DataFrame
-    data = []
-    for attendance in attendances:
-        student = crud.get_student(db=db, student_id=attendance.student_id)
-        data.append({
-            "ID": attendance.id,
-            "Student Name": student.name if student else "Unknown",
-            "Date": attendance.date.strftime("%Y-%m-%d") if attendance.date else "",
-            "Status": attendance.status,
-            "Created At": attendance.created_at.strftime("%Y-%m-%d %H:%M:%S") if attendance.created_at else ""
-        })
-    
-    # Create DataFrame
-    df = pd.DataFrame(data)
-    
+    df = _attendance_dataframe(db, target_date)
+
     # Create a BytesIO buffer to hold the CSV data
     buffer = BytesIO()
     df.to_csv(buffer, index=False)
     buffer.seek(0)
-    
+
     return buffer
 
 
@@ -43,49 +115,43 @@ def export_attendance_to_excel(db: Session, target_date: date = None):
     """
     Export attendance data to Excel format
     """
-    if target_date:
-        attendances = crud.get_attendance_by_date(db=db, target_date=target_date)
-    else:
-        attendances = db.query(models.Attendance).all()
-    
-    # Prepare data for DataFrame
-    data = []
-    for attendance in attendances:
-        student = crud.get_student(db=db, student_id=attendance.student_id)
-        data.append({
-            "ID": attendance.id,
-            "Student Name": student.name if student else "Unknown",
-            "Date": attendance.date.strftime("%Y-%m-%d") if attendance.date else "",
-            "Status": attendance.status,
-            "Created At": attendance.created_at.strftime("%Y-%m-%d %H:%M:%S") if attendance.created_at else ""
-        })
-    
-    # Create DataFrame
-    df = pd.DataFrame(data)
-    
+    df = _attendance_dataframe(db, target_date)
+
     # Create a BytesIO buffer to hold the Excel data
     buffer = BytesIO()
     with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
         df.to_excel(writer, sheet_name='Attendance', index=False)
     buffer.seek(0)
-    
+
     return buffer
 
 
-def get_attendance_summary(db: Session, target_date: date = None):
+def get_attendance_summary(db: Session, target_date: date = None, end_date: date = None):
     """
-    Get attendance summary statistics
+    Get attendance summary statistics for a day, or a range up to end_date
     """
-    if target_date:
-        attendances = crud.get_attendance_by_date(db=db, target_date=target_date)
-    else:
-        attendances = db.query(models.Attendance).all()
-    
-    total_records = len(attendances)
-    present_count = sum(1 for att in attendances if att.status == 'present')
-    absent_count = sum(1 for att in attendances if att.status == 'absent')
-    late_count = sum(1 for att in attendances if att.status == 'late')
-    
+    end_date = end_date or target_date
+
+    # Live rows are counted by the database rather than loaded
+    counts = Counter({
+        status.lower(): count
+        for status, count in _live_query(
+            db, [Attendance.status, func.count(Attendance.id)], target_date, end_date
+        ).group_by(Attendance.status)
+    })
+
+    # Only the status column of the matching month partitions is read; days
+    # reopened by a later write were already counted live
+    archived = archive.read_archive(start=target_date, end=end_date, columns=["status"],
+                                    exclude=archive.live_keys(db, target_date, end_date))
+    for entry in archived["status"].value_counts().to_pylist():
+        counts[entry["values"].lower()] += entry["counts"]
+
+    total_records = sum(counts.values())
+    present_count = counts['present']
+    absent_count = counts['absent']
+    late_count = counts['late']
+
     summary = {
         "total_records": total_records,
         "present": present_count,
@@ -95,5 +161,65 @@ def get_attendance_summary(db: Session, target_date: date = None):
         "absent_percentage": round((absent_count / total_records * 100) if total_records > 0 else 0, 2),
         "late_percentage": round((late_count / total_records * 100) if total_records > 0 else 0, 2)
     }
-    
-    return summary
\ No newline at end of file
+
+    return summary
+
+
+def write_attendance_export(
+    db: Session,
+    path: Path,
+    export_format: str,
+    start: date = None,
+    end: date = None,
+    student_id: int = None,
+    status: str = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> int:
+    """
+    Write an attendance export for a day range straight to a file
+
+    Rows are streamed from iter_attendance_rows and written in chunks of
+    EXPORT_CHUNK_SIZE; `progress(done, total)` is called after each chunk,
+    with the total counted up front. Returns the number of rows written.
+    """
+    total = count_attendance_rows(db, start, end, student_id, status)
+    if progress:
+        progress(0, total)
+
+    def chunks() -> Iterator[list[dict]]:
+        # Regroup the row batches into EXPORT_CHUNK_SIZE chunks for progress reports
+        chunk = []
+        for batch in iter_attendance_rows(db, start, end, student_id, status):
+            chunk.extend(batch)
+            if len(chunk) >= EXPORT_CHUNK_SIZE:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    done = 0
+    if export_format == "csv":
+        with open(path, "w", newline="", encoding="utf-8") as handle:
+            writer = csv.writer(handle)
+            writer.writerow(EXPORT_COLUMNS)
+            for chunk in chunks():
+                writer.writerows(_export_values(row) for row in chunk)
+                done += len(chunk)
+                if progress:
+                    progress(done, total)
+    elif export_format == "excel":
+        # Write-only workbooks stream rows instead of keeping every cell object
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet("Attendance")
+        sheet.append(EXPORT_COLUMNS)
+        for chunk in chunks():
+            for row in chunk:
+                sheet.append(_export_values(row))
+            done += len(chunk)
+            if progress:
+                progress(done, total)
+        workbook.save(path)
+    else:
+        raise ValueError(f"Unsupported export format: {export_format}")
+
+    return done
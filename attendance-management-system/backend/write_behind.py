@@ -0,0 +1,320 @@
+import json
+import os
+import threading
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List
+
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from attendance_manager import upsert_attendance_records
+from data_versions import bump_pending
+from database import BASE_DIR, SessionLocal, current_tenant
+from metrics import Counter, Gauge, Histogram
+from models import Attendance, Student, WriteBehindCheckpoint
+from schemas import AttendanceCreate, AttendanceStatus, CheckInReceipt
+
+WRITE_BEHIND = os.environ.get("WRITE_BEHIND", "").lower() in ("1", "true", "yes")
+WRITE_BEHIND_JOURNAL = Path(os.environ.get("WRITE_BEHIND_JOURNAL", BASE_DIR / "checkins.journal"))
+WRITE_BEHIND_FLUSH_MS = int(os.environ.get("WRITE_BEHIND_FLUSH_MS", 100))
+WRITE_BEHIND_BATCH_SIZE = int(os.environ.get("WRITE_BEHIND_BATCH_SIZE", 500))
+WRITE_BEHIND_FSYNC = os.environ.get("WRITE_BEHIND_FSYNC", "1").lower() in ("1", "true", "yes")
+
+pending_gauge = Gauge("write_behind_pending", "Check-ins acknowledged but not yet written to the database")
+batches = Counter("write_behind_batches_total", "Write-behind batches applied, by result")
+batch_sizes = Histogram(
+    "write_behind_batch_size", "Check-ins per write-behind batch", buckets=(1, 5, 10, 50, 100, 250, 500, 1000)
+)
+apply_seconds = Histogram("write_behind_apply_seconds", "Time to apply one write-behind batch")
+dropped = Counter("write_behind_dropped_total", "Journaled check-ins that could not be written and were skipped")
+pending_gauge.set(0)
+
+
+def _encode(entry: dict) -> bytes:
+    return (json.dumps({**entry, "date": entry["date"].isoformat()}, separators=(",", ":")) + "\n").encode()
+
+
+def _decode(line: bytes) -> dict:
+    entry = json.loads(line)
+    return {**entry, "date": datetime.fromisoformat(entry["date"])}
+
+
+class WriteBehindJournal:
+    """
+    Durable journal of acknowledged check-ins, written to the database in batches
+
+    submit() appends check-ins to an append-only journal file (fsynced, with
+    concurrent callers sharing one fsync) and returns; a single writer
+    thread applies whatever is pending every flush_interval_ms, or as soon
+    as batch_size check-ins are waiting, as one upsert transaction. Each
+    transaction also records the last journal sequence number it applied in
+    write_behind_checkpoint, so after a crash start() replays exactly the
+    journaled check-ins the database is missing. The journal is emptied
+    whenever everything in it has been applied.
+    """
+
+    def __init__(
+        self,
+        path: Path = WRITE_BEHIND_JOURNAL,
+        session_factory=SessionLocal,
+        flush_interval_ms: int = WRITE_BEHIND_FLUSH_MS,
+        batch_size: int = WRITE_BEHIND_BATCH_SIZE,
+        fsync: bool = WRITE_BEHIND_FSYNC,
+    ):
+        self.path = Path(path)
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval_ms / 1000
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self._lock = threading.Lock()  # guards the file, _pending and _by_day
+        self._sync_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._pending: List[dict] = []
+        self._by_day: Dict[date, Dict[int, dict]] = {}  # latest pending check-in per day and student
+        self._file = None
+        self._thread = None
+        self._next_seq = 1
+        self._written_seq = 0
+        self._synced_seq = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        """Replay check-ins the database is missing, then start the writer thread"""
+        with self._lock:
+            if self._thread:
+                return
+            self._recover()
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Write everything pending and stop the writer thread"""
+        if not self._thread:
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        self._thread.join()
+        with self._lock:
+            self._file.close()
+            self._file = None
+            self._thread = None
+            self._stopping.clear()
+
+    def _recover(self):
+        """Load unapplied journal entries, cutting off a line torn by a crash (caller holds the lock)"""
+        db = self.session_factory()
+        try:
+            applied_seq = db.scalar(select(WriteBehindCheckpoint.applied_seq)) or 0
+        finally:
+            db.close()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._pending, self._by_day = [], {}
+        last_seq, good_bytes = applied_seq, 0
+        if self.path.exists():
+            with open(self.path, "rb") as journal:
+                for line in journal:
+                    try:
+                        entry = _decode(line)
+                    except (ValueError, KeyError):
+                        # Only the last append can be incomplete; nothing after it was acknowledged
+                        break
+                    good_bytes += len(line)
+                    last_seq = max(last_seq, entry["seq"])
+                    if entry["seq"] > applied_seq:
+                        self._add_pending(entry)
+        self._file = open(self.path, "ab")
+        self._file.truncate(good_bytes if self._pending else 0)
+        self._next_seq = last_seq + 1
+        self._written_seq = self._synced_seq = last_seq
+        pending_gauge.set(len(self._pending))
+        if self._pending:
+            self._wakeup.set()
+
+    def _add_pending(self, entry: dict):
+        self._pending.append(entry)
+        self._by_day.setdefault(entry["date"].date(), {})[entry["student_id"]] = entry
+
+    def submit(self, records: List[AttendanceCreate]) -> List[CheckInReceipt]:
+        """Journal check-ins and acknowledge them; they reach the database with the next batch"""
+        now = datetime.utcnow()
+        with self._lock:
+            if not self._file:
+                raise RuntimeError("The write-behind journal is not running")
+            entries = []
+            for record in records:
+                entries.append({
+                    "seq": self._next_seq,
+                    "student_id": record.student_id,
+                    "status": AttendanceStatus(record.status).value,
+                    "date": record.date or now,
+                })
+                self._next_seq += 1
+            self._file.write(b"".join(_encode(entry) for entry in entries))
+            self._file.flush()
+            for entry in entries:
+                self._add_pending(entry)
+            self._written_seq = entries[-1]["seq"] if entries else self._written_seq
+            waiting = len(self._pending)
+        if not entries:
+            return []
+
+        self._sync(entries[-1]["seq"])
+        pending_gauge.set(waiting)
+        # Reads merge pending check-ins, so cached copies of these days are stale now
+        bump_pending(entry["date"].date() for entry in entries)
+        if waiting >= self.batch_size:
+            self._wakeup.set()
+        return [
+            CheckInReceipt(sequence=entry["seq"], student_id=entry["student_id"], status=entry["status"],
+                           date=entry["date"], pending=True)
+            for entry in entries
+        ]
+
+    def _sync(self, seq: int):
+        """fsync the journal up to seq; callers arriving during an fsync share the next one"""
+        if not self.fsync:
+            return
+        with self._sync_lock:
+            if self._synced_seq >= seq:
+                return
+            target = self._written_seq
+            os.fsync(self._file.fileno())
+            self._synced_seq = target
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Usually the database is locked by a long write; everything
+                # not yet applied stays pending and is retried on the next tick
+                batches.inc(result="retry")
+        self.flush()
+
+    def flush(self):
+        """Apply every pending check-in, batch_size at a time"""
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = self._pending[:self.batch_size]
+                if not batch:
+                    return
+                started = time.perf_counter()
+                self._apply(batch)
+                apply_seconds.observe(time.perf_counter() - started)
+                batch_sizes.observe(len(batch))
+                with self._lock:
+                    del self._pending[:len(batch)]
+                    for entry in batch:
+                        day = self._by_day.get(entry["date"].date(), {})
+                        if day.get(entry["student_id"]) is entry:
+                            del day[entry["student_id"]]
+                            if not day:
+                                del self._by_day[entry["date"].date()]
+                    if not self._pending:
+                        # Everything journaled is in the database, checkpoint included
+                        self._file.truncate(0)
+                    pending_gauge.set(len(self._pending))
+
+    def _apply(self, batch: List[dict]):
+        """Write a batch and its checkpoint in one transaction, isolating entries that fail"""
+        db = self.session_factory()
+        try:
+            try:
+                self._write(db, batch)
+                batches.inc(result="applied")
+                return
+            except OperationalError:
+                raise
+            except Exception:
+                db.rollback()
+                batches.inc(result="split")
+            for entry in batch:
+                try:
+                    self._write(db, [entry])
+                except OperationalError:
+                    raise
+                except Exception:
+                    db.rollback()
+                    dropped.inc()
+                    # Move the checkpoint past the entry so it isn't replayed forever
+                    db.merge(WriteBehindCheckpoint(id=1, applied_seq=entry["seq"]))
+                    db.commit()
+        finally:
+            db.close()
+
+    def _write(self, db: Session, batch: List[dict]):
+        # The merged checkpoint is flushed and committed by the upsert's own commit
+        db.merge(WriteBehindCheckpoint(id=1, applied_seq=batch[-1]["seq"]))
+        upsert_attendance_records(db, [
+            AttendanceCreate(student_id=entry["student_id"], status=entry["status"], date=entry["date"])
+            for entry in batch
+        ])
+
+    def pending_for_day(self, day: date) -> Dict[int, dict]:
+        """Latest pending check-in of each student on a day"""
+        with self._lock:
+            return dict(self._by_day.get(day, {}))
+
+
+checkins = WriteBehindJournal()
+
+
+def record_checkin(db: Session, record: AttendanceCreate) -> CheckInReceipt:
+    """Journal a check-in when write-behind is on, otherwise write it straight away"""
+    # The journal flushes to the default database only, so tenants always write through
+    if WRITE_BEHIND and current_tenant.get() is None:
+        return checkins.submit([record])[0]
+    result = upsert_attendance_records(db, [record])[0]
+    return CheckInReceipt(student_id=result.student_id, status=result.status, date=result.date, pending=False)
+
+
+def merge_pending_rows(db: Session, day: date, rows: List[dict]) -> List[dict]:
+    """Overlay a day's pending check-ins on its attendance rows, so kiosks see their own writes"""
+    pending = checkins.pending_for_day(day) if current_tenant.get() is None else None
+    if not pending:
+        return rows
+    merged = []
+    for row in rows:
+        entry = pending.pop(row["student_id"], None)
+        merged.append({**row, "status": entry["status"], "date": entry["date"], "pending": True} if entry else row)
+    if pending:
+        names = dict(db.execute(select(Student.id, Student.name).where(Student.id.in_(pending))).all())
+        for student_id, entry in sorted(pending.items()):
+            merged.append({
+                "id": None, "student_id": student_id, "student_name": names.get(student_id, "Unknown"),
+                "status": entry["status"], "date": entry["date"], "created_at": None, "pending": True,
+            })
+    return merged
+
+
+def merge_pending_counts(db: Session, day: date, summary: dict) -> dict:
+    """Adjust a day summary's counts for its pending check-ins"""
+    pending = checkins.pending_for_day(day) if current_tenant.get() is None else None
+    if not pending:
+        return summary
+    stored = dict(db.execute(
+        select(Attendance.student_id, Attendance.status).where(
+            Attendance.day == day, Attendance.student_id.in_(pending)
+        )
+    ).all())
+    summary = dict(summary)
+    for student_id, entry in pending.items():
+        previous = stored.get(student_id)
+        if previous:
+            summary[AttendanceStatus(previous).name] -= 1
+        else:
+            summary["total"] += 1
+        summary[AttendanceStatus(entry["status"]).name] += 1
+    return summary